@@ -24,3 +24,9 @@ class HasImportToken(BasePermission):
             return False
 
         return User.objects.filter(id=int(broker_id), is_active=True).exists()
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        return bool(token) and request.headers.get("Authorization", "") == f"Bearer {token}"
@@ -0,0 +1,10 @@
+"""
+Benchmarks for the extraction pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.run                 # end-to-end, synthetic PDF corpus
+    python -m benchmarks.run --compare main  # main vs. the working tree
+    python -m benchmarks.pdf_corpus OUT_DIR  # just write the corpus
+    python -m benchmarks.bench_contract_type # micro-benchmarks
+"""
@@ -0,0 +1,121 @@
+"""
+Time customer autocomplete (customers/autocomplete/) keystroke by keystroke
+for one broker with many customers.
+
+Builds a throwaway SQLite database with --customers customers (and a plate
+for every third one), warms the broker's prefix index and types random
+names, customer numbers and plates one character at a time, reporting the
+percentiles over every keystroke. Surnames repeat the way they do in a real
+customer base (a few very common ones), and multi-word queries ("Müller a",
+"Schmidt Peter") are reported on their own: they are the slow case.
+
+    python -m benchmarks.bench_autocomplete [--customers 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_customer_matching import setup_django
+
+FIRST_NAMES = ["Anna", "Jürgen", "Max", "Sabine", "Thomas", "Petra", "Özlem", "Klaus", "Maria", "Jan",
+               "Peter", "Andreas", "Stefan", "Monika", "Alexander", "Ursula", "Michael", "Karin"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+              "Schulz", "Hoffmann", "Schäfer", "Koch", "Bauer", "Richter", "Klein", "Wolf",
+              "Schröder", "Neumann", "Schwarz", "Zimmermann", "Braun", "Krüger", "Hofmann", "Hartmann"]
+# Zipf-like: "Müller" is the most common surname by far
+LAST_NAME_WEIGHTS = [1 / rank for rank in range(1, len(LAST_NAMES) + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, "bench.sqlite3"))
+
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from django.db import connection, transaction
+
+        from insurance_app.services.customer_autocomplete import autocomplete_customers, autocomplete_index
+        from insurance_app.services.identity_normalization import normalize_name
+        from insurance_app.services.license_plates import normalize_license_plate
+
+        call_command("migrate", verbosity=0)
+        broker = get_user_model().objects.create_user(username="bench")
+        rng = random.Random(42)
+        customers = []
+        for i in range(args.customers):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choices(LAST_NAMES, LAST_NAME_WEIGHTS)[0]
+            if rng.random() < 0.1:
+                last += f"-{rng.choice(LAST_NAMES)}"
+            customers.append((f"2026-{i:06d}", first, last))
+        plates = {
+            i: f"{rng.choice(['H', 'B', 'HH', 'M'])}-{rng.choice('ABCXY')}{rng.choice('ABZ')} {rng.randint(1, 9999)}"
+            for i in range(0, args.customers, 3)
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Raw SQL skips the post_save receivers; the plate table is filled alongside
+            cursor.executemany(
+                "INSERT INTO insurance_app_customer (id, broker_id, customer_number, active_status, "
+                "salutation, first_name, last_name, phone, street, zip_code, country, "
+                "first_name_norm, last_name_norm, street_norm, created_at, updated_at, notes) "
+                "VALUES (%s, %s, %s, 'aktiv', '', %s, %s, '', %s, '', 'Germany', %s, %s, '', "
+                "datetime('now'), datetime('now'), '')",
+                [
+                    (i + 1, broker.id, number, first, last, f"Weg {i}", normalize_name(first), normalize_name(last))
+                    for i, (number, first, last) in enumerate(customers)
+                ],
+            )
+            cursor.executemany(
+                "INSERT INTO insurance_app_document (id, customer_id, file_path, content_hash, "
+                "policy_numbers, license_plates, contract_status, created_at) "
+                "VALUES (%s, %s, '', '', '[]', %s, 'aktiv', datetime('now'))",
+                [(i + 1, i + 1, f'["{plate}"]') for i, plate in plates.items()],
+            )
+            cursor.executemany(
+                "INSERT INTO insurance_app_licenseplate (document_id, customer_id, broker_id, "
+                "plate, display) VALUES (%s, %s, %s, %s, %s)",
+                [(i + 1, i + 1, broker.id, normalize_license_plate(plate), plate) for i, plate in plates.items()],
+            )
+
+        started = time.perf_counter()
+        index = autocomplete_index(broker)
+        print(f"index of {len(index)} customers built in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        timings = {"one word": [], "several words": []}
+        for _ in range(args.queries):
+            number, first, last = rng.choice(customers)
+            typed = rng.choice([
+                last,
+                number,
+                plates.get(rng.randrange(0, args.customers, 3)),
+                f"{last} {first}",
+                f"{first} {last}",
+                f"{last} {rng.choice(FIRST_NAMES)[0]}",
+            ])
+            for end in range(1, len(typed) + 1):
+                prefix = typed[:end]
+                started = time.perf_counter()
+                autocomplete_customers(broker, prefix)
+                elapsed = (time.perf_counter() - started) * 1000
+                timings["several words" if len(prefix.split()) > 1 else "one word"].append(elapsed)
+
+        for kind, values in timings.items():
+            cuts = statistics.quantiles(values, n=100)
+            print(f"{kind:>13}: {len(values):>6} keystrokes  p50 {cuts[49]:.3f}ms  "
+                  f"p99 {cuts[98]:.3f}ms  max {max(values):.3f}ms")
+        for query in ("müller a", "Schmidt Peter", "müller xaver", "hoffmann vor4321", "m a", "m s p"):
+            started = time.perf_counter()
+            autocomplete_customers(broker, query)
+            print(f"{query!r:>20}: {(time.perf_counter() - started) * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the single-pass contract-type matcher against the previous
+rule-by-rule search on large normalized texts.
+
+The legacy search returns at the first rule with any hit, so it wins when
+an early rule (kfz) matches near the top; it cannot produce hit counts.
+
+    python -m benchmarks.bench_contract_type [--pages 300] [--repeat 5]
+"""
+import argparse
+import random
+import timeit
+from typing import Optional
+
+from insurance_app.services.extract_pdf_text import (
+    CONTRACT_RULES,
+    count_contract_type_hits,
+    extract_contract_type,
+)
+
+FILLER_WORDS = (
+    "Sehr geehrter Herr Mustermann wir bedanken uns für Ihr Vertrauen Beitrag "
+    "Rechnung Zahlung Vertrag Versicherungsschein Laufzeit Tarif Klasse Seite "
+    "Bedingungen Leistung Schaden Anschrift Hannover Datum Vorstand"
+).split()
+
+
+def legacy_extract_contract_type(text: str) -> Optional[str]:
+    """Rule-by-rule search as implemented before the combined matcher."""
+    for contract_key, patterns in CONTRACT_RULES:
+        if any(p.search(text) for p in patterns):
+            return contract_key
+    return None
+
+
+def build_text(pages: int, keywords: list[str], seed: int = 42) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(pages * 40):
+        words = rng.choices(FILLER_WORDS, k=10)
+        if keywords and rng.random() < 0.01:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        lines.append(" ".join(words))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scenarios = {
+        "no contract keywords": build_text(args.pages, []),
+        "kfz letter": build_text(args.pages, ["Kfz-Versicherung", "Kennzeichen"]),
+        "late rule (pkv)": build_text(args.pages, ["PKV", "Krankenvollversicherung"]),
+        "mixed": build_text(args.pages, ["Haftpflicht", "Hausrat", "Kfz", "Unfallversicherung"]),
+    }
+
+    print(f"{'scenario':<22} {'size':>9} {'legacy':>10} {'combined':>10}  result")
+    for name, text in scenarios.items():
+        legacy = min(timeit.repeat(lambda: legacy_extract_contract_type(text), number=1, repeat=args.repeat))
+        combined = min(timeit.repeat(lambda: extract_contract_type(text), number=1, repeat=args.repeat))
+        print(
+            f"{name:<22} {len(text) / 1024:>7.0f}KB {legacy * 1000:>8.2f}ms {combined * 1000:>8.2f}ms"
+            f"  {legacy_extract_contract_type(text)} -> {extract_contract_type(text)}"
+            f" {count_contract_type_hits(text)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Time the fuzzy customer matcher for one broker with many customers.
+
+Builds a throwaway SQLite database with --customers customers spread over
+--zip-codes zip codes and times fuzzy_match() (blocking query + scoring) for
+letters with OCR errors, plus the scoring alone for the largest block.
+
+    python -m benchmarks.bench_customer_matching [--customers 100000] [--zip-codes 500]
+"""
+import argparse
+import os
+import random
+import tempfile
+import timeit
+
+FIRST_NAMES = (
+    "Max Erika Jürgen Anna Anne Peter Petra Thomas Sabine Michael Andrea Stefan "
+    "Claudia Frank Monika Klaus Ute Uwe Birgit Jörg Renée Lukas Leonie Paul Marie"
+).split()
+LAST_NAMES = (
+    "Müller Schmidt Schmitt Schneider Fischer Weber Meyer Meier Wagner Becker Schulz "
+    "Hoffmann Schäfer Koch Bauer Richter Klein Wolf Schröder Neumann Schwarz Zimmermann "
+    "Braun Krüger Hofmann Hartmann Lange Werner Krause Mustermann Musterfrau"
+).split()
+# Compound names ("Hofmeier", "Steinbrink", ...) for a realistic share of
+# distinct last names per zip code
+NAME_STEMS = "Hof Stein Berg Brink Hage Kamp Ober Unter Wester Oster Hasel Linden Eich Rosen Feld".split()
+NAME_ENDINGS = "meier mann brink kamp er inger hoff wald haus feld bach rath".split()
+STREETS = (
+    "Hauptstraße Bahnhofstr. Goethestraße Schillerstraße Lindenweg Gartenstraße "
+    "Dorfstraße Bergstraße Kirchweg Marktpl. Ringstraße Am Anger Karl-Marx-Str."
+).split(" ")
+
+
+def setup_django(database: str) -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.local")
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES["default"]["NAME"] = database
+
+
+def ocr_noise(value: str, rng: random.Random) -> str:
+    """One typical OCR error: a swapped, dropped or doubled letter."""
+    i = rng.randrange(1, len(value))
+    return rng.choice((
+        value[:i] + rng.choice("rnilce") + value[i + 1:],
+        value[:i] + value[i + 1:],
+        value[:i] + value[i] + value[i:],
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--zip-codes", type=int, default=500)
+    parser.add_argument("--letters", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, "bench.sqlite3"))
+
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+
+        from insurance_app.models import Customer
+        from insurance_app.services.fuzzy_matching import (
+            block_candidates,
+            fuzzy_match,
+            Scorer,
+            candidate_threshold,
+        )
+
+        call_command("migrate", verbosity=0)
+        broker = get_user_model().objects.create_user(username="bench")
+        rng = random.Random(42)
+        zip_codes = [f"{10000 + i * 17:05d}" for i in range(args.zip_codes)]
+        # Skewed like real customer bases: a few zip codes hold most customers
+        weights = [1 / (rank + 1) ** 0.5 for rank in range(len(zip_codes))]
+
+        customers = []
+        identities = set()
+        while len(customers) < args.customers:
+            customer = Customer(
+                broker=broker,
+                customer_number=f"B{len(customers):07d}",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES) if rng.random() < 0.5
+                else rng.choice(NAME_STEMS) + rng.choice(NAME_ENDINGS),
+                street=f"{rng.choice(STREETS)} {rng.randint(1, 120)}",
+                zip_code=rng.choices(zip_codes, weights)[0],
+            )
+            # bulk_create() skips save()
+            customer.normalize_identity()
+            identity = (customer.first_name_norm, customer.last_name_norm, customer.zip_code, customer.street_norm)
+            if identity in identities:
+                continue
+            identities.add(identity)
+            customers.append(customer)
+        Customer.objects.bulk_create(customers, batch_size=2000)
+
+        letters = []
+        for customer in rng.sample(customers, args.letters):
+            letters.append({
+                "first_name": customer.first_name,
+                "last_name": ocr_noise(customer.last_name, rng),
+                "street": ocr_noise(customer.street, rng),
+                "zip_code": customer.zip_code,
+            })
+
+        largest = zip_codes[0]
+        block = list(block_candidates(broker, largest))
+        per_letter = min(timeit.repeat(
+            lambda: [fuzzy_match(letter, broker) for letter in letters], number=1, repeat=3
+        )) / len(letters)
+
+        def score_block(letter):
+            scorer = Scorer(letter, candidate_threshold())
+            return [scorer.score(*stored) for _, *stored in block]
+
+        scoring = max(
+            min(timeit.repeat(lambda: score_block(letter), number=1, repeat=3))
+            for letter in letters[:20]
+        )
+
+        print(f"{args.customers} customers, {args.zip_codes} zip codes, largest block {len(block)}")
+        print(f"fuzzy_match per letter:    {per_letter * 1000:.2f}ms")
+        print(f"scoring the largest block: {scoring * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
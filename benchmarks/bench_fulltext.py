@@ -0,0 +1,107 @@
+"""
+Time customer full-text search (mode=fulltext) on a large synthetic corpus.
+
+Builds a throwaway SQLite database with --documents letters for --brokers
+brokers (inserted with raw SQL, then indexed with rebuild_search_index()) and times search_customers() for
+rare, common, multi-word and prefix queries.
+
+    python -m benchmarks.bench_fulltext [--documents 1000000] [--brokers 10]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import timeit
+
+from benchmarks.bench_contract_type import FILLER_WORDS
+from benchmarks.bench_customer_matching import FIRST_NAMES, LAST_NAMES, STREETS, setup_django
+
+CONTRACT_WORDS = (
+    "Hausratversicherung Kfz-Versicherung Haftpflicht Rechtsschutz Wohngebäude "
+    "Unfallversicherung Lebensversicherung Tierhalterhaftpflicht Reiseversicherung"
+).split()
+
+QUERIES = (
+    "Hausratversicherung",
+    "Versicherungsschein",
+    "Haftpflicht Hannover",
+    "Schadennummer 48213",
+    "Versich",
+)
+
+
+def letter(rng: random.Random) -> str:
+    words = rng.choices(FILLER_WORDS, k=60)
+    words += rng.choices(CONTRACT_WORDS, k=2)
+    words.append(f"Schadennummer {rng.randint(10000, 99999)}")
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--brokers", type=int, default=10)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, "bench.sqlite3"))
+
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from django.db import connection, transaction
+
+        from insurance_app.services.fulltext_search import rebuild_search_index, search_customers
+
+        call_command("migrate", verbosity=0)
+        brokers = [
+            get_user_model().objects.create_user(username=f"bench{i}") for i in range(args.brokers)
+        ]
+        rng = random.Random(42)
+
+        started = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO insurance_app_customer (broker_id, customer_number, active_status, "
+                "salutation, first_name, last_name, phone, street, zip_code, country, "
+                "first_name_norm, last_name_norm, street_norm, created_at, updated_at, notes) "
+                "VALUES (%s, %s, 'aktiv', '', %s, %s, '', %s, %s, 'Germany', '', '', '', "
+                "datetime('now'), datetime('now'), '')",
+                [
+                    (
+                        brokers[i % args.brokers].id, f"B{i:07d}", rng.choice(FIRST_NAMES),
+                        rng.choice(LAST_NAMES), f"{rng.choice(STREETS)} {i}", f"{30000 + i % 900}",
+                    )
+                    for i in range(args.customers)
+                ],
+            )
+            cursor.execute("SELECT id FROM insurance_app_customer")
+            customer_ids = [row[0] for row in cursor.fetchall()]
+            for start in range(0, args.documents, 50_000):
+                cursor.executemany(
+                    "INSERT INTO insurance_app_document (customer_id, file_path, content_hash, "
+                    "raw_text, policy_numbers, license_plates, contract_status, created_at) "
+                    "VALUES (%s, '', '', %s, '[]', '[]', 'aktiv', datetime('now'))",
+                    [
+                        (rng.choice(customer_ids), letter(rng))
+                        for _ in range(start, min(start + 50_000, args.documents))
+                    ],
+                )
+        rebuild_search_index()
+        print(f"{args.documents} documents, {args.customers} customers, {args.brokers} brokers "
+              f"(indexed in {time.perf_counter() - started:.0f}s)")
+
+        broker = brokers[0]
+        for query in QUERIES:
+            seconds = min(timeit.repeat(
+                lambda: search_customers(broker, query, limit=25), number=1, repeat=args.repeat
+            ))
+            hits = search_customers(broker, query, limit=25)
+            print(f"{query!r:<28} {seconds * 1000:>8.1f}ms  {len(hits)} customers")
+
+
+if __name__ == "__main__":
+    main()
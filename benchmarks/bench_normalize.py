@@ -0,0 +1,94 @@
+"""
+Compare the fused normalizer against the previous five-pass implementation.
+
+    python -m benchmarks.bench_normalize [--pages 300] [--repeat 5]
+
+Also checks that both produce identical output on a fuzzed corpus.
+"""
+import argparse
+import random
+import re
+import timeit
+
+from insurance_app.services.extract_pdf_text import iter_normalized_text, normalize_text
+
+RE_MULTI_SPACE = re.compile(r"[ \t]+")
+RE_MULTI_NEWLINES = re.compile(r"\n{2,}")
+RE_JOIN_SALUTATION_LINEBREAK = re.compile(r"(Herrn?|Frau)\s*\n\s*([A-ZÄÖÜ])")
+RE_OCR_GARBAGE = re.compile(r"[^0-9A-Za-zÄÖÜäöüß.,:/()\-\n ]")
+
+
+def legacy_normalize_text(text: str) -> str:
+    """Five-pass normalization as implemented before the fused pass."""
+    text = text.replace("\r", "")
+    text = RE_MULTI_SPACE.sub(" ", text)
+    text = RE_MULTI_NEWLINES.sub("\n", text)
+    text = RE_JOIN_SALUTATION_LINEBREAK.sub(r"\1 \2", text)
+    text = RE_OCR_GARBAGE.sub("", text)
+    return text.strip()
+
+
+# Tokens chosen to hit every rule and their interactions
+FUZZ_TOKENS = [
+    "Herr", "Herrn", "Frau", "Max", "Ärger", "Öl", "Übel", "straße", "12345",
+    "K 177-332804/1", "a", "Z", "é", "€", "„", "•", " ", "\x0c", "\x0b",
+    " ", "  ", "\t", " \t ", "\n", "\n\n", "\r\n", " \n ", "\n \n", ".", ",", "/",
+    "(", ")", "-", ":",
+]
+
+
+def fuzz_text(rng: random.Random, tokens: int) -> str:
+    return "".join(rng.choice(FUZZ_TOKENS) for _ in range(tokens))
+
+
+def fuzz_pages(rng: random.Random, pages: int, tokens: int) -> list[str]:
+    return [fuzz_text(rng, rng.randrange(tokens + 1)) for _ in range(pages)]
+
+
+def build_pages(pages: int, seed: int = 42) -> list[str]:
+    """Pages shaped like pdfium output: trailing blanks, bullets, symbols."""
+    rng = random.Random(seed)
+    words = (
+        "Sehr geehrter Herr Mustermann wir bedanken uns für Ihr Vertrauen "
+        "Beitrag 123,45 € Rechnung • Zahlung „Vertrag“ Versicherungsschein"
+    ).split()
+    result = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choices(words, k=12)) + "  " for _ in range(45)]
+        lines.insert(5, "Herrn\n   Max Mustermann")
+        result.append("\r\n".join(lines) + "\r\n\r\n")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fuzz", type=int, default=2000, help="Fuzzed samples to verify.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for _ in range(args.fuzz):
+        pages = fuzz_pages(rng, rng.randrange(1, 5), 60)
+        text = "\n".join(pages)
+        assert normalize_text(text) == legacy_normalize_text(text), repr(text)
+        assert "".join(iter_normalized_text(pages)) == legacy_normalize_text(text), repr(pages)
+    print(f"fuzz: {args.fuzz} samples identical")
+
+    pages = build_pages(args.pages)
+    text = "\n".join(pages)
+    assert normalize_text(text) == legacy_normalize_text(text)
+
+    timings = {
+        "legacy": lambda: legacy_normalize_text(text),
+        "fused": lambda: normalize_text(text),
+        "fused, per page": lambda: "".join(iter_normalized_text(pages)),
+    }
+    print(f"text: {args.pages} pages, {len(text) / 1024:.0f} KB")
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:<16} {best * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Time policy-number lookups (mode=policy, /api/policies/<number>/) against
+the JSON text search they replace, for growing document counts.
+
+Builds a throwaway SQLite database, inserts documents in steps up to
+--documents (with their rows in the policy number table) and times, after
+each step, the exact resolver, a prefix lookup and the previous
+policy_numbers__icontains scan.
+
+    python -m benchmarks.bench_policy_lookup [--documents 1000000] [--brokers 10]
+"""
+import argparse
+import os
+import random
+import tempfile
+import timeit
+
+from benchmarks.bench_customer_matching import setup_django
+
+
+def policy_number(rng: random.Random) -> str:
+    return f"{rng.choice('HKLV')} {rng.randint(100, 999)}-{rng.randint(0, 999999):06d}/{rng.randint(0, 9)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--brokers", type=int, default=10)
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, "bench.sqlite3"))
+
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from django.db import connection, transaction
+
+        from insurance_app.models import Customer
+        from insurance_app.services.policy_numbers import (
+            normalize_policy_number,
+            policies_matching,
+            resolve_policy,
+        )
+
+        call_command("migrate", verbosity=0)
+        brokers = [
+            get_user_model().objects.create_user(username=f"bench{i}") for i in range(args.brokers)
+        ]
+        rng = random.Random(42)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO insurance_app_customer (broker_id, customer_number, active_status, "
+                "salutation, first_name, last_name, phone, street, zip_code, country, "
+                "first_name_norm, last_name_norm, street_norm, created_at, updated_at, notes) "
+                "VALUES (%s, %s, 'aktiv', '', '', %s, '', '', '', 'Germany', '', '', '', "
+                "datetime('now'), datetime('now'), '')",
+                [(brokers[i % args.brokers].id, f"B{i:07d}", f"Kunde {i}") for i in range(args.customers)],
+            )
+            cursor.execute("SELECT id, broker_id FROM insurance_app_customer")
+            customers = cursor.fetchall()
+
+        broker = brokers[0]
+        wanted = None
+        inserted = 0
+        step = 10_000
+        print(f"{'documents':>10} {'resolve':>10} {'prefix':>10} {'icontains':>10}")
+        while inserted < args.documents:
+            count = min(step, args.documents) - inserted
+            rows = [(rng.choice(customers), policy_number(rng)) for _ in range(count)]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT coalesce(max(id), 0) FROM insurance_app_document")
+                next_id = cursor.fetchone()[0] + 1
+                # Raw SQL skips the post_save receivers; the table is filled alongside
+                cursor.executemany(
+                    "INSERT INTO insurance_app_document (id, customer_id, file_path, content_hash, "
+                    "policy_numbers, license_plates, contract_status, created_at) "
+                    "VALUES (%s, %s, '', '', %s, '[]', 'aktiv', datetime('now'))",
+                    [(next_id + i, customer[0], f'"{number}"') for i, (customer, number) in enumerate(rows)],
+                )
+                cursor.executemany(
+                    "INSERT INTO insurance_app_policynumber (document_id, customer_id, broker_id, "
+                    "number, display) VALUES (%s, %s, %s, %s, %s)",
+                    [
+                        (next_id + i, customer[0], customer[1], normalize_policy_number(number), number)
+                        for i, (customer, number) in enumerate(rows)
+                    ],
+                )
+            inserted += count
+            step *= 10
+            if wanted is None:
+                wanted = next((number for customer, number in rows if customer[1] == broker.id), None)
+
+            def timed(fn):
+                return min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1000
+
+            resolve = timed(lambda: resolve_policy(broker, wanted))
+            prefix = timed(lambda: list(policies_matching(broker, wanted[:6])[:25]))
+            legacy = timed(lambda: list(
+                Customer.objects.filter(broker=broker, documents__policy_numbers__icontains=wanted)
+                .distinct().order_by("id")[:25]
+            ))
+            print(f"{inserted:>10} {resolve:>8.2f}ms {prefix:>8.2f}ms {legacy:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Generate synthetic German insurance letters as PDFs.
+
+    python -m benchmarks.pdf_corpus OUT_DIR [--pages 1 10 100 300] [--seed 42]
+
+Page one carries the sender line, an address block, a greeting, policy
+numbers and a license plate; every contract type is mentioned, the main
+one most often. Further pages are terms-and-conditions filler. The fields
+each letter should yield are written to OUT_DIR/manifest.json.
+
+Only the standard library is used, so any checkout can produce a corpus.
+"""
+import argparse
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+
+FIRST_NAMES = ("Max", "Anna", "Jürgen", "Sabine", "Özlem", "Lukas", "Marie", "Thomas")
+LAST_NAMES = ("Mustermann", "Müller", "Schäfer", "Becker", "Wagner", "Özdemir", "Hoffmann")
+STREETS = ("Musterstraße", "Hauptstraße", "Am Lindenhof", "Bahnhofstr.", "Gartenweg")
+CITIES = (
+    ("10115", "Berlin"),
+    ("30159", "Hannover"),
+    ("50667", "Köln"),
+    ("80331", "München"),
+    ("90402", "Nürnberg"),
+    ("60311", "Frankfurt am Main"),
+)
+PLATE_PREFIXES = ("B", "H", "K", "M", "N", "F", "HH", "WOB")
+
+# Main product sentence per contract type key (see CONTRACT_RULES)
+CONTRACT_SENTENCES = {
+    "kfz": "Ihre Kfz-Versicherung (Teilkasko) wurde angepasst.",
+    "hausrat": "Ihre Hausratversicherung schützt Ihren Hausrat.",
+    "haftpflicht": "Die Privathaftpflicht ist Ihre Haftpflicht gegenüber Dritten.",
+    "rechtsschutz": "Der Rechtsschutz umfasst Verkehrs- und Wohnungsrechtsschutz.",
+    "wohngebaeude": "Die Wohngebäudeversicherung gilt für das Wohngebäude.",
+    "unfall": "Die Unfallversicherung leistet nach der Gliedertaxe.",
+    "berufsunfaehigkeit": "Die Berufsunfähigkeit-Rente (BU-Rente) wird monatlich gezahlt.",
+    "krankenversicherung": "Ihre private Krankenversicherung (PKV) im Überblick.",
+}
+
+FILLER_WORDS = (
+    "Versicherungsnehmer Beitrag Leistung Vertrag Laufzeit Bedingungen Tarif "
+    "Schadenfall Selbstbeteiligung Kündigung Zahlungsweise jährlich monatlich "
+    "Versicherungsschutz gilt nach Maßgabe der folgenden Bestimmungen sofern "
+    "nichts anderes vereinbart ist und der Beitrag rechtzeitig gezahlt wurde"
+).split()
+
+LINES_PER_PAGE = 45
+
+
+@dataclass
+class Letter:
+    pages: list[list[str]]
+    expected: dict = field(default_factory=dict)
+
+
+def generate_letter(rng: random.Random, page_count: int) -> Letter:
+    """Build the text lines of one letter and the fields it should yield."""
+    salutation = rng.choice(("Herrn", "Frau"))
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    street = f"{rng.choice(STREETS)} {rng.randint(1, 120)}"
+    zip_code, city = rng.choice(CITIES)
+    policy_numbers = [
+        f"K {rng.randint(100, 999)}-{rng.randint(100000, 999999)}/{rng.randint(0, 9)}"
+        for _ in range(rng.randint(1, 3))
+    ]
+    plate = (
+        f"{rng.choice(PLATE_PREFIXES)}-"
+        f"{''.join(rng.choices('ABCDEFGHKLMNPRSTUVXYZ', k=2))} {rng.randint(1, 9999)}"
+    )
+    contract_type = rng.choice(list(CONTRACT_SENTENCES))
+    greeting = "Sehr geehrter Herr" if salutation == "Herrn" else "Sehr geehrte Frau"
+
+    first_page = [
+        "Muster Versicherung AG · Postfach 1234 · 30159 Hannover",
+        "",
+        salutation,
+        f"{first_name} {last_name}",
+        street,
+        f"{zip_code} {city}",
+        "",
+        f"Hannover, {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025",
+        f"Versicherungsschein-Nr. {policy_numbers[0]}",
+        f"Amtl. Kennz.: {plate}",
+        "",
+        f"{greeting} {last_name},",
+        "",
+        CONTRACT_SENTENCES[contract_type],
+        CONTRACT_SENTENCES[contract_type],
+        "Ihre weiteren Verträge bei uns:",
+    ]
+    first_page += [
+        sentence for key, sentence in CONTRACT_SENTENCES.items() if key != contract_type
+    ]
+    first_page += [f"Weiterer Vertrag: {number}" for number in policy_numbers[1:]]
+    first_page += ["", "Mit freundlichen Grüßen", "Ihre Muster Versicherung AG"]
+
+    pages = [first_page]
+    for number in range(2, page_count + 1):
+        lines = [f"Seite {number} von {page_count}", ""]
+        lines += [" ".join(rng.choices(FILLER_WORDS, k=9)) for _ in range(LINES_PER_PAGE)]
+        pages.append(lines)
+
+    return Letter(
+        pages=pages,
+        expected={
+            "salutation": salutation,
+            "first_name": first_name,
+            "last_name": last_name,
+            "street": street,
+            "zip_code": zip_code,
+            "city": city,
+            "policy_numbers": policy_numbers[0],
+            "license_plates": [plate],
+            "contract_typ": contract_type,
+        },
+    )
+
+
+def write_corpus(out_dir: Path, page_counts: list[int], seed: int = 42) -> dict:
+    """Write one letter per page count plus manifest.json; return the manifest."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = {}
+    for index, page_count in enumerate(page_counts, start=1):
+        letter = generate_letter(rng, page_count)
+        name = f"letter_{index:02d}_{page_count}p.pdf"
+        write_text_pdf(out_dir / name, letter.pages)
+        manifest[name] = {"pages": page_count, **letter.expected}
+
+    with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+# -------------------------
+# Minimal PDF writer
+# -------------------------
+
+
+def _escape_pdf_text(line: str) -> bytes:
+    raw = line.encode("cp1252")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def write_text_pdf(path, pages: list[list[str]]) -> None:
+    """Write a minimal PDF with one Helvetica text line per list entry."""
+    page_count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids ["
+        + b" ".join(f"{4 + 2 * i} 0 R".encode() for i in range(page_count))
+        + f"] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica"
+        b" /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, lines in enumerate(pages):
+        stream = b"BT /F1 11 Tf 14 TL 60 780 Td\n" + b"".join(
+            b"(" + _escape_pdf_text(line) + b") Tj T*\n" for line in lines
+        ) + b"ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842]"
+            b" /Resources << /Font << /F1 3 0 R >> >>"
+            + f" /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 300])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    manifest = write_corpus(args.out_dir, args.pages, seed=args.seed)
+    for name, expected in manifest.items():
+        print(f"{args.out_dir / name}  ({expected['pages']} pages, {expected['contract_typ']})")
+
+
+if __name__ == "__main__":
+    main()
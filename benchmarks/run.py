@@ -0,0 +1,211 @@
+"""
+Benchmark the extraction pipeline on a synthetic letter corpus.
+
+    python -m benchmarks.run [--pages 1 10 100 300] [--repeat 3] [--engine pdfium]
+    python -m benchmarks.run --compare main [HEAD]
+
+Reports per-stage timings (best of --repeat), pages/sec of the full
+extraction, peak Python memory (tracemalloc; native pdfium buffers are not
+traced) and whether the extracted fields match the corpus manifest (see
+benchmarks.pdf_corpus).
+
+--compare checks out each revision into a temporary git worktree and runs
+it against the same corpus; without a second revision the current working
+tree is compared. Stages only use functions every revision has, and
+keyword arguments a revision does not know yet (engine, use_cache) are
+dropped.
+"""
+import argparse
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+STAGES = ("read", "normalize", "address", "policy", "plate", "contract", "extract")
+WORKING_TREE = "working tree"
+
+
+def setup_django(source: Path) -> None:
+    sys.path.insert(0, str(source))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.local")
+    # Measure extraction, not the content-hash cache
+    os.environ["PDF_EXTRACTION_CACHE_MAX_BYTES"] = "0"
+
+    import django
+
+    django.setup()
+
+
+def _call(func, *args, **kwargs):
+    """Call func, dropping keyword arguments its signature does not accept."""
+    params = inspect.signature(func).parameters
+    return func(*args, **{key: value for key, value in kwargs.items() if key in params})
+
+
+def _best_ms(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def bench_file(path: Path, expected: dict, engine: str, repeat: int) -> dict:
+    from insurance_app.services import extract_pdf_text as ext
+
+    def read():
+        return _call(ext._read_pdf_text, str(path), workers=1, engine=engine)
+
+    def extract():
+        return _call(
+            ext.extract_pdf_text, str(path), workers=1, engine=engine, use_cache=False
+        )
+
+    raw_text = read()
+    normalized = ext.normalize_text(raw_text)
+    stages = {
+        "read": read,
+        "normalize": lambda: ext.normalize_text(raw_text),
+        "address": lambda: ext._extract_address_block(normalized),
+        "policy": lambda: ext.extract_policy_numbers(normalized),
+        "plate": lambda: ext.extract_license_plate(normalized),
+        "contract": lambda: ext.extract_contract_type(normalized),
+        "extract": extract,
+    }
+    timings = {name: _best_ms(func, repeat) for name, func in stages.items()}
+
+    tracemalloc.start()
+    try:
+        payload = extract()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    pages = expected["pages"]
+    return {
+        "file": path.name,
+        "pages": pages,
+        "size_bytes": path.stat().st_size,
+        "timings_ms": timings,
+        "pages_per_sec": pages / (timings["extract"] / 1000),
+        "peak_mib": peak_bytes / (1024 * 1024),
+        "mismatches": sorted(
+            key for key, value in expected.items() if key != "pages" and payload.get(key) != value
+        ),
+    }
+
+
+def bench_corpus(corpus: Path, engine: str, repeat: int) -> list[dict]:
+    with open(corpus / "manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return [
+        bench_file(corpus / name, expected, engine, repeat)
+        for name, expected in manifest.items()
+    ]
+
+
+def bench_revision(rev: str, corpus: Path, args) -> list[dict]:
+    """Run this script in a subprocess against a worktree checkout of `rev`."""
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        source = Path(tmp) / "src"
+        if rev == WORKING_TREE:
+            source = REPO_ROOT
+        else:
+            subprocess.run(
+                ["git", "-C", str(REPO_ROOT), "worktree", "add", "--detach", str(source), rev],
+                check=True,
+                capture_output=True,
+            )
+        try:
+            result = subprocess.run(
+                [
+                    sys.executable, str(Path(__file__).resolve()),
+                    "--corpus", str(corpus), "--source", str(source), "--json",
+                    "--engine", args.engine, "--repeat", str(args.repeat),
+                ],
+                cwd=source,
+                check=True,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+        finally:
+            if rev != WORKING_TREE:
+                subprocess.run(
+                    ["git", "-C", str(REPO_ROOT), "worktree", "remove", "--force", str(source)],
+                    capture_output=True,
+                )
+    return json.loads(result.stdout)
+
+
+def print_results(results: list[dict]) -> None:
+    header = f"{'file':<22} {'pages':>5} {'KiB':>7} " + " ".join(f"{s:>9}" for s in STAGES)
+    print(header + f" {'pages/s':>8} {'peak MiB':>8}  fields")
+    for r in results:
+        timings = " ".join(f"{r['timings_ms'][s]:9.2f}" for s in STAGES)
+        fields = ", ".join(r["mismatches"]) or "ok"
+        print(
+            f"{r['file']:<22} {r['pages']:>5} {r['size_bytes'] / 1024:7.0f} {timings}"
+            f" {r['pages_per_sec']:8.1f} {r['peak_mib']:8.2f}  {fields}"
+        )
+    print("(timings in ms, best of --repeat)")
+
+
+def print_comparison(base_rev: str, base: list[dict], head_rev: str, head: list[dict]) -> None:
+    print(f"{'file':<22} {'metric':<10} {base_rev[:12]:>12} {head_rev[:12]:>12} {'change':>8}")
+    for old, new in zip(base, head):
+        rows = [(s, old["timings_ms"][s], new["timings_ms"][s]) for s in STAGES]
+        rows.append(("peak MiB", old["peak_mib"], new["peak_mib"]))
+        for metric, before, after in rows:
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{old['file']:<22} {metric:<10} {before:12.2f} {after:12.2f} {change:+7.1f}%")
+        for label, r in ((base_rev, old), (head_rev, new)):
+            if r["mismatches"]:
+                print(f"{old['file']:<22} {label}: wrong {', '.join(r['mismatches'])}")
+    print("(timings in ms, best of --repeat)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 300])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engine", default="pdfium")
+    parser.add_argument("--corpus", type=Path, help="Existing corpus directory to use.")
+    parser.add_argument("--compare", nargs="+", metavar="REV", help="One or two git revisions.")
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON.")
+    parser.add_argument("--source", type=Path, default=REPO_ROOT, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-corpus-") as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            from benchmarks.pdf_corpus import write_corpus
+
+            corpus = Path(tmp)
+            write_corpus(corpus, args.pages, seed=args.seed)
+
+        if args.compare:
+            from dotenv import load_dotenv
+
+            # Worktrees have no .env of their own
+            load_dotenv(REPO_ROOT / ".env")
+            base_rev, head_rev = (args.compare + [WORKING_TREE])[:2]
+            base = bench_revision(base_rev, corpus, args)
+            head = bench_revision(head_rev, corpus, args)
+            print_comparison(base_rev, base, head_rev, head)
+            return
+
+        setup_django(args.source)
+        results = bench_corpus(corpus, args.engine, args.repeat)
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -190,6 +190,100 @@ CUSTOMER_DOCUMENT_ROOT = require_env("CUSTOMER_DOCUMENT_ROOT")
 UNASSIGNED_DOCUMENT_ROOT = require_env("UNASSIGNED_DOCUMENT_ROOT")
 DOCUMENT_IMPORT_TOKEN = os.getenv("DOCUMENT_IMPORT_TOKEN", "")
 
+# Import of a file that was imported before (same SHA-256): "existing"
+# returns the stored document, "link" adds a document row sharing its file,
+# "reject" answers 409, "off" imports it again
+DOCUMENT_DEDUPE_POLICY = os.getenv("DOCUMENT_DEDUPE_POLICY", "existing")
+
+# Customer matching when no exact match exists: customers of the same zip
+# code are scored 0..1 on name and street; the best one is taken from
+# CUSTOMER_MATCH_THRESHOLD with CUSTOMER_MATCH_MARGIN over the second best,
+# otherwise customers from CUSTOMER_CANDIDATE_THRESHOLD are returned (409)
+CUSTOMER_MATCH_THRESHOLD = float(os.getenv("CUSTOMER_MATCH_THRESHOLD", "0.85"))
+CUSTOMER_MATCH_MARGIN = float(os.getenv("CUSTOMER_MATCH_MARGIN", "0.08"))
+CUSTOMER_CANDIDATE_THRESHOLD = float(os.getenv("CUSTOMER_CANDIDATE_THRESHOLD", "0.7"))
+CUSTOMER_MATCH_MAX_CANDIDATES = int(os.getenv("CUSTOMER_MATCH_MAX_CANDIDATES", "5"))
+
+# In-process index of each broker's customers for import-time matching
+# (batch imports, inbox watcher, import workers). Kept coherent with the
+# customers saved in the same process; changes made elsewhere show up after
+# CUSTOMER_INDEX_TTL seconds
+CUSTOMER_INDEX_ENABLED = os.getenv("CUSTOMER_INDEX_ENABLED", "false").strip().lower() in ("true", "1", "yes")
+CUSTOMER_INDEX_MAX_BROKERS = int(os.getenv("CUSTOMER_INDEX_MAX_BROKERS", "8"))
+CUSTOMER_INDEX_TTL = int(os.getenv("CUSTOMER_INDEX_TTL", "300"))
+
+# Customer search mode=fulltext (FTS5 on SQLite, tsvector on PostgreSQL);
+# customers are ranked by their matches among the newest CANDIDATES letters
+CUSTOMER_SEARCH_MAX_RESULTS = int(os.getenv("CUSTOMER_SEARCH_MAX_RESULTS", "200"))
+CUSTOMER_SEARCH_CANDIDATES = int(os.getenv("CUSTOMER_SEARCH_CANDIDATES", "1000"))
+
+# Customer autocomplete (customers/autocomplete/): in-process prefix index
+# per broker, updated with the customers and plates saved in the same
+# process; changes made elsewhere show up after CUSTOMER_AUTOCOMPLETE_TTL
+CUSTOMER_AUTOCOMPLETE_LIMIT = int(os.getenv("CUSTOMER_AUTOCOMPLETE_LIMIT", "10"))
+CUSTOMER_AUTOCOMPLETE_MAX_BROKERS = int(os.getenv("CUSTOMER_AUTOCOMPLETE_MAX_BROKERS", "32"))
+CUSTOMER_AUTOCOMPLETE_TTL = int(os.getenv("CUSTOMER_AUTOCOMPLETE_TTL", "300"))
+
+# Batch import (import-documents-from-pdfs/): files extracted concurrently,
+# database writes grouped into transactions of BATCH_IMPORT_TRANSACTION_SIZE
+BATCH_IMPORT_MAX_ITEMS = int(os.getenv("BATCH_IMPORT_MAX_ITEMS", "500"))
+BATCH_IMPORT_WORKERS = int(os.getenv("BATCH_IMPORT_WORKERS", "4"))
+BATCH_IMPORT_TRANSACTION_SIZE = int(os.getenv("BATCH_IMPORT_TRANSACTION_SIZE", "50"))
+
+# Concurrent imports per host (all gunicorn and queue workers, 0 = no limit);
+# requests beyond the limit get 429 with Retry-After: IMPORT_RETRY_AFTER
+IMPORT_MAX_CONCURRENT = int(os.getenv("IMPORT_MAX_CONCURRENT", "2"))
+IMPORT_MAX_CONCURRENT_PER_BROKER = int(os.getenv("IMPORT_MAX_CONCURRENT_PER_BROKER", "1"))
+IMPORT_RETRY_AFTER = int(os.getenv("IMPORT_RETRY_AFTER", "10"))
+IMPORT_LIMIT_DIR = os.getenv("IMPORT_LIMIT_DIR", "")
+
+# Multipart uploads (upload-document/) are streamed to FILE_UPLOAD_TEMP_DIR
+IMPORT_UPLOAD_MAX_MB = int(os.getenv("IMPORT_UPLOAD_MAX_MB", "200"))
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR") or None
+
+# Queued imports (async=true, processed by `manage.py run_import_workers`):
+# failed attempts are retried after IMPORT_JOB_RETRY_BACKOFF * 2^n seconds,
+# jobs of a worker silent for IMPORT_JOB_LOCK_TIMEOUT seconds are taken over
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_JOB_MAX_ATTEMPTS = int(os.getenv("IMPORT_JOB_MAX_ATTEMPTS", "3"))
+IMPORT_JOB_RETRY_BACKOFF = float(os.getenv("IMPORT_JOB_RETRY_BACKOFF", "30"))
+IMPORT_JOB_LOCK_TIMEOUT = float(os.getenv("IMPORT_JOB_LOCK_TIMEOUT", "600"))
+
+# Watched inbox (`manage.py watch_inbox`): PDFs are imported for
+# IMPORT_INBOX_BROKER_ID once unchanged for IMPORT_INBOX_STABLE_SECONDS
+IMPORT_INBOX_DIR = os.getenv("IMPORT_INBOX_DIR", "")
+IMPORT_INBOX_BROKER_ID = int(os.getenv("IMPORT_INBOX_BROKER_ID") or 0) or None
+IMPORT_INBOX_WORKERS = int(os.getenv("IMPORT_INBOX_WORKERS", "2"))
+IMPORT_INBOX_STABLE_SECONDS = float(os.getenv("IMPORT_INBOX_STABLE_SECONDS", "2"))
+
+# Import stage timings: Server-Timing response header, and the Prometheus
+# endpoint /api/metrics/import/ (scraped with "Authorization: Bearer <token>").
+# The histograms of all workers on the host are summed in IMPORT_METRICS_FILE
+# (default: in the temp directory)
+IMPORT_TIMING_HEADER = os.getenv("IMPORT_TIMING_HEADER", str(DEBUG)).strip().lower() in ("true", "1", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+IMPORT_METRICS_FILE = os.getenv("IMPORT_METRICS_FILE", "")
+
+# PDF text extraction: "pdfium" (fast, falls back to pdfplumber when no address
+# block is found) or "pdfplumber". Pages are sharded across a process pool when a
+# document has at least PDF_EXTRACT_PARALLEL_MIN_PAGES pages (1 = sequential)
+PDF_TEXT_ENGINE = os.getenv("PDF_TEXT_ENGINE", "pdfium")
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+PDF_EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("PDF_EXTRACT_PARALLEL_MIN_PAGES", "8"))
+
+# Pages are read in a supervised child process that is killed after
+# PDF_EXTRACT_TIMEOUT seconds per document or above PDF_EXTRACT_MAX_RSS_MB of
+# memory (0 = no limit; both 0 = read in the request process). Children come
+# from a forkserver that loads Django once per process. Keep the timeout
+# below gunicorn's worker timeout (30 s by default)
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "20"))
+PDF_EXTRACT_MAX_RSS_MB = int(os.getenv("PDF_EXTRACT_MAX_RSS_MB", "1024"))
+
+# Extraction payloads cached by PDF content hash (LRU, 0 = disabled)
+PDF_EXTRACTION_CACHE_MAX_BYTES = int(
+    os.getenv("PDF_EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+
 
 CSRF_COOKIE_DOMAIN = os.getenv("CSRF_COOKIE_DOMAIN", None)
 SESSION_COOKIE_DOMAIN = os.getenv("SESSION_COOKIE_DOMAIN", None)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from ..models import Customer, Document, CustomerShareLink
+from ..models import Customer, Document, CustomerShareLink, ImportJob
 from django.urls import reverse
 from django.conf import settings
 
@@ -61,6 +61,23 @@ class CustomerSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class CustomerSearchResultSerializer(CustomerSerializer):
+    """Customer plus why it matched (mode=fulltext)."""
+
+    search = serializers.SerializerMethodField()
+
+    def get_search(self, obj):
+        hit = self.context.get("search_hits", {}).get(obj.id)
+        if hit is None:
+            return None
+        return {
+            "score": round(hit.score, 4),
+            # HTML-escaped, matches wrapped in <mark>
+            "snippet": hit.snippet,
+            "document_id": hit.document_id,
+        }
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     customer = CustomerSerializer(read_only=True)
     file_url = serializers.SerializerMethodField()
@@ -78,3 +95,12 @@ class DocumentSerializer(serializers.ModelSerializer):
     def get_contract_typ_display(self, obj):
         # IMPORTANT: Django provides get_<field>_display() for choices
         return obj.get_contract_typ_display() if obj.contract_typ else None
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ["id", "pdf_path", "status", "attempts", "max_attempts",
+                  "available_at", "created_at", "started_at", "finished_at",
+                  "timings", "result_status_code", "result", "last_error"]
+        read_only_fields = fields
@@ -4,7 +4,12 @@ from .views import (
     CustomerViewSet,
     DocumentViewSet,
     DocumentImportView,
+    DocumentBatchImportView,
+    DocumentUploadView,
+    ImportJobDetailView,
+    ImportMetricsView,
     DocumentFileView,
+    PolicyResolverView,
     PublicCustomerView,
     PublicDocumentFileView,
     CustomerShareLinkListCreateView, 
@@ -23,7 +28,17 @@ urlpatterns = [
         DocumentImportView.as_view(),
         name="import_document_from_pdf",
     ),
+    path(
+        "import-documents-from-pdfs/",
+        DocumentBatchImportView.as_view(),
+        name="import_documents_from_pdfs",
+    ),
+    path("upload-document/", DocumentUploadView.as_view(), name="upload_document"),
+    path("import-jobs/<int:job_id>/", ImportJobDetailView.as_view(), name="import_job_detail"),
+    path("metrics/import/", ImportMetricsView.as_view(), name="import_metrics"),
     path("documents/<int:pk>/file/", DocumentFileView.as_view(), name="document_file"),
+    # path: policy numbers may contain "/" ("K 123-456789/0")
+    path("policies/<path:number>/", PolicyResolverView.as_view(), name="policy_resolver"),
     path("public/customer/<str:token>/", PublicCustomerView.as_view(), name="public-customer"),
     path("public/customer/<str:token>/document/<int:document_id>/file/", PublicDocumentFileView.as_view(), name="public-doc-file"),
     path("customers/<int:customer_id>/share-links/", CustomerShareLinkListCreateView.as_view(), name="customer-share-links"),
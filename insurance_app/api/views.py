@@ -1,27 +1,53 @@
+import json
 import logging
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Q
-from django.http import FileResponse, Http404
+from django.db import transaction
+from django.db.models import Case, Q, When
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
 from rest_framework import status, viewsets
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import date
 from rest_framework.decorators import action
 
-from authentication_app.api.permissions import HasImportToken, IsInWhitelistGroup
-
-from ..models import Customer, Document, CustomerShareLink
-from .serializers import CustomerSerializer, DocumentSerializer, PublicCustomerSerializer, CustomerShareLinkSerializer
-from ..services.extract_pdf_text import extract_pdf_text
+from authentication_app.api.permissions import HasImportToken, HasMetricsToken, IsInWhitelistGroup
+
+from ..models import Customer, Document, CustomerShareLink, ImportJob
+from .serializers import CustomerSerializer, CustomerSearchResultSerializer, DocumentSerializer, PublicCustomerSerializer, CustomerShareLinkSerializer, ImportJobSerializer
+from ..services.customer_autocomplete import autocomplete_customers
+from ..services.customer_index import customer_index
+from ..services.document_dedupe import (
+    dedupe_policy,
+    discard_duplicate_file,
+    file_content_hash,
+    find_duplicate,
+    link_duplicate,
+)
+from ..services.extract_pdf_text import StagedPDFExtraction
+from ..services.fulltext_search import search_customers
+from ..services.import_jobs import enqueue_import
+from ..services.license_plates import customer_vehicles, plates_matching
+from ..services.policy_numbers import policies_matching, resolve_policy
+from ..services.import_limits import ImportLimitExceeded, import_slot, render_in_flight
+from ..services.import_metrics import record_import, render_metrics
+from ..services.isolated_extraction import ExtractionLimitExceeded
+from ..services.stage_timing import StageTimer
+from ..services.pdf_upload import HashingUploadHandler, staged_upload, upload_max_bytes
 from ..services.move_pdf import move_pdf_to_customer_folder, move_pdf_to_unassigned_folder
 from ..services.customer_matching import (
     find_or_create_customer,
     AmbiguousCustomerError,
     UnresolvedCustomerError,
 )
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 
@@ -156,13 +182,22 @@ class CustomerViewSet(viewsets.ModelViewSet):
             return qs.order_by("id")
 
         # -----------------------------------------
-        # Mode: Kennzeichen (über Documents -> Customer)
+        # Mode: Kennzeichen (über die Kennzeichen-Tabelle)
         # -----------------------------------------
         if mode == "license":
-            plate = self._normalize_license_plate(q)
-            qs = qs.filter(
-                documents__license_plates__icontains=plate
-            ).distinct()
+            # Prefix lookup in the plate table, exact with ?exact=true
+            exact = (self.request.query_params.get("exact") or "").lower() in ("1", "true")
+            plates = plates_matching(self.request.user, q, exact=exact)
+            qs = qs.filter(id__in=plates.values("customer_id"))
+            return qs.order_by("id")
+
+        # -----------------------------------------
+        # Mode: Versicherungsnummer (über die Vertrags-Tabelle)
+        # -----------------------------------------
+        if mode == "policy":
+            exact = (self.request.query_params.get("exact") or "").lower() in ("1", "true")
+            policies = policies_matching(self.request.user, q, exact=exact)
+            qs = qs.filter(id__in=policies.values("customer_id"))
             return qs.order_by("id")
 
         # -----------------------------
@@ -195,13 +230,32 @@ class CustomerViewSet(viewsets.ModelViewSet):
 
             return qs.order_by("id")
 
+        # -----------------------------------------
+        # Mode: Volltext (Name, Adresse, Text der Briefe)
+        # -----------------------------------------
+        if mode == "fulltext":
+            hits = search_customers(self.request.user, q)
+            self.search_hits = {hit.customer_id: hit for hit in hits}
+            if not hits:
+                return qs.none()
+            # Keep the ranking of the search
+            ranking = Case(
+                *[When(id=hit.customer_id, then=position) for position, hit in enumerate(hits)]
+            )
+            return qs.filter(id__in=list(self.search_hits)).order_by(ranking)
+
         # Fallback: wenn mode Müll ist → lieber nichts finden statt "alles"
         return Customer.objects.none()
-    
-    def _normalize_license_plate(self, value: str) -> str:
-        # Normalize input to match OCR storage format as closely as possible.
-        return " ".join(value.strip().upper().split())
-    
+
+    def get_serializer_class(self):
+        if getattr(self, "search_hits", None) is not None:
+            return CustomerSearchResultSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["search_hits"] = getattr(self, "search_hits", None) or {}
+        return context
     
     def perform_create(self, serializer):
         serializer.save(broker=self.request.user)
@@ -212,6 +266,19 @@ class CustomerViewSet(viewsets.ModelViewSet):
             "count": self.get_queryset().count()
         })
 
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    def autocomplete(self, request):
+        """Top customers for the search box, from memory: no paging, no COUNT."""
+        q = (request.query_params.get("q") or "").strip()
+        limit = request.query_params.get("limit") or ""
+        results = autocomplete_customers(request.user, q, int(limit) if limit.isdigit() else None)
+        return Response({"results": results})
+
+    @action(detail=True, methods=["get"], url_path="vehicles")
+    def vehicles(self, request, pk=None):
+        """License plates found in the customer's letters."""
+        return Response(customer_vehicles(self.get_object()))
+
 class DocumentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsInWhitelistGroup]
     serializer_class = DocumentSerializer
@@ -231,6 +298,46 @@ class DocumentViewSet(viewsets.ModelViewSet):
         return queryset
 
 
+class PolicyResolverView(APIView):
+    """The customer and documents of one policy number (exact match)."""
+
+    permission_classes = [IsAuthenticated, IsInWhitelistGroup]
+
+    def get(self, request, number: str):
+        policies = resolve_policy(request.user, number)
+        if not policies:
+            raise Http404("Policy not found")
+
+        customers = {policy.customer_id: policy.customer for policy in policies}
+        if len(customers) > 1:
+            candidates = [
+                {
+                    "id": customer.id,
+                    "first_name": customer.first_name,
+                    "last_name": customer.last_name,
+                    "customer_number": customer.customer_number,
+                }
+                for customer in customers.values()
+            ]
+            return Response(
+                {
+                    "error": "Multiple customers found for this policy number.",
+                    "candidates": candidates,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        customer = policies[0].customer
+        for policy in policies:
+            # Same customer; avoids a query per document in the serializer
+            policy.document.customer = customer
+        return Response({
+            "policy_number": policies[0].display,
+            "customer": CustomerSerializer(customer).data,
+            "documents": DocumentSerializer([policy.document for policy in policies], many=True).data,
+        })
+
+
 class DocumentImportView(APIView):
     authentication_classes = []
     permission_classes = [HasImportToken]
@@ -249,28 +356,97 @@ class DocumentImportView(APIView):
             )
 
         pdf_path = pdf_path.strip()
+        if str(request.data.get("async", "")).lower() in ("1", "true", "yes"):
+            job = enqueue_import(pdf_path, broker)
+            return Response(
+                {
+                    "job_id": job.id,
+                    "status": job.status,
+                    "status_url": reverse("import_job_detail", kwargs={"job_id": job.id}),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        try:
+            with import_slot(broker.id):
+                return self.import_pdf(pdf_path, broker, request)
+        except ImportLimitExceeded as e:
+            return self._limit_response(e)
 
-        # 1) Extract data from PDF
-        infos, error_response = self._extract_infos(pdf_path)
+    def import_pdf(self, pdf_path, broker, request=None, content_hash=None):
+        """Run the import pipeline for one file (also used by the import workers)."""
+        self.timer = StageTimer()
+        self.document_stats = {"page_count": None, "file_size": None}
+
+        with self.timer.stage("total"):
+            response = self._import(pdf_path, broker, request, content_hash)
+
+        self._record_timings(response)
+        if getattr(settings, "IMPORT_TIMING_HEADER", False):
+            response["Server-Timing"] = self.timer.server_timing()
+        return response
+
+    def _import(self, pdf_path, broker, request, content_hash=None):
+        try:
+            self.document_stats["file_size"] = os.path.getsize(pdf_path)
+        except OSError:
+            pass
+
+        # 0) Short-circuit files that were imported before
+        with self.timer.stage("hash"):
+            content_hash = content_hash or file_content_hash(pdf_path)
+            duplicate = find_duplicate(content_hash, broker)
+        if duplicate is not None:
+            return self._duplicate_response(pdf_path, duplicate, request)
+
+        # 1) Extract the address block (only page one if it has one)
+        extraction = StagedPDFExtraction(pdf_path, content_hash=content_hash or None)
+        with self.timer.stage("extract"):
+            customer_infos, error_response = self._extract_infos(
+                pdf_path, extraction.customer_fields)
         if error_response:
+            self.timer.merge(extraction.timer, prefix="extract.")
             return error_response
 
         # 2) Build customer payload from OCR data
-        customer_data = self._build_customer_data(infos)
-
-        # 3) Find or create customer (OCR-safe logic lives in service)
-        customer, created, error_response = self._resolve_customer(
-            customer_data, broker)
+        with self.timer.stage("build_payload"):
+            customer_data = self._build_customer_data(customer_infos)
+
+        # 3) Find the customer (OCR-safe logic lives in service); a new one
+        # is not written before the rest of the letter could be read
+        with self.timer.stage("resolve_customer"):
+            customer, created, error_response = self._resolve_customer(
+                customer_data, broker, create=False)
         if error_response:
+            self.timer.merge(extraction.timer, prefix="extract.")
             return error_response
 
-        # 4) Move PDF into customer folder
-        new_file_path, error_response = self._move_pdf(pdf_path, customer)
+        # 4) Extract the remaining pages (raw text, policy numbers, plates)
+        with self.timer.stage("extract"):
+            infos, error_response = self._extract_infos(pdf_path, extraction.to_dict)
+        self.timer.merge(extraction.timer, prefix="extract.")
+        if error_response:
+            return error_response
+        self.document_stats["page_count"] = infos.get("page_count")
+
+        # 5) Create the customer (matched again: another import may have
+        # created it meanwhile)
+        if customer is None and created:
+            with self.timer.stage("resolve_customer"):
+                customer, created, error_response = self._resolve_customer(
+                    customer_data, broker)
+            if error_response:
+                return error_response
+
+        # 6) Move PDF into customer folder
+        with self.timer.stage("move_file"):
+            new_file_path, error_response = self._move_pdf(pdf_path, customer)
         if error_response:
             return error_response
 
-        # 5) Create document entry
-        document = self._create_document(customer, new_file_path, infos)
+        # 7) Create document entry
+        with self.timer.stage("create_document"):
+            document = self._create_document(customer, new_file_path, infos, content_hash)
 
         return Response(
             {
@@ -283,14 +459,73 @@ class DocumentImportView(APIView):
             status=status.HTTP_201_CREATED,
         )
 
-    def _extract_infos(self, pdf_path):
+    def _limit_response(self, e):
+        """429 while the import slots are taken, so requests do not pile up."""
+        response = Response(
+            {"error": str(e), "scope": e.scope, "retry_after": e.retry_after},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        response["Retry-After"] = str(e.retry_after)
+        return response
+
+    def _duplicate_response(self, pdf_path, existing, request):
+        policy = dedupe_policy()
+        logger.info("Duplicate PDF import", extra={
+                    "pdf_path": pdf_path, "document_id": existing.id, "policy": policy})
+        if policy == "reject":
+            return Response(
+                {"error": "Document already imported.", "duplicate_of": existing.id},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if policy == "link":
+            document = link_duplicate(existing)
+            response_status = status.HTTP_201_CREATED
+        else:
+            document = existing
+            response_status = status.HTTP_200_OK
+        discard_duplicate_file(pdf_path, existing)
+
+        return Response(
+            {
+                "customer_created": False,
+                "duplicate_of": existing.id,
+                "customer": CustomerSerializer(document.customer).data,
+                "document": DocumentSerializer(
+                    document, context={"request": request}
+                ).data,
+            },
+            status=response_status,
+        )
+
+    def _record_timings(self, response):
+        record_import(self.timer.seconds, **self.document_stats)
+        logger.info(
+            "Document import finished",
+            extra={
+                "status_code": response.status_code,
+                "stages_ms": self.timer.milliseconds(),
+                **self.document_stats,
+            },
+        )
+
+    def _extract_infos(self, pdf_path, extract):
         try:
-            return extract_pdf_text(pdf_path), None
+            return extract(), None
         except FileNotFoundError:
             return None, Response(
                 {"error": f"File not found: {pdf_path}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except ExtractionLimitExceeded as e:
+            # Park the file so the inbox is not retried with it forever
+            logger.warning("PDF extraction limit exceeded", extra={
+                           "pdf_path": pdf_path, "limit": e.limit})
+            new_file_path, _ = self._move_pdf(pdf_path, None)
+            return None, Response(
+                {"error": str(e), "limit": e.limit, "file_path": new_file_path},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
         except Exception:
             logger.exception("Failed to read PDF", extra={
                              "pdf_path": pdf_path})
@@ -299,10 +534,10 @@ class DocumentImportView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-    def _resolve_customer(self, customer_data, broker):
+    def _resolve_customer(self, customer_data, broker, create=True):
         try:
             customer, created = find_or_create_customer(
-                customer_data, broker=broker)
+                customer_data, broker=broker, create=create)
             return customer, created, None
         except UnresolvedCustomerError:
             return None, False, None
@@ -313,8 +548,9 @@ class DocumentImportView(APIView):
                     "first_name": customer.first_name,
                     "last_name": customer.last_name,
                     "customer_number": customer.customer_number,
+                    "score": score,
                 }
-                for customer in e.candidates
+                for customer, score in zip(e.candidates, e.scores)
             ]
             return (
                 None,
@@ -354,10 +590,11 @@ class DocumentImportView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-    def _create_document(self, customer, new_file_path, infos):
+    def _create_document(self, customer, new_file_path, infos, content_hash=""):
         return Document.objects.create(
             customer=customer,
             file_path=new_file_path,
+            content_hash=content_hash,
             raw_text=infos.get("raw_text", ""),
             policy_numbers=infos.get("policy_numbers"),
             license_plates=infos.get("license_plates") or [],
@@ -385,6 +622,299 @@ class DocumentImportView(APIView):
         }
 
 
+class DocumentUploadView(DocumentImportView):
+    """
+    Import a PDF sent as multipart upload (field "file") instead of a path
+    on a shared mount.
+
+    The body is streamed to a temporary file in 64 KiB chunks and hashed on
+    the way, so memory use does not grow with the file size. A file the
+    import leaves behind (ambiguous customer, unreadable PDF) is parked in
+    UNASSIGNED_DOCUMENT_ROOT, as the uploader keeps no copy on the server.
+    """
+
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """Upload a PDF and create customer/document records."""
+        handler = HashingUploadHandler(request._request, max_bytes=upload_max_bytes())
+        request._request.upload_handlers = [handler]
+
+        broker_id = request.headers.get("X-Broker-Id")
+        broker = User.objects.get(id=int(broker_id))
+
+        uploaded = request.FILES.get("file")
+        if handler.too_large:
+            return Response(
+                {"error": f"File larger than {upload_max_bytes() // (1024 * 1024)} MB."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if uploaded is None:
+            return Response(
+                {"error": "file is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with staged_upload(uploaded) as pdf_path:
+            # The slot covers the import, not the transfer: a slow upload
+            # does not block the broker's other uploads
+            try:
+                with import_slot(broker.id):
+                    response = self.import_pdf(
+                        pdf_path, broker, request, content_hash=uploaded.content_hash)
+            except ImportLimitExceeded as e:
+                return self._limit_response(e)
+            if os.path.exists(pdf_path):
+                new_file_path, error_response = self._move_pdf(pdf_path, None)
+                if error_response is None:
+                    response.data["file_path"] = new_file_path
+        return response
+
+
+def import_pdf_file(pdf_path, broker):
+    """
+    Import one file outside a request (queue workers, inbox watcher).
+
+    Returns (status_code, JSON-ready response payload, stage timings in ms).
+    """
+    view = DocumentImportView()
+    # Background work waits for a slot instead of failing
+    with import_slot(broker.id, wait=None):
+        response = view.import_pdf(pdf_path, broker)
+    data = json.loads(JSONRenderer().render(response.data))
+    return response.status_code, data, view.timer.milliseconds()
+
+
+class DocumentBatchImportView(DocumentImportView):
+    """
+    Import many PDFs from disk in one request.
+
+    All files are extracted up front by a bounded thread pool (page reading
+    itself runs in supervised child processes, see isolated_extraction),
+    then customers and documents are written in transactions of
+    BATCH_IMPORT_TRANSACTION_SIZE items. Every item gets its own savepoint,
+    so one bad file does not fail the batch.
+    """
+
+    def post(self, request):
+        """Import a list of PDFs and return one result per path."""
+        broker_id = request.headers.get("X-Broker-Id")
+        broker = User.objects.get(id=int(broker_id))
+
+        pdf_paths = request.data.get("pdf_paths")
+        if (
+            not isinstance(pdf_paths, list)
+            or not pdf_paths
+            or not all(isinstance(p, str) and p.strip() for p in pdf_paths)
+        ):
+            return Response(
+                {"error": "pdf_paths must be a non-empty list of paths"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        max_items = getattr(settings, "BATCH_IMPORT_MAX_ITEMS", 500)
+        if len(pdf_paths) > max_items:
+            return Response(
+                {"error": f"At most {max_items} pdf_paths per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        pdf_paths = [p.strip() for p in pdf_paths]
+        try:
+            with import_slot(broker.id):
+                return self._import_batch(pdf_paths, broker)
+        except ImportLimitExceeded as e:
+            return self._limit_response(e)
+
+    def _import_batch(self, pdf_paths, broker):
+        self.timer = StageTimer()
+
+        with self.timer.stage("total"):
+            with self.timer.stage("extract"):
+                extracted = self._extract_batch(pdf_paths, broker)
+
+            results = []
+            chunk_size = getattr(settings, "BATCH_IMPORT_TRANSACTION_SIZE", 50)
+            with self.timer.stage("import"):
+                # Built outside the transactions, where it only sees committed rows
+                customer_index(broker)
+                for start in range(0, len(extracted), chunk_size):
+                    chunk = extracted[start:start + chunk_size]
+                    # One number per item that may create a customer, reserved
+                    # before the transaction so the sequence is not locked
+                    # while it runs
+                    importable = sum(
+                        1 for _, _, duplicate, _, error_response in chunk
+                        if duplicate is None and error_response is None
+                    )
+                    with Customer.reserve_customer_numbers(importable):
+                        with transaction.atomic():
+                            for item in chunk:
+                                results.append(self._import_item(broker, *item))
+
+        summary = dict(Counter(result["status"] for result in results))
+        logger.info(
+            "Document batch import finished",
+            extra={"items": len(results), "summary": summary,
+                   "stages_ms": self.timer.milliseconds()},
+        )
+        response = Response({"summary": summary, "results": results})
+        if getattr(settings, "IMPORT_TIMING_HEADER", False):
+            response["Server-Timing"] = self.timer.server_timing()
+        return response
+
+    def _extract_batch(self, pdf_paths, broker):
+        """
+        Return (pdf_path, content_hash, duplicate, infos, error_response) per
+        path, in order. Known files are not extracted again.
+        """
+        content_hashes = [file_content_hash(pdf_path) for pdf_path in pdf_paths]
+        duplicates = [find_duplicate(content_hash, broker) for content_hash in content_hashes]
+        extractions = [
+            StagedPDFExtraction(pdf_path, content_hash=content_hash or None)
+            for pdf_path, content_hash in zip(pdf_paths, content_hashes)
+        ]
+        outcomes = [None] * len(pdf_paths)
+        file_sizes = [None] * len(pdf_paths)
+
+        # The cache lives in the database: look up and store on this thread
+        pending = []
+        for i, (pdf_path, extraction) in enumerate(zip(pdf_paths, extractions)):
+            try:
+                file_sizes[i] = os.path.getsize(pdf_path)
+            except OSError:
+                pass
+            if duplicates[i] is not None:
+                outcomes[i] = (None, None)
+                continue
+            cached, error_response = self._extract_infos(pdf_path, extraction.load_cached)
+            if error_response or cached is not None:
+                outcomes[i] = (cached, error_response)
+            else:
+                pending.append(i)
+
+        workers = getattr(settings, "BATCH_IMPORT_WORKERS", 4)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {
+                i: pool.submit(
+                    self._extract_infos, pdf_paths[i], extractions[i].extract_uncached
+                )
+                for i in pending
+            }
+        for i, future in futures.items():
+            outcomes[i] = future.result()
+            if outcomes[i][1] is None:
+                extractions[i].store_in_cache()
+
+        for extraction, (infos, _), file_size in zip(extractions, outcomes, file_sizes):
+            stage_timer = StageTimer()
+            stage_timer.merge(extraction.timer, prefix="extract.")
+            record_import(
+                stage_timer.seconds,
+                page_count=(infos or {}).get("page_count"),
+                file_size=file_size,
+            )
+
+        return [
+            (pdf_path, content_hash, duplicate, infos, error_response)
+            for pdf_path, content_hash, duplicate, (infos, error_response) in zip(
+                pdf_paths, content_hashes, duplicates, outcomes)
+        ]
+
+    def _import_item(self, broker, pdf_path, content_hash, duplicate, infos, error_response):
+        if duplicate is None and error_response is None:
+            # The same file may appear twice in one batch
+            duplicate = find_duplicate(content_hash, broker)
+        if duplicate is not None:
+            with transaction.atomic():
+                response = self._duplicate_response(pdf_path, duplicate, None)
+            return {
+                "pdf_path": pdf_path,
+                "status": "duplicate",
+                "status_code": response.status_code,
+                "duplicate_of": duplicate.id,
+                "document_id": response.data.get("document", {}).get("id"),
+            }
+        if error_response:
+            return self._failed_item(pdf_path, error_response)
+
+        customer_data = self._build_customer_data(infos)
+        try:
+            with transaction.atomic():
+                customer, created, error_response = self._resolve_customer(
+                    customer_data, broker)
+                if error_response:
+                    return {
+                        "pdf_path": pdf_path,
+                        "status": "ambiguous",
+                        "error": error_response.data["error"],
+                        "candidates": error_response.data["candidates"],
+                    }
+
+                new_file_path, error_response = self._move_pdf(pdf_path, customer)
+                if error_response:
+                    return self._failed_item(pdf_path, error_response)
+
+                document = self._create_document(
+                    customer, new_file_path, infos, content_hash)
+        except Exception:
+            logger.exception("Failed to import PDF in batch", extra={
+                             "pdf_path": pdf_path})
+            return {
+                "pdf_path": pdf_path,
+                "status": "failed",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "error": "Unexpected error while importing PDF.",
+            }
+
+        if customer is None:
+            item_status = "unassigned"
+        else:
+            item_status = "created" if created else "matched"
+        return {
+            "pdf_path": pdf_path,
+            "status": item_status,
+            "customer": None if customer is None else {
+                "id": customer.id,
+                "customer_number": customer.customer_number,
+                "first_name": customer.first_name,
+                "last_name": customer.last_name,
+            },
+            "document_id": document.id,
+            "file_path": new_file_path,
+        }
+
+    def _failed_item(self, pdf_path, error_response):
+        return {
+            "pdf_path": pdf_path,
+            "status": "failed",
+            "status_code": error_response.status_code,
+            **error_response.data,
+        }
+
+
+class ImportJobDetailView(APIView):
+    authentication_classes = []
+    permission_classes = [HasImportToken]
+
+    def get(self, request, job_id: int):
+        """Status and result of a queued import (only the broker's own jobs)."""
+        job = get_object_or_404(
+            ImportJob, id=job_id, broker_id=int(request.headers.get("X-Broker-Id")))
+        return Response(ImportJobSerializer(job).data)
+
+
+class ImportMetricsView(APIView):
+    authentication_classes = []
+    permission_classes = [HasMetricsToken]
+
+    def get(self, request):
+        """Import stage histograms and in-flight imports of every worker on this host."""
+        return HttpResponse(
+            render_metrics() + render_in_flight(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
 class DocumentFileView(APIView):
     permission_classes = [IsAuthenticated, IsInWhitelistGroup]
 
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class InsuranceAppConfig(AppConfig):
     name = "insurance_app"
+
+    def ready(self):
+        # Signal receivers keeping the customer index, the plate and policy
+        # tables, the full-text tables and the autocomplete index coherent.
+        # Order matters: the autocomplete index reads the plate table.
+        from .services import customer_index, fulltext_search, license_plates, policy_numbers  # noqa: F401
+        from .services import customer_autocomplete  # noqa: F401
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from insurance_app.models import Document
+from insurance_app.services.document_dedupe import file_content_hash
+
+
+class Command(BaseCommand):
+    help = "Compute the content hash of documents imported before deduplication existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=min(8, os.cpu_count() or 1),
+            help="Files hashed concurrently (hashlib releases the GIL).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Documents hashed and saved per round.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        pending = Document.objects.filter(content_hash="").exclude(file_path="")
+        total = pending.count()
+        hashed = missing = 0
+        last_id = 0
+
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+            while True:
+                # Keyset pagination: documents without a readable file stay unhashed
+                batch = list(
+                    pending.filter(id__gt=last_id).order_by("id").only("id", "file_path")[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                hashes = pool.map(file_content_hash, [document.file_path for document in batch])
+                updated = []
+                for document, content_hash in zip(batch, hashes):
+                    if content_hash:
+                        document.content_hash = content_hash
+                        updated.append(document)
+                    else:
+                        missing += 1
+                Document.objects.bulk_update(updated, ["content_hash"])
+                hashed += len(updated)
+                self.stdout.write(f"{hashed + missing}/{total} documents")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Hashed {hashed} documents, {missing} files not readable.")
+        )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from insurance_app.models import Document
+from insurance_app.services.license_plates import sync_license_plates
+
+
+class Command(BaseCommand):
+    help = "Fill the license plate table from documents imported before it existed."
+
+    # Document field the table is derived from, its sync function and label
+    source_field = "license_plates"
+    sync = staticmethod(sync_license_plates)
+    label = "license plates"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Documents indexed per round.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        # Rewrites the rows of every document, so running it again is harmless
+        documents = Document.objects.exclude(customer=None)
+        total = documents.count()
+        processed = written = 0
+        last_id = 0
+
+        while True:
+            # Keyset pagination keeps memory bounded by one batch
+            batch = list(
+                documents.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "customer", self.source_field)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            written += self.sync(batch)
+            processed += len(batch)
+            self.stdout.write(f"{processed}/{total} documents")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {written} {self.label} of {processed} documents.")
+        )
@@ -0,0 +1,11 @@
+from insurance_app.services.policy_numbers import sync_policy_numbers
+
+from .backfill_license_plates import Command as BackfillLicensePlatesCommand
+
+
+class Command(BackfillLicensePlatesCommand):
+    help = "Fill the policy number table from documents imported before it existed."
+
+    source_field = "policy_numbers"
+    sync = staticmethod(sync_policy_numbers)
+    label = "policy numbers"
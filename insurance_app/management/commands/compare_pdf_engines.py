@@ -0,0 +1,68 @@
+import time
+from dataclasses import fields
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from insurance_app.services.extract_pdf_text import ExtractedPDFData, extract_pdf_text
+from insurance_app.services.pdf_engines import ENGINES
+
+# Text fields differ in whitespace between engines; only parsed fields must match
+COMPARED_FIELDS = [
+    f.name for f in fields(ExtractedPDFData) if f.name not in ("raw_text", "normalized_text")
+]
+
+
+class Command(BaseCommand):
+    help = "Compare extracted fields of all PDF text engines (defaults to the demo_seed corpus)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="PDF files or folders to compare.")
+
+    def handle(self, *args, **options):
+        pdf_files = self._collect(options["paths"] or [Path(settings.BASE_DIR) / "demo_seed" / "pdfs"])
+        if not pdf_files:
+            raise CommandError("No PDF files found.")
+
+        mismatches = 0
+        for pdf_file in pdf_files:
+            results = {}
+            timings = []
+            for engine in ENGINES:
+                started = time.perf_counter()
+                results[engine] = extract_pdf_text(
+                    str(pdf_file), engine=engine, fallback=False, use_cache=False
+                )
+                timings.append(f"{engine} {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            diff = diff_results(results)
+            if diff:
+                mismatches += 1
+                self.stdout.write(self.style.ERROR(f"MISMATCH {pdf_file} ({', '.join(timings)})"))
+                for field_name, values in diff.items():
+                    self.stdout.write(f"  {field_name}: {values}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK {pdf_file} ({', '.join(timings)})"))
+
+        if mismatches:
+            raise CommandError(f"{mismatches} of {len(pdf_files)} PDFs differ between engines.")
+
+    def _collect(self, paths):
+        pdf_files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                pdf_files.extend(sorted(path.glob("*.pdf")))
+            else:
+                pdf_files.append(path)
+        return pdf_files
+
+
+def diff_results(results: dict) -> dict:
+    """Return {field: {engine: value}} for every compared field that differs."""
+    diff = {}
+    for field_name in COMPARED_FIELDS:
+        values = {engine: payload.get(field_name) for engine, payload in results.items()}
+        if len({repr(v) for v in values.values()}) > 1:
+            diff[field_name] = values
+    return diff
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Min, Sum
+
+from insurance_app.models import ExtractionCacheEntry
+from insurance_app.services.extract_pdf_text import EXTRACTOR_VERSION
+from insurance_app.services.extraction_cache import cache_max_bytes, evict_extraction_cache
+
+
+class Command(BaseCommand):
+    help = "Inspect or purge the PDF extraction cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge", action="store_true", help="Delete all cache entries.")
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Delete entries written by another extractor version.",
+        )
+        parser.add_argument(
+            "--evict",
+            action="store_true",
+            help="Evict least recently used entries down to PDF_EXTRACTION_CACHE_MAX_BYTES.",
+        )
+
+    def handle(self, *args, **options):
+        entries = ExtractionCacheEntry.objects.all()
+
+        if options["purge"]:
+            deleted, _ = entries.delete()
+            self.stdout.write(self.style.SUCCESS(f"Purged {deleted} cache entries."))
+            return
+
+        if options["stale"]:
+            deleted, _ = entries.exclude(
+                extractor_version__startswith=f"{EXTRACTOR_VERSION}:"
+            ).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} stale cache entries."))
+
+        if options["evict"]:
+            evicted = evict_extraction_cache(cache_max_bytes())
+            self.stdout.write(self.style.SUCCESS(f"Evicted {evicted} cache entries."))
+
+        self._print_stats()
+
+    def _print_stats(self):
+        stats = ExtractionCacheEntry.objects.aggregate(
+            entries=Count("id"),
+            total=Sum("size_bytes"),
+            oldest=Min("last_used_at"),
+            newest=Max("last_used_at"),
+        )
+        self.stdout.write(f"Entries:    {stats['entries']}")
+        self.stdout.write(f"Size:       {(stats['total'] or 0) / 1024:.1f} KiB")
+        self.stdout.write(f"Limit:      {cache_max_bytes() / 1024:.1f} KiB")
+        self.stdout.write(f"Least used: {stats['oldest'] or '-'}")
+        self.stdout.write(f"Last used:  {stats['newest'] or '-'}")
+
+        per_version = (
+            ExtractionCacheEntry.objects.values("extractor_version")
+            .annotate(entries=Count("id"), total=Sum("size_bytes"))
+            .order_by("extractor_version")
+        )
+        for row in per_version:
+            self.stdout.write(
+                f"  {row['extractor_version']}: {row['entries']} entries, "
+                f"{row['total'] / 1024:.1f} KiB"
+            )
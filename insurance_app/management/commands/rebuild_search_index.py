@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from insurance_app.services.fulltext_search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Refill the SQLite full-text tables from the customer and document tables, "
+        "after changes that sent no signals (queryset.update(), raw SQL)."
+    )
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the full-text search index."))
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from insurance_app.models import Document
+from insurance_app.services.fulltext_search import sync_search_index
+from insurance_app.services.license_plates import sync_license_plates
+from insurance_app.services.policy_numbers import sync_policy_numbers
+from insurance_app.services.reextract import (
+    changed_fields,
+    reextract_document,
+    reextract_document_from_pdf,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run the extractors over stored documents (after changing CONTRACT_RULES, "
+        "RE_POLICY_NUMBER, RE_LICENSE_PLATE, ...)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--broker", type=int, help="Only documents of this broker (user id).")
+        parser.add_argument("--since", type=date.fromisoformat, help="Created on or after (YYYY-MM-DD).")
+        parser.add_argument("--until", type=date.fromisoformat, help="Created on or before (YYYY-MM-DD).")
+        parser.add_argument(
+            "--contract-type",
+            help='Only documents with this contract_typ ("none" for documents without one).',
+        )
+        parser.add_argument(
+            "--from-pdf",
+            action="store_true",
+            help="Read the PDF files again instead of reusing the stored raw_text.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Extraction processes (1 = no pool).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Documents loaded, extracted and saved per round.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print what would change without saving.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Progress file (default: one per filter set in the temp directory).",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the first document.",
+        )
+
+    def handle(self, *args, **options):
+        documents = self._filtered(options)
+        chunk_size = max(options["chunk_size"], 1)
+        dry_run = options["dry_run"]
+        checkpoint = options["checkpoint"] or self._default_checkpoint(options)
+
+        last_id = 0
+        if not options["restart"] and not dry_run:
+            last_id = self._load_checkpoint(checkpoint)
+            if last_id:
+                self.stdout.write(f"Resuming after document {last_id} ({checkpoint}).")
+
+        total = documents.filter(id__gt=last_id).count()
+        extract = reextract_document_from_pdf if options["from_pdf"] else reextract_document
+        # customer: for the plate and policy tables
+        fields = ["raw_text", "file_path", "customer", *self._update_fields(options)]
+        stats = {"processed": 0, "changed": 0, "failed": 0}
+        field_changes = {}
+
+        pool = self._start_pool(options["workers"])
+        try:
+            while True:
+                # Keyset pagination keeps memory bounded by one chunk
+                chunk = list(
+                    documents.filter(id__gt=last_id).order_by("id").only(*fields)[:chunk_size]
+                )
+                if not chunk:
+                    break
+                items = [(d.id, d.raw_text, d.file_path) for d in chunk]
+                if pool is None:
+                    results = map(extract, items)
+                else:
+                    batch = max(len(items) // (4 * options["workers"]), 1)
+                    results = pool.map(extract, items, chunksize=batch)
+
+                by_id = {document.id: document for document in chunk}
+                changed = []
+                for document_id, values, error in results:
+                    document = by_id[document_id]
+                    if values is None:
+                        stats["failed"] += 1
+                        self.stderr.write(f"Document {document_id}: {error}")
+                        continue
+                    diff = changed_fields(document, values)
+                    if not diff:
+                        continue
+                    for name, (old, new) in diff.items():
+                        field_changes[name] = field_changes.get(name, 0) + 1
+                        setattr(document, name, new)
+                        if dry_run and name != "raw_text":
+                            self.stdout.write(f"Document {document_id}: {name}: {old!r} -> {new!r}")
+                    changed.append(document)
+
+                stats["processed"] += len(chunk)
+                stats["changed"] += len(changed)
+                last_id = chunk[-1].id
+                if not dry_run:
+                    Document.objects.bulk_update(changed, self._update_fields(options))
+                    # bulk_update() sends no post_save
+                    sync_license_plates(changed)
+                    sync_policy_numbers(changed)
+                    if options["from_pdf"]:
+                        sync_search_index(document_ids=[document.id for document in changed])
+                    self._save_checkpoint(checkpoint, last_id)
+                self.stdout.write(f"{stats['processed']}/{total} documents, {stats['changed']} changed")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        summary = ", ".join(f"{name}: {count}" for name, count in sorted(field_changes.items())) or "none"
+        verb = "Would change" if dry_run else "Changed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {stats['changed']} of {stats['processed']} documents "
+                f"({stats['failed']} failed). Fields: {summary}."
+            )
+        )
+
+    def _filtered(self, options):
+        documents = Document.objects.all()
+        if options["broker"]:
+            documents = documents.filter(customer__broker_id=options["broker"])
+        if options["since"]:
+            documents = documents.filter(created_at__date__gte=options["since"])
+        if options["until"]:
+            documents = documents.filter(created_at__date__lte=options["until"])
+        contract_type = options["contract_type"]
+        if contract_type:
+            if contract_type == "none":
+                documents = documents.filter(contract_typ__isnull=True)
+            else:
+                documents = documents.filter(contract_typ=contract_type)
+        return documents
+
+    def _update_fields(self, options):
+        fields = ["policy_numbers", "license_plates", "contract_typ"]
+        return fields + ["raw_text"] if options["from_pdf"] else fields
+
+    def _start_pool(self, workers):
+        if workers <= 1:
+            return None
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # Forked workers must not inherit an open database connection
+        connections.close_all()
+        pool.submit(int).result()
+        return pool
+
+    def _default_checkpoint(self, options):
+        keys = ("broker", "since", "until", "contract_type", "from_pdf")
+        filters = json.dumps({key: str(options[key]) for key in keys}, sort_keys=True)
+        digest = hashlib.sha1(filters.encode()).hexdigest()[:12]
+        return os.path.join(tempfile.gettempdir(), f"reextract_documents-{digest}.json")
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return int(json.load(f)["last_id"])
+        except FileNotFoundError:
+            return 0
+        except (ValueError, KeyError, TypeError):
+            raise CommandError(f"Unreadable checkpoint {path}; use --restart.")
+
+    def _save_checkpoint(self, path, last_id):
+        # Written atomically so an interrupted run never leaves half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_id": last_id}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,107 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from insurance_app.api.views import import_pdf_file
+from insurance_app.services.import_jobs import claim_next_job, run_job
+
+# Longest wait after repeated database errors
+MAX_ERROR_BACKOFF_SECONDS = 30
+
+
+class Command(BaseCommand):
+    help = "Process queued document imports (see DocumentImportView async=true)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "IMPORT_WORKERS", 2),
+            help="Concurrent worker threads (default: IMPORT_WORKERS).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as no job is due instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        workers = max(options["workers"], 1)
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, self._request_stop)
+
+        self.processed = 0
+        self.counter_lock = threading.Lock()
+        if workers == 1:
+            self._work(f"{prefix}:1", options["poll_interval"], options["once"], own_connection=False)
+        else:
+            threads = [
+                threading.Thread(
+                    target=self._work,
+                    args=(f"{prefix}:{n}", options["poll_interval"], options["once"]),
+                    name=f"import-worker-{n}",
+                )
+                for n in range(1, workers + 1)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {self.processed} import jobs."))
+
+    def _request_stop(self, signum, frame):
+        # Finish the running jobs, then exit
+        self.stop.set()
+
+    def _work(self, worker_id, poll_interval, once, own_connection=True):
+        failures = 0
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    job = claim_next_job(worker_id)
+                    if job is not None:
+                        job = run_job(job, import_pdf_file)
+                except DatabaseError as e:
+                    # E.g. "database is locked": the worker keeps going. A job
+                    # whose outcome was not saved is taken over after
+                    # IMPORT_JOB_LOCK_TIMEOUT
+                    failures += 1
+                    backoff = min(poll_interval * 2 ** (failures - 1), MAX_ERROR_BACKOFF_SECONDS)
+                    self.stderr.write(f"[{worker_id}] database error, retrying in {backoff:g} s: {e}")
+                    self.stop.wait(backoff)
+                    continue
+                failures = 0
+
+                if job is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+
+                with self.counter_lock:
+                    self.processed += 1
+                self.stdout.write(
+                    f"[{worker_id}] job {job.id} {job.status} "
+                    f"(attempt {job.attempts}/{job.max_attempts}): {job.pdf_path}"
+                )
+        finally:
+            # Every thread opens its own database connection
+            if own_connection:
+                connection.close()
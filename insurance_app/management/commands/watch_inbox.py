@@ -0,0 +1,94 @@
+import os
+import signal
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from watchdog.observers import Observer
+
+from insurance_app.api.views import import_pdf_file
+from insurance_app.services.inbox_watcher import InboxWatcher
+
+
+class Command(BaseCommand):
+    help = "Import PDFs dropped into an inbox directory (replaces the HTTP import script)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--inbox",
+            default=getattr(settings, "IMPORT_INBOX_DIR", ""),
+            help="Directory to watch (default: IMPORT_INBOX_DIR).",
+        )
+        parser.add_argument(
+            "--broker",
+            type=int,
+            default=getattr(settings, "IMPORT_INBOX_BROKER_ID", None),
+            help="User id documents are imported for (default: IMPORT_INBOX_BROKER_ID).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "IMPORT_INBOX_WORKERS", 2),
+            help="Concurrent imports (default: IMPORT_INBOX_WORKERS).",
+        )
+        parser.add_argument(
+            "--stable-seconds",
+            type=float,
+            default=getattr(settings, "IMPORT_INBOX_STABLE_SECONDS", 2.0),
+            help="How long a file must stay unchanged before it is imported.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Import the files already in the inbox and exit.",
+        )
+
+    def handle(self, *args, **options):
+        inbox = options["inbox"]
+        if not inbox or not os.path.isdir(inbox):
+            raise CommandError(f"Inbox directory does not exist: {inbox!r}")
+        unassigned = getattr(settings, "UNASSIGNED_DOCUMENT_ROOT", None)
+        if unassigned and os.path.abspath(unassigned) == os.path.abspath(inbox):
+            raise CommandError("The inbox must not be UNASSIGNED_DOCUMENT_ROOT.")
+
+        User = get_user_model()
+        try:
+            broker = User.objects.get(id=options["broker"], is_active=True)
+        except (User.DoesNotExist, TypeError, ValueError):
+            raise CommandError(f"No active broker with id {options['broker']!r}.")
+
+        watcher = InboxWatcher(
+            inbox,
+            broker,
+            import_pdf_file,
+            workers=max(options["workers"], 1),
+            stable_seconds=options["stable_seconds"],
+        )
+
+        observer = None
+        if not options["once"]:
+            # Start watching before the scan, so no file falls in between
+            observer = Observer()
+            observer.schedule(watcher, inbox, recursive=False)
+            observer.start()
+
+        try:
+            pending = watcher.catch_up()
+            self.stdout.write(f"Catch-up: {pending} files waiting in {inbox}.")
+            if observer is not None:
+                self.stdout.write(f"Watching {inbox} (Ctrl+C to stop).")
+                stop = threading.Event()
+                for sig in (signal.SIGTERM, signal.SIGINT):
+                    signal.signal(sig, lambda signum, frame: stop.set())
+                while not stop.is_set() and observer.is_alive():
+                    stop.wait(1)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            watcher.shutdown()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {watcher.imported} files, parked {watcher.parked}.")
+        )
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-17 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("insurance_app", "0007_importjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+    ]
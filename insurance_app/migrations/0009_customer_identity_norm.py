@@ -0,0 +1,100 @@
+# Generated by Django 6.0 on 2026-10-17 09:31
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of services.identity_normalization as of this migration, so
+# later changes there do not alter what this backfill does
+
+FOLD_TABLE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+RE_WHITESPACE = re.compile(r"\s+")
+RE_WORD_NUMBER = re.compile(r"(?<=[^\W\d])(?=\d)|(?<=\.)(?=\d)")
+RE_HOUSE_NUMBER_SUFFIX = re.compile(r"(?<=\d) (?=[a-z]\b)")
+STREET_ABBREVIATIONS = [
+    (re.compile(r"str\b\.?"), "strasse"),
+    (re.compile(r"pl\."), "platz"),
+]
+
+
+def fold_text(value):
+    value = (value or "").casefold().translate(FOLD_TABLE)
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return RE_WHITESPACE.sub(" ", value).strip()
+
+
+def normalize_name(value):
+    return fold_text(value)
+
+
+def normalize_street(value):
+    value = fold_text(value).replace("-", " ")
+    value = RE_WORD_NUMBER.sub(" ", value)
+    for pattern, replacement in STREET_ABBREVIATIONS:
+        value = pattern.sub(replacement, value)
+    value = RE_WHITESPACE.sub(" ", value.replace(".", " ")).strip()
+    return RE_HOUSE_NUMBER_SUFFIX.sub("", value)
+
+
+def backfill_identity_norm(apps, schema_editor):
+    Customer = apps.get_model("insurance_app", "Customer")
+    batch = []
+    for customer in Customer.objects.only(
+        "id", "first_name", "last_name", "street"
+    ).iterator(chunk_size=2000):
+        customer.first_name_norm = normalize_name(customer.first_name)
+        customer.last_name_norm = normalize_name(customer.last_name)
+        customer.street_norm = normalize_street(customer.street)
+        batch.append(customer)
+        if len(batch) >= 2000:
+            Customer.objects.bulk_update(
+                batch, ["first_name_norm", "last_name_norm", "street_norm"]
+            )
+            batch = []
+    Customer.objects.bulk_update(
+        batch, ["first_name_norm", "last_name_norm", "street_norm"]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("insurance_app", "0008_document_content_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customer",
+            name="first_name_norm",
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="last_name_norm",
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="street_norm",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_identity_norm, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["broker", "zip_code", "street_norm"],
+                name="customer_address_norm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["broker", "last_name_norm", "first_name_norm"],
+                name="customer_name_norm_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-17 10:12
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import Substr
+
+
+def seed_customer_number_sequences(apps, schema_editor):
+    Customer = apps.get_model("insurance_app", "Customer")
+    CustomerNumberSequence = apps.get_model("insurance_app", "CustomerNumberSequence")
+    # "YYYY-XXXXXX" is zero-padded: the largest string is the largest number
+    per_year = (
+        Customer.objects.filter(customer_number__regex=r"^[0-9]{4}-[0-9]{6}$")
+        .annotate(year=Substr("customer_number", 1, 4))
+        .values("year")
+        .annotate(last_number=Max("customer_number"))
+    )
+    CustomerNumberSequence.objects.bulk_create(
+        [
+            CustomerNumberSequence(
+                year=int(row["year"]), last_value=int(row["last_number"][5:])
+            )
+            for row in per_year
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("insurance_app", "0009_customer_identity_norm"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerNumberSequence",
+            fields=[
+                (
+                    "year",
+                    models.PositiveIntegerField(primary_key=True, serialize=False),
+                ),
+                ("last_value", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_customer_number_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-17 11:05
+
+from django.db import migrations
+
+# Frozen copy of the services.fulltext_search index definitions as of this
+# migration, so later changes there do not alter what it does. The SQLite
+# tables are kept in sync by signal receivers, not triggers: triggers
+# reading other tables break SQLite table rebuilds in later migrations.
+
+SQLITE_CUSTOMER_COLUMNS = (
+    "c.id, 'b' || ifnull(c.broker_id, ''), "
+    "trim(ifnull(c.first_name, '') || ' ' || ifnull(c.last_name, '')), "
+    "trim(ifnull(c.street, '') || ', ' || ifnull(c.zip_code, '') || ' ' || "
+    "ifnull(c.city, ''), ', '), "
+    "c.first_name_norm || ' ' || c.last_name_norm"
+)
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE insurance_app_customer_fts USING fts5(
+        broker, name, address, name_norm,
+        prefix = '2 3', tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE insurance_app_document_fts USING fts5(
+        broker, customer UNINDEXED, raw_text, detail = column,
+        prefix = '2 3 4 5 6 7 8', tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # Existing rows
+    f"""
+    INSERT INTO insurance_app_customer_fts (rowid, broker, name, address, name_norm)
+    SELECT {SQLITE_CUSTOMER_COLUMNS}
+    FROM insurance_app_customer c
+    """,
+    """
+    INSERT INTO insurance_app_document_fts (rowid, broker, customer, raw_text)
+    SELECT d.id, 'b' || ifnull(c.broker_id, ''), d.customer_id, ifnull(d.raw_text, '')
+    FROM insurance_app_document d LEFT JOIN insurance_app_customer c ON c.id = d.customer_id
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TABLE IF EXISTS insurance_app_customer_fts",
+    "DROP TABLE IF EXISTS insurance_app_document_fts",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE INDEX insurance_app_document_fts_idx ON insurance_app_document "
+    "USING GIN (to_tsvector('german', coalesce(raw_text, '')))",
+    "CREATE INDEX insurance_app_customer_fts_idx ON insurance_app_customer "
+    "USING GIN (to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '') "
+    "|| ' ' || coalesce(street, '') || ' ' || coalesce(zip_code, '') || ' ' || "
+    "coalesce(city, '')))",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS insurance_app_document_fts_idx",
+    "DROP INDEX IF EXISTS insurance_app_customer_fts_idx",
+]
+
+
+def install(apps, schema_editor):
+    statements = {"sqlite": SQLITE_INSTALL, "postgresql": POSTGRES_INSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    statements = {"sqlite": SQLITE_UNINSTALL, "postgresql": POSTGRES_UNINSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("insurance_app", "0010_customernumbersequence"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
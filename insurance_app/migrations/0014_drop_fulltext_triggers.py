@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 16:20
+
+from django.db import migrations
+
+# Triggers an earlier version of 0011 created on SQLite. They read other
+# tables, so SQLite table rebuilds (AlterField and the like) failed on them;
+# signal receivers keep the full-text tables in sync instead.
+SQLITE_TRIGGERS = [
+    "insurance_app_customer_fts_insert",
+    "insurance_app_customer_fts_update",
+    "insurance_app_customer_fts_broker",
+    "insurance_app_customer_fts_delete",
+    "insurance_app_document_fts_insert",
+    "insurance_app_document_fts_update",
+    "insurance_app_document_fts_delete",
+]
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name in SQLITE_TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("insurance_app", "0013_policy_number"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,21 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from django.db.models import F
 from django.db.models.functions import Lower
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
 import secrets
 
+from .services.identity_normalization import normalize_name, normalize_street
+
 User = get_user_model() 
 
+# (year, numbers) reserved by Customer.reserve_customer_numbers()
+_reserved_customer_numbers = ContextVar("reserved_customer_numbers", default=None)
+
+
 def _generate_share_token() -> str:
     # 32 bytes -> URL-safe token, very hard to guess
     return secrets.token_urlsafe(32)
@@ -81,6 +90,11 @@ class Customer(models.Model):
                             null=True, db_index=True)
     country = models.CharField(max_length=100, default="Germany")
 
+    # Matching keys (see services.identity_normalization), maintained by save()
+    first_name_norm = models.CharField(max_length=100, blank=True, editable=False)
+    last_name_norm = models.CharField(max_length=100, blank=True, editable=False)
+    street_norm = models.CharField(max_length=255, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True)
@@ -91,8 +105,22 @@ class Customer(models.Model):
     def save(self, *args, **kwargs):
         if not self.customer_number:
             self.customer_number = self._generate_customer_number()
+        self.normalize_identity()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields & {"first_name", "last_name", "street"}:
+                kwargs["update_fields"] = update_fields | {
+                    "first_name_norm", "last_name_norm", "street_norm"
+                }
         super().save(*args, **kwargs)
 
+    def normalize_identity(self):
+        # IMPORTANT: queryset.update()/bulk_update() skip this, call it yourself
+        self.first_name_norm = normalize_name(self.first_name)
+        self.last_name_norm = normalize_name(self.last_name)
+        self.street_norm = normalize_street(self.street)
+
     @classmethod
     def _generate_customer_number(cls) -> str:
         """
@@ -101,22 +129,39 @@ class Customer(models.Model):
         """
         year = timezone.now().year
 
-        # Alle Kunden aus diesem Jahr holen
-        last_customer = (
-            cls.objects.filter(customer_number__startswith=str(year))
-            .order_by("-customer_number")
-            .first()
-        )
-
-        if last_customer and last_customer.customer_number:
-            # Kundennummer-Teil nach dem '-' holen und in int umwandeln
-            _, last_seq_str = last_customer.customer_number.split("-")
-            last_seq = int(last_seq_str)
-            next_seq = last_seq + 1
+        # Aus einem reservierten Block (Batch-Import), sonst einzeln
+        reserved = _reserved_customer_numbers.get()
+        if reserved and reserved[0] == year and reserved[1]:
+            seq = reserved[1].pop(0)
         else:
-            next_seq = 1
+            seq = CustomerNumberSequence.allocate(year)[0]
+
+        return f"{year}-{seq:06d}"
+
+    @classmethod
+    @contextmanager
+    def reserve_customer_numbers(cls, count: int):
+        """
+        Reserve `count` customer numbers in one statement for the customers
+        saved inside the block (batch import).
 
-        return f"{year}-{next_seq:06d}"
+        Call it outside of a transaction: the sequence row is then locked
+        only for the reservation itself. Numbers left over at the end are
+        handed back unless someone allocated after them.
+        """
+        if count < 1:
+            yield
+            return
+        year = timezone.now().year
+        numbers = CustomerNumberSequence.allocate(year, count)
+        reserved = (year, list(numbers))
+        token = _reserved_customer_numbers.set(reserved)
+        try:
+            yield
+        finally:
+            _reserved_customer_numbers.reset(token)
+            if reserved[1]:
+                CustomerNumberSequence.release(year, range(reserved[1][0], numbers.stop))
 
     class Meta:
         indexes = [
@@ -129,6 +174,15 @@ class Customer(models.Model):
             models.Index(fields=["street"]),
             models.Index(fields=["street", "zip_code"]),
             models.Index(fields=["broker", "last_name"]),
+            # Customer matching: one index seek per address / name
+            models.Index(
+                fields=["broker", "zip_code", "street_norm"],
+                name="customer_address_norm_idx",
+            ),
+            models.Index(
+                fields=["broker", "last_name_norm", "first_name_norm"],
+                name="customer_name_norm_idx",
+            ),
         ]
 
         constraints = [
@@ -144,6 +198,47 @@ class Customer(models.Model):
         ]
 
 
+class CustomerNumberSequence(models.Model):
+    """Last customer number handed out per year ("2025-000042" -> 2025: 42)."""
+
+    year = models.PositiveIntegerField(primary_key=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, year: int, count: int = 1) -> range:
+        """
+        Reserve `count` consecutive numbers of `year`.
+
+        The increment is a single UPDATE, which takes the row lock
+        (PostgreSQL) or the write lock (SQLite) until the transaction ends,
+        so concurrent callers queue up instead of computing the same
+        number; the new value is read back in the same transaction. Cost
+        does not depend on the number of customers.
+        """
+        with transaction.atomic():
+            sequences = cls.objects.filter(year=year)
+            if not sequences.update(last_value=F("last_value") + count):
+                # First customer of the year
+                cls.objects.get_or_create(year=year)
+                sequences.update(last_value=F("last_value") + count)
+            last_value = sequences.values_list("last_value", flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
+
+    @classmethod
+    def release(cls, year: int, numbers: range) -> bool:
+        """Hand back the unused tail of a reservation if it is still the newest."""
+        if not numbers:
+            return False
+        return bool(
+            cls.objects.filter(year=year, last_value=numbers.stop - 1).update(
+                last_value=numbers.start - 1
+            )
+        )
+
+
 class Document(models.Model):
 
     STATUS_CHOICES = [
@@ -174,6 +269,8 @@ class Document(models.Model):
     )
 
     file_path = models.CharField(max_length=512)
+    # SHA-256 of the PDF bytes, to recognize files that were imported before
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
     raw_text = models.TextField(blank=True, null=True)
     policy_numbers = models.JSONField(default=list, blank=True)
     license_plates = models.JSONField(default=list, blank=True)
@@ -196,3 +293,143 @@ class Document(models.Model):
         if isinstance(self.policy_numbers, list) and self.policy_numbers:
             policy = self.policy_numbers[0]
         return f"Document {self.id} ({policy or 'no policy'}) {self.customer}"
+
+
+class LicensePlate(models.Model):
+    """
+    One license plate of a document, normalized for lookups ("B-AB 123" ->
+    "BAB123"). Derived from Document.license_plates by
+    services.license_plates; never edited directly.
+    """
+
+    # Normalized plates are cut to this length
+    MAX_LENGTH = 12
+
+    document = models.ForeignKey(Document, related_name="plates", on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, related_name="plates", on_delete=models.CASCADE)
+    # The customer's broker, so a search needs no join
+    broker = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    plate = models.CharField(max_length=MAX_LENGTH)
+    # As extracted from the letter
+    display = models.CharField(max_length=32)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["broker", "plate"], name="license_plate_lookup_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "plate"], name="uniq_license_plate_per_document"),
+        ]
+
+    def __str__(self):
+        return f"{self.display} (document {self.document_id})"
+
+
+class PolicyNumber(models.Model):
+    """
+    One policy number of a document, normalized for lookups
+    ("K 123-456789/0" -> "K1234567890"). Derived from
+    Document.policy_numbers by services.policy_numbers; never edited directly.
+    """
+
+    # Normalized numbers are cut to this length
+    MAX_LENGTH = 32
+
+    document = models.ForeignKey(Document, related_name="policies", on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, related_name="policies", on_delete=models.CASCADE)
+    # The customer's broker, so a lookup needs no join
+    broker = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    number = models.CharField(max_length=MAX_LENGTH)
+    # As printed on the letter
+    display = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["broker", "number"], name="policy_number_lookup_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "number"], name="uniq_policy_number_per_document"),
+        ]
+
+    def __str__(self):
+        return f"{self.display} (document {self.document_id})"
+
+
+class ExtractionCacheEntry(models.Model):
+    # SHA-256 of the PDF bytes + version of the extractor that produced the payload
+    content_hash = models.CharField(max_length=64)
+    extractor_version = models.CharField(max_length=32)
+
+    payload = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_hash", "extractor_version"],
+                name="uniq_extraction_cache_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.extractor_version})"
+
+
+class ImportJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    broker = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="import_jobs",
+    )
+    pdf_path = models.CharField(max_length=512)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not picked up before this time (retry backoff)
+    available_at = models.DateTimeField(default=timezone.now)
+
+    # Worker currently processing the job (see run_import_workers)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Stage timings (ms) and response of the last attempt
+    timings = models.JSONField(default=dict, blank=True)
+    result_status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status}) {self.pdf_path}"
@@ -0,0 +1,343 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ..models import Customer, Document, LicensePlate
+from .document_keys import document_keys_changed, normalize_key
+from .identity_normalization import normalize_name
+from .license_plates import plates_matching
+
+# Columns kept per customer: what the search box shows, plus the key sources
+FIELDS = ["id", "customer_number", "first_name", "last_name", "zip_code", "city",
+          "first_name_norm", "last_name_norm"]
+SHOWN = FIELDS[:6]
+
+# Parts of a name that can be typed on their own ("Müller-Lüdenscheidt")
+RE_NAME_PART = re.compile(r"[\s-]+")
+
+# Sorts after every key starting with a given prefix
+MAX_CHAR = chr(0x10FFFF)
+
+_indexes: "OrderedDict[int, BrokerAutocompleteIndex]" = OrderedDict()
+# Bumped on every committed change, so an index built meanwhile is not kept
+_versions: dict = {}
+_lock = threading.RLock()
+
+
+# Largest ?limit= accepted
+LIMIT_CAP = 50
+
+
+def max_results() -> int:
+    return getattr(settings, "CUSTOMER_AUTOCOMPLETE_LIMIT", 10)
+
+
+def max_brokers() -> int:
+    """Broker indexes kept in memory; the least recently used one goes first."""
+    return getattr(settings, "CUSTOMER_AUTOCOMPLETE_MAX_BROKERS", 32)
+
+
+def index_ttl() -> int:
+    """Seconds before an index is rebuilt (changes made by other processes)."""
+    return getattr(settings, "CUSTOMER_AUTOCOMPLETE_TTL", 300)
+
+
+def compact(value: str) -> str:
+    """Lower-case letters and digits only: "B-AB 12" -> "bab12", "2025-0042" -> "20250042"."""
+    return normalize_key(value, 64).lower()
+
+
+def customer_keys(row: tuple, plates) -> list[tuple]:
+    """(key, field, shown value) a customer can be found by."""
+    customer_id, customer_number, first_name, last_name, _, _, first_norm, last_norm = row
+    keys = []
+    for field, value, norm in (("last_name", last_name, last_norm), ("first_name", first_name, first_norm)):
+        parts = {norm, *RE_NAME_PART.split(norm or "")}
+        keys += [(part, field, value) for part in parts if part]
+    if customer_number:
+        keys.append((compact(customer_number), "customer_number", customer_number))
+    keys += [(plate.lower(), "license_plate", display) for plate, display in plates]
+    # A plate shows up once per letter
+    return list(dict.fromkeys(keys))
+
+
+class BrokerAutocompleteIndex:
+    """
+    Prefix index over one broker's customers: a sorted list of
+    (key, customer id, field, shown value); every customer whose key starts
+    with a prefix is found with bisect, then read in key order.
+
+    Keys are the folded name parts, the customer number and the license
+    plates (letters and digits only).
+    """
+
+    def __init__(self, broker_id: int, rows=(), plates=None):
+        self.broker_id = broker_id
+        self.built_at = time.monotonic()
+        self._entries = []
+        # customer id -> (shown columns, keys)
+        self._customers = {}
+        plates = plates or {}
+        for row in rows:
+            self._entries.extend(self._store(row, plates.get(row[0], ())))
+        self._entries.sort()
+        # Customer id of every entry, for intersecting ranges at C speed
+        self._ids = [entry[1] for entry in self._entries]
+
+    @classmethod
+    def build(cls, broker_id: int) -> "BrokerAutocompleteIndex":
+        plates = {}
+        for customer_id, plate, display in LicensePlate.objects.filter(broker_id=broker_id).values_list(
+            "customer_id", "plate", "display"
+        ):
+            plates.setdefault(customer_id, []).append((plate, display))
+        rows = Customer.objects.filter(broker_id=broker_id).values_list(*FIELDS).iterator(chunk_size=2000)
+        return cls(broker_id, rows, plates)
+
+    def __len__(self):
+        return len(self._customers)
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > index_ttl()
+
+    def add(self, row: tuple, plates=()):
+        with _lock:
+            self.discard(row[0])
+            for entry in self._store(row, plates):
+                i = bisect_left(self._entries, entry)
+                self._entries.insert(i, entry)
+                self._ids.insert(i, entry[1])
+
+    def discard(self, customer_id: int) -> bool:
+        with _lock:
+            customer = self._customers.pop(customer_id, None)
+            if customer is None:
+                return False
+            for key, field, value in customer[1]:
+                i = bisect_left(self._entries, (key, customer_id, field, value))
+                if i < len(self._entries) and self._entries[i] == (key, customer_id, field, value):
+                    del self._entries[i]
+                    del self._ids[i]
+            return True
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        """
+        Customers with a key starting with every word of `query`, in key
+        order. A plate or customer number typed with spaces ("B AB 12") is
+        also looked up as one word.
+        """
+        words = query.split()
+        if not words:
+            return []
+        variants = [{v for v in (normalize_name(word), compact(word)) if v} for word in words]
+        variants = [v for v in variants if v]
+        found = OrderedDict()
+        with _lock:
+            whole = compact(query)
+            if len(words) > 1 and whole:
+                self._scan(self._ranges({whole}), None, found, limit)
+            if variants:
+                # Read in key order of the word with the fewest entries;
+                # with more words, only customers every word matches
+                ranges = sorted(map(self._ranges, variants), key=_range_size)
+                candidates = None
+                for word_ranges in ranges[1:] if len(ranges) > 1 else ():
+                    if candidates is None:
+                        candidates = self._customer_ids(ranges[0])
+                    candidates = self._customer_ids(word_ranges, candidates)
+                    if not candidates:
+                        break
+                if candidates is None or candidates:
+                    self._scan(ranges[0], candidates, found, limit)
+            rows = [(self._customers[customer_id][0], match) for customer_id, match in found.items()]
+        return [
+            {**dict(zip(SHOWN, shown)), "match": {"field": field, "value": value}}
+            for shown, (field, value) in rows
+        ]
+
+    def _ranges(self, prefixes) -> list[tuple[int, int]]:
+        """[start, stop) of the entries whose key starts with each prefix."""
+        return [
+            (bisect_left(self._entries, (prefix,)), bisect_left(self._entries, (prefix + MAX_CHAR,)))
+            for prefix in sorted(prefixes)
+        ]
+
+    def _customer_ids(self, ranges, within: Optional[set] = None) -> set:
+        """Customers with an entry in `ranges` (and in `within`)."""
+        ids = set()
+        for start, stop in ranges:
+            chunk = self._ids[start:stop]
+            ids.update(chunk if within is None else within.intersection(chunk))
+        return ids
+
+    def _scan(self, ranges, candidates: Optional[set], found, limit):
+        for start, stop in ranges:
+            for i in range(start, stop):
+                if len(found) >= limit:
+                    return
+                customer_id = self._ids[i]
+                if customer_id in found or (candidates is not None and customer_id not in candidates):
+                    continue
+                found[customer_id] = self._entries[i][2:]
+
+    def _store(self, row, plates) -> list[tuple]:
+        """Register a customer; returns its entries for the sorted list."""
+        keys = customer_keys(row, plates)
+        self._customers[row[0]] = (row[: len(SHOWN)], keys)
+        return [(key, row[0], field, value) for key, field, value in keys]
+
+
+def _range_size(ranges) -> int:
+    return sum(stop - start for start, stop in ranges)
+
+
+def autocomplete_index(broker) -> Optional[BrokerAutocompleteIndex]:
+    """
+    The warm autocomplete index of a broker's customers (built on first use).
+
+    Customers and plates changed in this process are applied on commit via
+    signals; bulk operations and other processes show up after
+    CUSTOMER_AUTOCOMPLETE_TTL seconds. Never built inside a transaction
+    (None without a warm one): it would pick up rows that may still be
+    rolled back.
+    """
+    if broker is None:
+        return None
+    broker_id = broker.pk
+    with _lock:
+        index = _indexes.get(broker_id)
+        if index is not None and not index.expired():
+            _indexes.move_to_end(broker_id)
+            return index
+        version = _versions.get(broker_id, 0)
+
+    if transaction.get_connection().in_atomic_block:
+        return index if index is not None and not index.expired() else None
+
+    index = BrokerAutocompleteIndex.build(broker_id)
+    with _lock:
+        # Changed while building: use it once, build again next time
+        if _versions.get(broker_id, 0) == version:
+            _indexes[broker_id] = index
+            _indexes.move_to_end(broker_id)
+            while len(_indexes) > max(max_brokers(), 1):
+                _indexes.popitem(last=False)
+    return index
+
+
+def autocomplete_customers(broker, query: str, limit: Optional[int] = None) -> list[dict]:
+    """The first `limit` customers of `broker` for what was typed so far."""
+    if broker is None:
+        return []
+    limit = min(limit or max_results(), LIMIT_CAP)
+    index = autocomplete_index(broker)
+    if index is None:
+        return _search_database(broker, query, limit)
+    return index.search(query, limit)
+
+
+def reset_autocomplete_indexes():
+    with _lock:
+        _indexes.clear()
+        _versions.clear()
+
+
+def _search_database(broker, query: str, limit: int) -> list[dict]:
+    """
+    Inside a transaction without a warm index: at most `limit` customers
+    with every word in their keys, read from the database and ordered like
+    the index would.
+    """
+    words = query.split()
+    if not words:
+        return []
+    matches = Q()
+    for word in words:
+        matches &= _word_filter(broker, word)
+    whole = compact(query)
+    if len(words) > 1 and whole:
+        matches |= Q(id__in=plates_matching(broker, whole).values("customer_id"))
+    rows = list(
+        Customer.objects.filter(matches, broker=broker)
+        .order_by("last_name_norm", "first_name_norm", "id")
+        .values_list(*FIELDS)[:limit]
+    )
+    plates = {}
+    for customer_id, plate, display in LicensePlate.objects.filter(
+        customer_id__in=[row[0] for row in rows]
+    ).values_list("customer_id", "plate", "display"):
+        plates.setdefault(customer_id, []).append((plate, display))
+    return BrokerAutocompleteIndex(broker.pk, rows, plates).search(query, limit)
+
+
+def _word_filter(broker, word: str) -> Q:
+    """Customers with a key starting with `word` (see customer_keys)."""
+    matches = Q(customer_number__istartswith=word)
+    matches |= Q(id__in=plates_matching(broker, word).values("customer_id"))
+    name = normalize_name(word)
+    if name:
+        for field in ("last_name_norm", "first_name_norm"):
+            matches |= Q(**{f"{field}__startswith": name})
+            # A later part of the name ("Müller-Lüdenscheidt", "Anna Lena")
+            matches |= Q(**{f"{field}__contains": f" {name}"}) | Q(**{f"{field}__contains": f"-{name}"})
+    return matches
+
+
+def _customer_changed(customer_id: int, broker_ids: set):
+    broker_ids = broker_ids - {None}
+    with _lock:
+        for broker_id in broker_ids:
+            _versions[broker_id] = _versions.get(broker_id, 0) + 1
+        held_by = [index for index in _indexes.values() if index.discard(customer_id)]
+        loaded = any(broker_id in _indexes for broker_id in broker_ids)
+    if not held_by and not loaded:
+        return
+    row = Customer.objects.filter(pk=customer_id).values_list(*FIELDS, "broker_id").first()
+    if row is None:
+        return
+    plates = LicensePlate.objects.filter(customer_id=customer_id).values_list("plate", "display")
+    with _lock:
+        index = _indexes.get(row[-1])
+        if index is not None:
+            index.add(row[:-1], list(plates))
+
+
+def _on_commit(customer_id, broker_id):
+    transaction.on_commit(lambda: _customer_changed(customer_id, {broker_id}))
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def _customer_saved(sender, instance, **kwargs):
+    _on_commit(instance.pk, instance.broker_id)
+
+
+@receiver(pre_save, sender=Document)
+def _document_saving(sender, instance, update_fields=None, **kwargs):
+    # A document moved to another customer takes its plates away from the
+    # previous one, which has to be re-indexed too
+    if not instance._state.adding and _indexes and document_keys_changed(update_fields, "license_plates"):
+        instance._previous_customer_id = (
+            Document.objects.filter(pk=instance.pk).values_list("customer_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def _document_saved(sender, instance, update_fields=None, **kwargs):
+    # Only plates are taken from documents; the plate table receiver is
+    # registered first (apps.py). The customer is already indexed if its
+    # broker is, so no broker lookup is needed.
+    previous = instance.__dict__.pop("_previous_customer_id", None)
+    if document_keys_changed(update_fields, "license_plates"):
+        for customer_id in {instance.customer_id, previous} - {None}:
+            _on_commit(customer_id, None)
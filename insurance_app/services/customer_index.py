@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import Customer
+
+# Every concrete column; index rows are turned back into Customer instances
+FIELDS = [field.attname for field in Customer._meta.concrete_fields]
+ID, BROKER_ID, ZIP_CODE, FIRST_NAME_NORM, LAST_NAME_NORM, STREET_NORM = (
+    FIELDS.index(name)
+    for name in ("id", "broker_id", "zip_code", "first_name_norm", "last_name_norm", "street_norm")
+)
+
+_indexes: "OrderedDict[int, BrokerCustomerIndex]" = OrderedDict()
+# Bumped on every committed customer change, so an index built while a
+# change happened is not kept
+_versions: dict = {}
+_lock = threading.RLock()
+
+
+def index_enabled() -> bool:
+    return getattr(settings, "CUSTOMER_INDEX_ENABLED", False)
+
+
+def max_brokers() -> int:
+    """Broker indexes kept in memory; the least recently used one goes first."""
+    return getattr(settings, "CUSTOMER_INDEX_MAX_BROKERS", 8)
+
+
+def index_ttl() -> int:
+    """Seconds before an index is rebuilt (changes made by other processes)."""
+    return getattr(settings, "CUSTOMER_INDEX_TTL", 300)
+
+
+class BrokerCustomerIndex:
+    """
+    All customers of one broker, keyed the way find_or_create_customer
+    looks them up: (zip_code, street_norm), (last_name_norm,
+    first_name_norm) and zip_code (fuzzy matching).
+
+    Rows are plain tuples; Customer instances are only built for hits.
+    """
+
+    def __init__(self, broker_id: int, rows=()):
+        self.broker_id = broker_id
+        self.built_at = time.monotonic()
+        self._rows = {}
+        self._by_address = {}
+        self._by_name = {}
+        self._by_zip = {}
+        for row in rows:
+            self.add(row)
+
+    @classmethod
+    def build(cls, broker_id: int) -> "BrokerCustomerIndex":
+        rows = (
+            Customer.objects.filter(broker_id=broker_id)
+            .values_list(*FIELDS)
+            .iterator(chunk_size=2000)
+        )
+        return cls(broker_id, rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > index_ttl()
+
+    def add(self, row: tuple):
+        with _lock:
+            self.discard(row[ID])
+            self._rows[row[ID]] = row
+            for keys, key in self._keys(row):
+                keys.setdefault(key, set()).add(row[ID])
+
+    def discard(self, customer_id: int) -> bool:
+        with _lock:
+            row = self._rows.pop(customer_id, None)
+            if row is None:
+                return False
+            for keys, key in self._keys(row):
+                ids = keys.get(key)
+                if ids is not None:
+                    ids.discard(customer_id)
+                    if not ids:
+                        del keys[key]
+            return True
+
+    def at_address(self, zip_code: str, street_norm: str) -> list[Customer]:
+        return self._customers(self._by_address.get((zip_code, street_norm), ()))
+
+    def with_name(self, last_name_norm: str, first_name_norm: str) -> list[Customer]:
+        return self._customers(self._by_name.get((last_name_norm, first_name_norm), ()))
+
+    def in_zip(self, zip_code: str) -> list[tuple]:
+        """(id, first_name_norm, last_name_norm, street_norm) like block_candidates()."""
+        with _lock:
+            rows = [self._rows[customer_id] for customer_id in self._by_zip.get(zip_code, ())]
+        return [
+            (row[ID], row[FIRST_NAME_NORM], row[LAST_NAME_NORM], row[STREET_NORM])
+            for row in rows
+        ]
+
+    def in_bulk(self, ids) -> dict:
+        return {customer.id: customer for customer in self._customers(ids)}
+
+    def _customers(self, ids) -> list[Customer]:
+        with _lock:
+            rows = [self._rows[customer_id] for customer_id in sorted(ids) if customer_id in self._rows]
+        return [Customer.from_db("default", FIELDS, row) for row in rows]
+
+    def _keys(self, row):
+        yield self._by_address, (row[ZIP_CODE], row[STREET_NORM])
+        yield self._by_name, (row[LAST_NAME_NORM], row[FIRST_NAME_NORM])
+        yield self._by_zip, row[ZIP_CODE]
+
+
+def customer_index(broker) -> Optional[BrokerCustomerIndex]:
+    """
+    The warm index of a broker's customers (built on first use), or None
+    when CUSTOMER_INDEX_ENABLED is off.
+
+    Customers saved or deleted in this process are applied on commit via
+    signals; queryset.update(), bulk_create() and changes made by other
+    processes show up after CUSTOMER_INDEX_TTL seconds. Never built inside
+    a transaction: it would pick up rows that may still be rolled back.
+    """
+    if not index_enabled() or broker is None:
+        return None
+    broker_id = broker.pk
+    with _lock:
+        index = _indexes.get(broker_id)
+        if index is not None and not index.expired():
+            _indexes.move_to_end(broker_id)
+            return index
+        version = _versions.get(broker_id, 0)
+
+    if transaction.get_connection().in_atomic_block:
+        return index if index is not None and not index.expired() else None
+
+    index = BrokerCustomerIndex.build(broker_id)
+    with _lock:
+        # Changed while building: use it once, build again next time
+        if _versions.get(broker_id, 0) == version:
+            _indexes[broker_id] = index
+            _indexes.move_to_end(broker_id)
+            while len(_indexes) > max(max_brokers(), 1):
+                _indexes.popitem(last=False)
+    return index
+
+
+def cached_broker_ids() -> list[int]:
+    """Brokers with an index in memory, least recently used first."""
+    with _lock:
+        return list(_indexes)
+
+
+def reset_customer_indexes():
+    with _lock:
+        _indexes.clear()
+        _versions.clear()
+
+
+def _customer_changed(customer_id: int, broker_ids: set):
+    with _lock:
+        for broker_id in broker_ids:
+            _versions[broker_id] = _versions.get(broker_id, 0) + 1
+        held_by = [index for index in _indexes.values() if index.discard(customer_id)]
+        loaded = any(broker_id in _indexes for broker_id in broker_ids)
+    if not held_by and not loaded:
+        return
+    row = Customer.objects.filter(pk=customer_id).values_list(*FIELDS).first()
+    with _lock:
+        if row is not None and row[BROKER_ID] in _indexes:
+            _indexes[row[BROKER_ID]].add(row)
+
+
+@receiver(post_save, sender=Customer)
+def _customer_saved(sender, instance, **kwargs):
+    if not index_enabled():
+        return
+    customer_id, broker_id = instance.pk, instance.broker_id
+    # Only committed rows go into the index; a rollback discards the callback
+    transaction.on_commit(lambda: _customer_changed(customer_id, {broker_id}))
+
+
+@receiver(post_delete, sender=Customer)
+def _customer_deleted(sender, instance, **kwargs):
+    if not index_enabled():
+        return
+    customer_id, broker_id = instance.pk, instance.broker_id
+    transaction.on_commit(lambda: _customer_changed(customer_id, {broker_id}))
@@ -1,19 +1,32 @@
 from django.db import transaction, IntegrityError
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
 from ..models import Customer
+from .customer_index import customer_index
+from .fuzzy_matching import fuzzy_match, rank_candidates
+from .identity_normalization import normalize_name, normalize_street
 from ..api.serializers import CustomerSerializer
 
 
 class AmbiguousCustomerError(Exception):
-    def __init__(self, candidates):
+    def __init__(self, candidates, scores=None):
+        # Best candidate first; scores (0..1) in the same order, if known
         self.candidates = candidates
+        self.scores = scores if scores is not None else [None] * len(candidates)
 
 
 class UnresolvedCustomerError(Exception):
     pass
 
 
-def find_or_create_customer(customer_data: dict, broker):
-    """Find a customer by OCR-derived data or create one if none exists."""
+def find_or_create_customer(customer_data: dict, broker, create: bool = True):
+    """
+    Find a customer by OCR-derived data or create one if none exists.
+
+    With create=False nothing is written; (None, True) means the customer
+    would be created.
+    """
     first_name = (customer_data.get("first_name") or "").strip()
     last_name = (customer_data.get("last_name") or "").strip()
     zip_code = (customer_data.get("zip_code") or "").strip()
@@ -27,42 +40,112 @@ def find_or_create_customer(customer_data: dict, broker):
         raise UnresolvedCustomerError(
             "Not enough OCR data to resolve customer.")
 
-    # 1) Address-based candidates (OCR-robust) - only if address exists
-    if has_address:
-        candidates = Customer.objects.filter(
-            broker=broker,  # NEW
-            street__iexact=street,
-            zip_code=zip_code,
-        )
-
-        if candidates.count() == 1:
-            return candidates.first(), False
-
-        if candidates.count() > 1:
-            raise AmbiguousCustomerError(candidates)
-
-    # 2) Exact lookup (only with non-empty fields)
+    # Exact lookup keys (only non-empty fields)
     lookup = {
         "broker": broker,
-        "first_name": first_name,
-        "last_name": last_name,
+        "first_name_norm": normalize_name(first_name),
+        "last_name_norm": normalize_name(last_name),
         "zip_code": zip_code,
-        "street": street,
+        "street_norm": normalize_street(street),
     }
     lookup = {k: v for k, v in lookup.items() if v}
 
     if not lookup:
         raise UnresolvedCustomerError("Lookup is empty after normalization.")
 
-    customer = Customer.objects.filter(**lookup).first()
+    index = customer_index(broker)
+    customer = None
+    if index is not None:
+        customer = _match_in_index(index, customer_data, broker, lookup, has_address)
+    # The index sees rows of the running transaction on commit only, and rows
+    # written by other processes after CUSTOMER_INDEX_TTL: a miss is
+    # confirmed in the database before a customer is created
+    if customer is None and (index is None or create or transaction.get_connection().in_atomic_block):
+        customer = _match_in_database(customer_data, broker, lookup, has_address)
     if customer:
         return customer, False
+    if not create:
+        return None, True
 
-    # 3) Create (race-safe)
+    # 4) Create (race-safe)
+    serializer = CustomerSerializer(data=customer_data)
+    serializer.is_valid(raise_exception=True)
     try:
         with transaction.atomic():
-            serializer = CustomerSerializer(data=customer_data)
-            serializer.is_valid(raise_exception=True)
             return serializer.save(broker=broker), True
     except IntegrityError:
-        return Customer.objects.get(**lookup), False
+        customer = _identity_conflict(serializer.validated_data, broker)
+        if customer is None:
+            raise
+        return customer, False
+
+
+def _identity_conflict(data, broker):
+    """
+    The customer taken by uniq_customer_identity_per_broker_ci, looked up on
+    the constraint's own columns: its *_norm columns may differ from `lookup`.
+    """
+    return Customer.objects.filter(
+        Exact(Lower("first_name"), Lower(Value(data.get("first_name") or ""))),
+        Exact(Lower("last_name"), Lower(Value(data.get("last_name") or ""))),
+        Exact(Lower("zip_code"), Lower(Value(data.get("zip_code") or ""))),
+        Exact(Lower("street"), Lower(Value(data.get("street") or ""))),
+        broker=broker,
+    ).first()
+
+
+def _match_in_database(customer_data, broker, lookup, has_address):
+    # 1) Address-based candidates (OCR-robust) - only if address exists
+    if has_address:
+        # One query on (broker, zip_code, street_norm); the list is reused
+        candidates = list(
+            Customer.objects.filter(
+                broker=broker,  # NEW
+                zip_code=lookup["zip_code"],
+                street_norm=lookup["street_norm"],
+            )
+        )
+        _raise_if_ambiguous(customer_data, candidates)
+        if candidates:
+            return candidates[0]
+
+    # 2) Exact lookup
+    customer = Customer.objects.filter(**lookup).first()
+    if customer:
+        return customer
+
+    # 3) Fuzzy match within the zip code (OCR errors in name or street)
+    return _fuzzy_match(customer_data, broker)
+
+
+def _match_in_index(index, customer_data, broker, lookup, has_address):
+    """Same steps as _match_in_database, as dictionary lookups."""
+    if has_address:
+        candidates = index.at_address(lookup["zip_code"], lookup["street_norm"])
+        _raise_if_ambiguous(customer_data, candidates)
+        if candidates:
+            return candidates[0]
+
+    if "first_name_norm" in lookup and "last_name_norm" in lookup:
+        for customer in index.with_name(lookup["last_name_norm"], lookup["first_name_norm"]):
+            if all(getattr(customer, key) == value for key, value in lookup.items() if key != "broker"):
+                return customer
+
+    return _fuzzy_match(customer_data, broker, index)
+
+
+def _raise_if_ambiguous(customer_data, candidates):
+    if len(candidates) > 1:
+        ranked = rank_candidates(customer_data, candidates)
+        raise AmbiguousCustomerError(
+            [c.customer for c in ranked], [c.score for c in ranked]
+        )
+
+
+def _fuzzy_match(customer_data, broker, index=None):
+    customer, ranked = fuzzy_match(customer_data, broker, index)
+    if ranked:
+        raise AmbiguousCustomerError(
+            [c.customer for c in ranked], [c.score for c in ranked]
+        )
+    return customer
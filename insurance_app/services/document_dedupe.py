@@ -0,0 +1,79 @@
+import logging
+import os
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from ..models import Document
+from .file_hash import sha256_file
+
+logger = logging.getLogger(__name__)
+
+# What an import of an already known file does:
+#   existing - answer with the existing document, drop the new copy
+#   link     - create another document row pointing at the existing file
+#   reject   - answer 409 and leave the file where it is
+#   off      - import it again
+DEDUPE_POLICIES = ("existing", "link", "reject", "off")
+
+
+def dedupe_policy() -> str:
+    policy = getattr(settings, "DOCUMENT_DEDUPE_POLICY", "existing")
+    if policy not in DEDUPE_POLICIES:
+        raise ImproperlyConfigured(
+            f"DOCUMENT_DEDUPE_POLICY must be one of {', '.join(DEDUPE_POLICIES)}."
+        )
+    return policy
+
+
+def file_content_hash(path: str) -> str:
+    """SHA-256 of the file, or "" if it cannot be read (the import reports that)."""
+    try:
+        return sha256_file(path)
+    except OSError:
+        return ""
+
+
+def find_duplicate(content_hash: str, broker) -> Optional[Document]:
+    """
+    The broker's earliest document with the same content, if any.
+
+    Documents whose file is gone from disk do not count, so importing the
+    file again restores it.
+    """
+    if not content_hash or dedupe_policy() == "off":
+        return None
+    document = (
+        Document.objects.select_related("customer")
+        .filter(content_hash=content_hash, customer__broker=broker)
+        .order_by("id")
+        .first()
+    )
+    if document is None or not os.path.exists(document.file_path):
+        return None
+    return document
+
+
+def link_duplicate(existing: Document) -> Document:
+    """Create another document row that shares the existing one's file and fields."""
+    return Document.objects.create(
+        customer=existing.customer,
+        file_path=existing.file_path,
+        content_hash=existing.content_hash,
+        raw_text=existing.raw_text,
+        policy_numbers=existing.policy_numbers,
+        license_plates=existing.license_plates,
+        contract_typ=existing.contract_typ,
+        contract_status=existing.contract_status,
+    )
+
+
+def discard_duplicate_file(pdf_path: str, existing: Document) -> None:
+    """Delete the incoming copy of a file that is already stored."""
+    if os.path.abspath(pdf_path) == os.path.abspath(existing.file_path):
+        return
+    try:
+        os.remove(pdf_path)
+    except OSError:
+        logger.warning("Could not remove duplicate PDF", extra={"pdf_path": pdf_path})
@@ -0,0 +1,94 @@
+import re
+from typing import Callable, Iterable
+
+from django.db import transaction
+
+from ..models import Customer, Document
+from .identity_normalization import fold_text
+
+RE_NOT_ALNUM = re.compile(r"[^0-9A-Z]")
+
+
+def normalize_key(value: str, max_length: int) -> str:
+    """Upper-case letters and digits only, umlauts folded ("B-AB 123" -> "BAB123")."""
+    return RE_NOT_ALNUM.sub("", fold_text(value).upper())[:max_length]
+
+
+def json_values(values) -> list[str]:
+    """Entries of a JSON list field; older rows hold a single string."""
+    if not values:
+        return []
+    if isinstance(values, str):
+        return [values]
+    return [str(value) for value in values]
+
+
+def prefix_range(key: str, max_length: int) -> dict:
+    """
+    Lookups for keys starting with `key`. Keys hold only 0-9 and A-Z, so
+    every key starting with "BAB1" lies between "BAB1" and "BAB1ZZ…" in any
+    collation: a range scan on a B-tree index, unlike LIKE on SQLite.
+    """
+    return {"gte": key, "lte": key + "Z" * (max_length - len(key))}
+
+
+def sync_document_keys(
+    model,
+    field: str,
+    documents: Iterable[Document],
+    keys_of: Callable[[Document], dict],
+    created: bool = False,
+) -> int:
+    """
+    Replace the `model` rows (document, customer, broker, `field`, display)
+    of `documents` with keys_of(document) ({key: display});
+    documents without a customer get none. Returns the number of rows
+    written.
+    """
+    documents = list(documents)
+    keys = {document.id: keys_of(document) for document in documents}
+    # Nothing to replace and nothing to write
+    if not documents or (created and not any(keys.values())):
+        return 0
+    brokers = dict(
+        Customer.objects.filter(id__in={d.customer_id for d in documents if d.customer_id})
+        .values_list("id", "broker_id")
+    )
+    rows = [
+        model(
+            document_id=document.id,
+            customer_id=document.customer_id,
+            broker_id=brokers[document.customer_id],
+            display=display,
+            **{field: key},
+        )
+        for document in documents
+        if brokers.get(document.customer_id) is not None
+        for key, display in keys[document.id].items()
+    ]
+    with transaction.atomic():
+        if not created:
+            model.objects.filter(document__in=documents).delete()
+        model.objects.bulk_create(rows)
+    return len(rows)
+
+
+def move_customer_keys(model, customer: Customer) -> None:
+    """Follow a customer to another broker (or drop the rows without one)."""
+    rows = model.objects.filter(customer=customer)
+    if customer.broker_id is None:
+        rows.delete()
+    else:
+        rows.exclude(broker_id=customer.broker_id).update(broker_id=customer.broker_id)
+
+
+def document_keys_changed(update_fields, field: str) -> bool:
+    """Whether a Document save can have changed the keys taken from `field`."""
+    return update_fields is None or bool({field, "customer", "customer_id"} & update_fields)
+
+
+def customer_broker_changed(created: bool, update_fields) -> bool:
+    # A new customer has no documents yet
+    if created:
+        return False
+    return update_fields is None or bool({"broker", "broker_id"} & update_fields)
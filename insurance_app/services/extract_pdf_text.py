@@ -1,22 +1,46 @@
 from __future__ import annotations
 
+import itertools
 import re
-from dataclasses import dataclass, asdict
-from typing import Optional, List, Dict
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterable, Iterator, List, Optional
 
-import pdfplumber
+from django.conf import settings
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from . import isolated_extraction
+from .file_hash import sha256_file
+from .pdf_engines import get_engine
+from .stage_timing import StageTimer
 
 
 # -------------------------
 # Regex constants (compiled)
 # -------------------------
 
-RE_MULTI_SPACE = re.compile(r"[ \t]+")
-RE_MULTI_NEWLINES = re.compile(r"\n{2,}")
-RE_JOIN_SALUTATION_LINEBREAK = re.compile(r"(Herrn?|Frau)\s*\n\s*([A-ZÄÖÜ])")
-
-# Keep newlines, keep common punctuation, strip weird OCR artifacts
-RE_OCR_GARBAGE = re.compile(r"[^0-9A-Za-zÄÖÜäöüß.,:/()\-\n ]")
+# Normalization is a single substitution (see normalize_text) that
+#   - joins "Herr/Frau" with a name on the next line
+#   - collapses runs of spaces and runs of newlines
+#   - keeps newlines and common punctuation and strips weird OCR artifacts
+# Every match starts with a character that may change (not allowed, blank, H
+# or F), so the scanner can skip ahead; the branch is chosen by lookbehind.
+RE_NORMALIZE = re.compile(
+    r"[^0-9A-EGI-Za-zÄÖÜäöüß.,:/()\-]"
+    r"(?:(?<=H)(?P<herr>errn?)\s*\n\s*(?P<herr_name>[A-ZÄÖÜ])"
+    r"|(?<=F)(?P<frau>rau)\s*\n\s*(?P<frau_name>[A-ZÄÖÜ])"
+    r"|(?<= ) +"
+    r"|(?<=\n)\n+"
+    r"|(?<=[^ \nHF])[^0-9A-Za-zÄÖÜäöüß.,:/()\-\n ]*)"
+)
+# Replacement by the first character of a blank or garbage match
+NORMALIZE_REPLACEMENTS = {" ": " ", "\n": "\n"}
+SALUTATIONS = ("Herr", "Herrn", "Frau")
 
 # Address block:
 #   Herr/Frau <Name>
@@ -64,6 +88,11 @@ class ExtractedPDFData:
     policy_numbers: Optional[str] = None
     license_plates: List[str] = None
     contract_typ: Optional[str] = None
+    # Hits per contract type key; contract_typ is the best scoring one
+    contract_type_hits: Dict[str, int] = field(default_factory=dict)
+
+    # Pages the text was read from
+    page_count: int = 0
 
     def to_dict(self) -> Dict:
         data = asdict(self)
@@ -72,26 +101,238 @@ class ExtractedPDFData:
             data["license_plates"] = []
         return data
 
+    def customer_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in CUSTOMER_FIELDS}
+
 
 # -------------------------
 # Public API
 # -------------------------
 
+# Layout-aware engine used when the fast engine yields no address block
+FALLBACK_ENGINE = "pdfplumber"
+
+# Bump whenever parsing changes so cached payloads are not reused
+EXTRACTOR_VERSION = "3"
+
+
+def extract_pdf_text(
+    pdf_file: str,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    fallback: bool = True,
+    use_cache: bool = True,
+) -> dict:
+    """
+    Extract structured data from a PDF and return a dict payload.
+
+    `workers` overrides PDF_EXTRACT_WORKERS (e.g. for batch tooling that
+    wants a bigger pool than the web tier), `engine` overrides
+    PDF_TEXT_ENGINE. If a fast engine finds no address block, the document
+    is re-read with pdfplumber unless `fallback` is False.
+
+    Payloads are cached by file content (see extraction_cache), so a
+    resubmitted PDF is not parsed again.
+    """
+    return StagedPDFExtraction(
+        pdf_file, workers=workers, engine=engine, fallback=fallback, use_cache=use_cache
+    ).to_dict()
+
+
+
+def extract_from_text(raw_text: str) -> dict:
+    """
+    Re-run the parsers on text extracted earlier (Document.raw_text).
+
+    Gives the same payload as the original extraction, since raw_text is the
+    newline-joined page texts.
+    """
+    return _parse_pages([raw_text]).to_dict()
+
+# Payload keys needed to resolve the customer
+CUSTOMER_FIELDS = (
+    "salutation",
+    "first_name",
+    "last_name",
+    "date_of_birth",
+    "email",
+    "phone",
+    "street",
+    "zip_code",
+    "city",
+    "country",
+)
 
-def extract_pdf_text(pdf_file: str) -> dict:
-    """Extract structured data from a PDF and return a dict payload."""
-    raw_text = _read_pdf_text(pdf_file)
-    normalized = normalize_text(raw_text)
-
-    address = _extract_address_block(normalized)
-    first_name, last_name = _split_name(address.name) if address else ("", "")
-
-    policy_numbers = extract_policy_numbers(normalized)
-    license_plate = extract_license_plate(normalized)
-    contract_type = extract_contract_type(normalized)
 
-    result = ExtractedPDFData(
-        raw_text=raw_text,
+class StagedPDFExtraction:
+    """
+    Extract a PDF in two stages.
+
+    customer_fields() reads only page one when it contains the address
+    block, which is all customer matching needs. The remaining pages are
+    read on the first to_dict() call. Both return exactly what
+    extract_pdf_text() would.
+
+    `timer` accumulates the time spent per sub-stage (read, normalize,
+    address, policy, plate, contract_type, cache) across both calls.
+    """
+
+    def __init__(
+        self,
+        pdf_file: str,
+        workers: Optional[int] = None,
+        engine: Optional[str] = None,
+        fallback: bool = True,
+        use_cache: bool = True,
+        content_hash: Optional[str] = None,
+    ):
+        self.pdf_file = pdf_file
+        self.workers = workers
+        self.engine = engine or getattr(settings, "PDF_TEXT_ENGINE", "pdfium")
+        self.fallback = fallback
+        self.use_cache = use_cache
+        # SHA-256 of the file if the caller already computed it
+        self.content_hash = content_hash
+        self.timer = StageTimer()
+
+        self._payload: Optional[dict] = None
+        self._first_page: Optional[list[str]] = None
+        self._cache_key: Optional[tuple[str, str]] = None
+        self._cache_checked = False
+        self._deadline: Optional[float] = None
+
+    def customer_fields(self) -> dict:
+        payload = self._payload or self._cached_payload()
+        if payload is None:
+            if self._first_page is None:
+                self._first_page = list(self._read(self.engine, 0, 1))
+            first_page = _parse_pages(self._first_page, self.timer)
+            # The greeting fallback is only used when no page has a full block
+            if first_page.zip_code:
+                return first_page.customer_dict()
+            payload = self.to_dict()
+
+        return {key: payload[key] for key in CUSTOMER_FIELDS}
+
+    def to_dict(self) -> dict:
+        if self._payload is None and self.load_cached() is None:
+            self.extract_uncached()
+            self.store_in_cache()
+        return self._payload
+
+    def load_cached(self) -> Optional[dict]:
+        """Return the cached payload, if any (uses the database)."""
+        return self._payload or self._cached_payload()
+
+    def extract_uncached(self) -> dict:
+        """
+        Read and parse the whole document without touching the cache, so
+        it can run in a thread that has no database connection of its own.
+        """
+        if self._payload is None:
+            self._payload = self._extract()
+        return self._payload
+
+    def store_in_cache(self) -> None:
+        """Store a freshly extracted payload (after load_cached() missed)."""
+        if self._payload is not None and self._cache_key:
+            from . import extraction_cache
+
+            extraction_cache.store_extraction(*self._cache_key, self._payload)
+            self._cache_key = None
+
+    def _extract(self) -> dict:
+        pages = self._read(self.engine, len(self._first_page or []), None)
+        result = _parse_pages(itertools.chain(self._first_page or [], pages), self.timer)
+
+        if self.fallback and self.engine != FALLBACK_ENGINE and not result.zip_code:
+            result = _parse_pages(self._read(FALLBACK_ENGINE, 0, None), self.timer)
+
+        return result.to_dict()
+
+    def _read(self, engine: str, start: int, stop: Optional[int]) -> Iterable[str]:
+        """
+        Read pages [start, stop) in-process, or in a supervised child process
+        when extraction limits are configured. All reads of one document
+        share a single time budget.
+        """
+        if not isolated_extraction.isolation_enabled():
+            pages = _read_page_texts(self.pdf_file, self.workers, engine, start, stop)
+            return self.timer.timed("read", pages)
+
+        timeout = isolated_extraction.extraction_timeout()
+        if timeout:
+            if self._deadline is None:
+                self._deadline = time.monotonic() + timeout
+            # Keep a positive budget so an exhausted one still reports "timeout"
+            timeout = max(self._deadline - time.monotonic(), 0.001)
+        # The child reads the settings module afresh, not overrides made here
+        workers = self.workers
+        if workers is None:
+            workers = getattr(settings, "PDF_EXTRACT_WORKERS", 1)
+        # Pages come back one by one, so memory stays bounded per page
+        pages = isolated_extraction.iter_isolated(
+            _read_page_texts, (self.pdf_file, workers, engine, start, stop),
+            timeout=timeout,
+        )
+        return self.timer.timed("read", pages)
+
+    def _cached_payload(self) -> Optional[dict]:
+        if self._cache_checked or not (self.use_cache and self.fallback):
+            return None
+        self._cache_checked = True
+
+        # Imported lazily: models need the app registry, page workers don't
+        from . import extraction_cache
+
+        if not extraction_cache.cache_max_bytes():
+            return None
+        with self.timer.stage("cache"):
+            content_hash = self.content_hash or sha256_file(self.pdf_file)
+            self._cache_key = (content_hash, extractor_version(self.engine))
+            self._payload = extraction_cache.get_cached_extraction(*self._cache_key)
+        return self._payload
+
+
+def extractor_version(engine: str) -> str:
+    """Cache version of payloads produced by this module with `engine`."""
+    return f"{EXTRACTOR_VERSION}:{engine}"
+
+
+def _parse_pages(pages: Iterable[str], timer: Optional[StageTimer] = None) -> ExtractedPDFData:
+    """
+    Parse a stream of page texts, normalizing each page as it arrives.
+
+    Only the page texts are kept: the engine releases a page's layout
+    objects before the next one is read. The extractors run on the whole
+    normalized text since their matches may span a page break.
+    """
+    timer = timer or StageTimer()
+    raw_pages: list[str] = []
+
+    def collect() -> Iterator[str]:
+        for page in pages:
+            raw_pages.append(page)
+            yield page
+
+    # Pages are pulled (and read, if lazy) from inside the normalizer
+    read_before = timer.seconds.get("read", 0.0)
+    with timer.stage("normalize"):
+        normalized = "".join(iter_normalized_text(collect()))
+    timer.add("normalize", read_before - timer.seconds.get("read", 0.0))
+
+    with timer.stage("address"):
+        address = _extract_address_block(normalized)
+        first_name, last_name = _split_name(address.name) if address else ("", "")
+    with timer.stage("policy"):
+        policy_numbers = extract_policy_numbers(normalized)
+    with timer.stage("plate"):
+        license_plate = extract_license_plate(normalized)
+    with timer.stage("contract_type"):
+        contract_type_hits = count_contract_type_hits(normalized)
+
+    return ExtractedPDFData(
+        raw_text="\n".join(raw_pages),
         normalized_text=normalized,
         salutation=address.salutation if address else "",
         first_name=first_name,
@@ -101,9 +342,10 @@ def extract_pdf_text(pdf_file: str) -> dict:
         city=address.city if address else "",
         policy_numbers=policy_numbers,
         license_plates=[license_plate] if license_plate else [],
-        contract_typ=contract_type,
+        contract_typ=pick_contract_type(contract_type_hits),
+        contract_type_hits=contract_type_hits,
+        page_count=len(raw_pages),
     )
-    return result.to_dict()
 
 
 # -------------------------
@@ -111,20 +353,187 @@ def extract_pdf_text(pdf_file: str) -> dict:
 # -------------------------
 
 
-def _read_pdf_text(pdf_file: str) -> str:
-    with pdfplumber.open(pdf_file) as pdf:
-        pages = [(page.extract_text() or "") for page in pdf.pages]
-    return "\n".join(pages)
+def _read_page_texts(
+    pdf_file: str, workers: Optional[int], engine: str, start: int, stop: Optional[int]
+) -> Iterable[str]:
+    if stop is not None:
+        return get_engine(engine).iter_pages(pdf_file, start, stop)
+    return _iter_pages(pdf_file, workers=workers, engine=engine, start=start)
+
+
+def iter_pdf_pages(
+    pdf_file: str, engine: Optional[str] = None, start: int = 0
+) -> Iterator[str]:
+    """
+    Yield the text of each page from `start` on.
+
+    Pages are read one at a time and their layout objects are released
+    before the next page is parsed, so memory stays flat for huge PDFs.
+    """
+    engine = engine or getattr(settings, "PDF_TEXT_ENGINE", "pdfium")
+    return get_engine(engine).iter_pages(pdf_file, start, None)
+
+
+def _read_pdf_text(
+    pdf_file: str, workers: Optional[int] = None, engine: str = FALLBACK_ENGINE
+) -> str:
+    """Read the text of all pages with the given engine, joined by newlines."""
+    return "\n".join(_iter_pages(pdf_file, workers=workers, engine=engine))
+
+
+def _iter_pages(
+    pdf_file: str,
+    workers: Optional[int] = None,
+    engine: str = FALLBACK_ENGINE,
+    start: int = 0,
+) -> Iterable[str]:
+    """
+    Return the texts of pages [start, end) with the given engine.
+
+    Ranges of at least PDF_EXTRACT_PARALLEL_MIN_PAGES pages are sharded
+    across a process pool when more than one worker is configured. The
+    output is identical to the sequential path, which streams page by page.
+    """
+    pdf_engine = get_engine(engine)
+    if workers is None:
+        workers = getattr(settings, "PDF_EXTRACT_WORKERS", 1)
+    min_pages = getattr(settings, "PDF_EXTRACT_PARALLEL_MIN_PAGES", 8)
+
+    if workers > 1:
+        page_count = pdf_engine.page_count(pdf_file)
+        if page_count - start >= max(min_pages, 2):
+            return _read_pages_parallel(pdf_file, start, page_count, workers, engine)
+
+    return pdf_engine.iter_pages(pdf_file, start, None)
+
+
+# One pool per process, created lazily (after gunicorn has forked).
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_workers = 0
+
+
+def _get_page_pool(workers: int) -> ProcessPoolExecutor:
+    global _page_pool, _page_pool_workers
+    if _page_pool is None or _page_pool_workers != workers:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False)
+        _page_pool = ProcessPoolExecutor(max_workers=workers)
+        _page_pool_workers = workers
+    return _page_pool
+
+
+def _page_shards(page_count: int, workers: int) -> list[tuple[int, int]]:
+    """Split [0, page_count) into contiguous (start, stop) ranges."""
+    shard_count = min(workers, page_count)
+    size, rest = divmod(page_count, shard_count)
+    shards = []
+    start = 0
+    for i in range(shard_count):
+        stop = start + size + (1 if i < rest else 0)
+        shards.append((start, stop))
+        start = stop
+    return shards
+
+
+def _read_page_range(engine: str, pdf_file: str, start: int, stop: int) -> list[str]:
+    # Runs in a pool worker: every worker opens the file on its own
+    return get_engine(engine).read_pages(pdf_file, start, stop)
+
+
+def _read_pages_parallel(
+    pdf_file: str, start: int, page_count: int, workers: int, engine: str
+) -> list[str]:
+    pool = _get_page_pool(workers)
+    futures = [
+        pool.submit(_read_page_range, engine, pdf_file, start + first, start + last)
+        for first, last in _page_shards(page_count - start, workers)
+    ]
+
+    # Reassemble in page order
+    pages: list[str] = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
 
 
 def normalize_text(text: str) -> str:
     """Normalize OCR text for downstream parsing."""
-    text = text.replace("\r", "")
-    text = RE_MULTI_SPACE.sub(" ", text)
-    text = RE_MULTI_NEWLINES.sub("\n", text)
-    text = RE_JOIN_SALUTATION_LINEBREAK.sub(r"\1 \2", text)
-    text = RE_OCR_GARBAGE.sub("", text)
-    return text.strip()
+    return _normalize_chunk(text).strip()
+
+
+def iter_normalized_text(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Normalize pages one by one.
+
+    The concatenated chunks equal normalize_text("\\n".join(pages)); text that
+    could still be joined with the next page is carried over.
+    """
+    at_start = True
+    pending_whitespace = ""
+    for chunk in _iter_safe_chunks(pages):
+        normalized = _normalize_chunk(chunk)
+        if at_start:
+            normalized = normalized.lstrip()
+            if not normalized:
+                continue
+            at_start = False
+
+        # Trailing whitespace is only kept if more text follows (final strip)
+        body = normalized.rstrip()
+        if not body:
+            pending_whitespace += normalized
+            continue
+        yield pending_whitespace + body
+        pending_whitespace = normalized[len(body):]
+
+
+def _normalize_chunk(text: str) -> str:
+    # str.replace is much faster than str.translate on non-ASCII text
+    text = text.replace("\r", "").replace("\t", " ")
+    return RE_NORMALIZE.sub(_normalize_match, text)
+
+
+def _normalize_match(m: re.Match[str]) -> str:
+    first = m.string[m.start()]
+    if first == "H":
+        return f"H{m['herr']} {m['herr_name']}"
+    if first == "F":
+        return f"F{m['frau']} {m['frau_name']}"
+    return NORMALIZE_REPLACEMENTS.get(first, "")
+
+
+def _iter_safe_chunks(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the newline-joined pages in pieces that RE_NORMALIZE can process
+    independently: each cut sits at the start of a line that begins with a
+    non-blank character and does not follow a dangling salutation.
+    """
+    buffer = None
+    for page in pages:
+        buffer = page if buffer is None else f"{buffer}\n{page}"
+        cut = _last_safe_cut(buffer)
+        if cut:
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer
+
+
+def _last_safe_cut(text: str) -> int:
+    end = len(text)
+    while True:
+        newline = text.rfind("\n", 0, end)
+        if newline < 0:
+            return 0
+        cut = newline + 1
+        # Compared without "\r", the way RE_NORMALIZE sees the text
+        if (
+            cut < len(text)
+            and not text[cut].isspace()
+            and not text[:cut].replace("\r", "").rstrip().endswith(SALUTATIONS)
+        ):
+            return cut
+        end = newline
 
 
 # -------------------------
@@ -256,9 +665,107 @@ CONTRACT_RULES: list[tuple[str, list[re.Pattern[str]]]] = [
 ]
 
 
+# Widest character range ([a-z]) spelled out in the first-letter lookahead
+MAX_PREFILTER_RANGE = 64
+
+
+def _compile_contract_matcher(
+    rules: list[tuple[str, list[re.Pattern[str]]]],
+) -> re.Pattern[str]:
+    """
+    Combine all rules into one alternation with a named group per contract key.
+
+    The combined pattern is case-sensitive and runs on lowercased text, which
+    is much faster than re.I. A lookahead on the possible first characters
+    (read from the parsed rules) lets the scanner skip most positions without
+    trying every alternative; it is left out when a rule can start with
+    almost anything.
+    """
+    groups = []
+    first_chars: Optional[set] = set()
+    for contract_key, patterns in rules:
+        for p in patterns:
+            if p.pattern != p.pattern.lower():
+                raise ValueError(f"Contract rule patterns must be lowercase: {p.pattern!r}")
+            chars, can_be_empty = _first_chars(sre_parse.parse(p.pattern))
+            if first_chars is not None:
+                first_chars = None if chars is None or can_be_empty else first_chars | chars
+        groups.append(f"(?P<{contract_key}>{'|'.join(p.pattern for p in patterns)})")
+
+    prefilter = ""
+    if first_chars:
+        prefilter = f"(?=[{''.join(re.escape(c) for c in sorted(first_chars))}])"
+    return re.compile(f"{prefilter}(?:{'|'.join(groups)})")
+
+
+def _first_chars(items) -> tuple[Optional[set], bool]:
+    """
+    Characters a match of the parsed pattern `items` can start with (None:
+    too many to list), and whether the match can be empty.
+    """
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.AT:  # \b, ^, $: zero width
+            continue
+        if op is sre_parse.LITERAL:
+            item_chars, can_be_empty = {chr(av)}, False
+        elif op is sre_parse.IN:
+            item_chars, can_be_empty = _class_chars(av), False
+        elif op is sre_parse.SUBPATTERN:
+            item_chars, can_be_empty = _first_chars(av[-1])
+        elif op is sre_parse.BRANCH:
+            branches = [_first_chars(branch) for branch in av[1]]
+            item_chars = None
+            if all(branch_chars is not None for branch_chars, _ in branches):
+                item_chars = set().union(*(branch_chars for branch_chars, _ in branches))
+            can_be_empty = any(empty for _, empty in branches)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            item_chars, can_be_empty = _first_chars(av[2])
+            can_be_empty = can_be_empty or av[0] == 0
+        else:  # ".", \w, lookarounds, backreferences, ...
+            return None, False
+        if item_chars is None:
+            return None, False
+        chars |= item_chars
+        if not can_be_empty:
+            return chars, False
+    return chars, True
+
+
+def _class_chars(items) -> Optional[set]:
+    """The characters of a parsed [...] class, None if it is negated or too wide."""
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE and av[1] - av[0] < MAX_PREFILTER_RANGE:
+            chars.update(map(chr, range(av[0], av[1] + 1)))
+        else:  # NEGATE, \d, \s, ...
+            return None
+    return chars
+
+
+RE_CONTRACT_TYPES = _compile_contract_matcher(CONTRACT_RULES)
+
+# Ties between equally scored contract types go to the earlier rule
+CONTRACT_RULE_ORDER = {contract_key: i for i, (contract_key, _) in enumerate(CONTRACT_RULES)}
+
+
+def count_contract_type_hits(text: str) -> Dict[str, int]:
+    """Scan the text once and count (non-overlapping) hits per contract type."""
+    hits: Dict[str, int] = {}
+    for m in RE_CONTRACT_TYPES.finditer(text.lower()):
+        hits[m.lastgroup] = hits.get(m.lastgroup, 0) + 1
+    return hits
+
+
+def pick_contract_type(hits: Dict[str, int]) -> Optional[str]:
+    """Return the contract type with the most hits, if any."""
+    if not hits:
+        return None
+    return max(hits, key=lambda key: (hits[key], -CONTRACT_RULE_ORDER[key]))
+
+
 def extract_contract_type(text: str) -> Optional[str]:
-    """Return the first matching contract type key, if any."""
-    for contract_key, patterns in CONTRACT_RULES:
-        if any(p.search(text) for p in patterns):
-            return contract_key
-    return None
+    """Return the best scoring contract type key, if any."""
+    return pick_contract_type(count_contract_type_hits(text))
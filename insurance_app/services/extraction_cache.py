@@ -0,0 +1,80 @@
+import json
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from ..models import ExtractionCacheEntry
+
+
+def cache_max_bytes() -> int:
+    """Size budget of the extraction cache; 0 disables it."""
+    return getattr(settings, "PDF_EXTRACTION_CACHE_MAX_BYTES", 0)
+
+
+def get_cached_extraction(content_hash: str, extractor_version: str) -> Optional[dict]:
+    """Return the cached payload and mark the entry as recently used."""
+    entry = (
+        ExtractionCacheEntry.objects.filter(
+            content_hash=content_hash, extractor_version=extractor_version
+        )
+        .only("id", "payload")
+        .first()
+    )
+    if entry is None:
+        return None
+
+    ExtractionCacheEntry.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+    return entry.payload
+
+
+def store_extraction(content_hash: str, extractor_version: str, payload: dict) -> None:
+    """Store a payload and evict least recently used entries over the budget."""
+    size_bytes = len(json.dumps(payload).encode("utf-8"))
+    max_bytes = cache_max_bytes()
+    if max_bytes and size_bytes > max_bytes:
+        # Would evict everything else and still not fit
+        return
+
+    try:
+        with transaction.atomic():
+            ExtractionCacheEntry.objects.update_or_create(
+                content_hash=content_hash,
+                extractor_version=extractor_version,
+                defaults={
+                    "payload": payload,
+                    "size_bytes": size_bytes,
+                    "last_used_at": timezone.now(),
+                },
+            )
+    except IntegrityError:
+        # A concurrent import of the same file stored it first
+        return
+
+    evict_extraction_cache(max_bytes)
+
+
+def evict_extraction_cache(max_bytes: int) -> int:
+    """Delete least recently used entries until the cache fits into max_bytes."""
+    total = cache_size_bytes()
+    if total <= max_bytes:
+        return 0
+
+    to_delete = []
+    entries = ExtractionCacheEntry.objects.order_by("last_used_at", "id").values_list(
+        "id", "size_bytes"
+    )
+    for entry_id, size_bytes in entries.iterator():
+        if total <= max_bytes:
+            break
+        to_delete.append(entry_id)
+        total -= size_bytes
+
+    ExtractionCacheEntry.objects.filter(id__in=to_delete).delete()
+    return len(to_delete)
+
+
+def cache_size_bytes() -> int:
+    return ExtractionCacheEntry.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
@@ -0,0 +1,14 @@
+"""
+Preloaded by the forkserver of isolated_extraction: Django is set up once
+there, so every extraction child forked from it starts with the app
+registry and the PDF modules already imported.
+"""
+import os
+
+import django
+from django.apps import apps
+
+if not apps.ready and os.environ.get("DJANGO_SETTINGS_MODULE"):
+    django.setup()
+
+from . import extract_pdf_text  # noqa: E402,F401
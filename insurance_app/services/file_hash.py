@@ -0,0 +1,12 @@
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Return the hex SHA-256 of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,343 @@
+import html
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import Customer, Document
+from .document_keys import customer_broker_changed, document_keys_changed
+
+# Words of the search input; everything else (FTS/tsquery syntax) is dropped
+RE_SEARCH_TOKEN = re.compile(r"\w+")
+
+# Highlight markers inside snippets, replaced after HTML-escaping the text
+MARK_START, MARK_END = "\x02", "\x03"
+
+# Prefix lengths indexed for letters (migration 0011). A longer word is matched as a whole
+# word: FTS5 expands a longer prefix into a list of every letter containing
+# it before reading the first match.
+PREFIX_LENGTHS = (2, 3, 4, 5, 6, 7, 8)
+
+# Words of a letter around the best run of matches
+SNIPPET_WORDS = 16
+
+# ---------------------------------------------------------------------------
+# SQLite: FTS5 tables (created by migration 0011) kept in sync by the
+# receivers at the end of this module; triggers reading other tables would
+# break SQLite table rebuilds in later migrations. queryset.update(),
+# bulk_update() and raw SQL skip them: call sync_search_index() or run
+# manage.py rebuild_search_index. The broker is an indexed column
+# ("b<id>"), so the broker filter is part of the MATCH. Letters are indexed
+# without positions (detail = column): their snippets are built from
+# raw_text, and only the returned letters are read.
+# ---------------------------------------------------------------------------
+# Rows of insurance_app_customer_fts; name_norm finds "Mueller" for
+# "Müller" but is never shown
+SQLITE_FILL_CUSTOMERS = """
+    INSERT INTO insurance_app_customer_fts (rowid, broker, name, address, name_norm)
+    SELECT c.id, 'b' || ifnull(c.broker_id, ''),
+        trim(ifnull(c.first_name, '') || ' ' || ifnull(c.last_name, '')),
+        trim(ifnull(c.street, '') || ', ' || ifnull(c.zip_code, '') || ' ' || ifnull(c.city, ''), ', '),
+        c.first_name_norm || ' ' || c.last_name_norm
+    FROM insurance_app_customer c {where}
+"""
+SQLITE_FILL_DOCUMENTS = """
+    INSERT INTO insurance_app_document_fts (rowid, broker, customer, raw_text)
+    SELECT d.id, 'b' || ifnull(c.broker_id, ''), d.customer_id, ifnull(d.raw_text, '')
+    FROM insurance_app_document d LEFT JOIN insurance_app_customer c ON c.id = d.customer_id {where}
+"""
+# (full-text table, fill statement, alias of the source table)
+SQLITE_TABLES = {
+    "customers": ("insurance_app_customer_fts", SQLITE_FILL_CUSTOMERS, "c"),
+    "documents": ("insurance_app_document_fts", SQLITE_FILL_DOCUMENTS, "d"),
+}
+# Ids per statement, below SQLite's bound parameter limit
+SQLITE_SYNC_BATCH = 500
+
+# ---------------------------------------------------------------------------
+# PostgreSQL: GIN expression indexes (migration 0011); queries repeat the
+# exact expressions so the planner can use them.
+# ---------------------------------------------------------------------------
+# {row} is the table alias ("d."); without it these are the indexed expressions
+POSTGRES_DOCUMENT_VECTOR = "to_tsvector('german', coalesce({row}raw_text, ''))"
+POSTGRES_CUSTOMER_VECTOR = (
+    "to_tsvector('simple', coalesce({row}first_name, '') || ' ' || coalesce({row}last_name, '') "
+    "|| ' ' || coalesce({row}street, '') || ' ' || coalesce({row}zip_code, '') || ' ' || "
+    "coalesce({row}city, ''))"
+)
+
+
+@dataclass
+class SearchHit:
+    customer_id: int
+    # Higher is better; only comparable within one search
+    score: float
+    # HTML-escaped text around the match, hits wrapped in <mark>
+    snippet: str
+    document_id: Optional[int] = None
+
+
+def max_results() -> int:
+    return getattr(settings, "CUSTOMER_SEARCH_MAX_RESULTS", 200)
+
+
+def candidate_letters() -> int:
+    """
+    Matching letters read per search, newest first; customers are ranked by
+    their number of matching letters among these.
+    """
+    return getattr(settings, "CUSTOMER_SEARCH_CANDIDATES", 1000)
+
+
+def sync_search_index(customer_ids=(), document_ids=(), created: bool = False) -> None:
+    """
+    Rewrite the SQLite full-text rows of these customers and documents from
+    their current table rows; deleted ones lose theirs (`created`: new rows,
+    nothing to replace). PostgreSQL indexes the columns themselves.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for kind, ids in (("customers", customer_ids), ("documents", document_ids)):
+            table, fill, alias = SQLITE_TABLES[kind]
+            ids = list(ids)
+            for start in range(0, len(ids), SQLITE_SYNC_BATCH):
+                batch = ids[start:start + SQLITE_SYNC_BATCH]
+                placeholders = ", ".join(["%s"] * len(batch))
+                if not created:
+                    cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", batch)
+                cursor.execute(fill.format(where=f"WHERE {alias}.id IN ({placeholders})"), batch)
+
+
+def rebuild_search_index() -> None:
+    """Refill the SQLite full-text tables from scratch (after bulk changes)."""
+    if connection.vendor != "sqlite":
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, fill, _ in SQLITE_TABLES.values():
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(fill.format(where=""))
+
+
+def search_customers(broker, query: str, limit: Optional[int] = None) -> list[SearchHit]:
+    """
+    Customers of `broker` whose name, address or letters (Document.raw_text)
+    contain every word of `query`, best match first. Words of up to
+    PREFIX_LENGTHS[-1] characters match as prefixes, longer words as a whole.
+    """
+    tokens = RE_SEARCH_TOKEN.findall(query)
+    if not tokens or broker is None:
+        return []
+    limit = limit or max_results()
+    if connection.vendor == "sqlite":
+        return _search_sqlite(broker.pk, tokens, limit)
+    if connection.vendor == "postgresql":
+        return _search_postgres(broker.pk, tokens, limit)
+    return _search_unindexed(broker, tokens, limit)
+
+
+def fold(word: str) -> str:
+    """Lower case without diacritics, like the unicode61 tokenizer ("Müller" -> "muller")."""
+    decomposed = unicodedata.normalize("NFD", word.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def is_prefix(token: str) -> bool:
+    return len(fold(token)) <= PREFIX_LENGTHS[-1]
+
+
+def format_snippet(text: str) -> str:
+    escaped = html.escape(text or "", quote=False)
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def letter_snippet(text: str, tokens: list[str], words: int = SNIPPET_WORDS) -> str:
+    """
+    `words` words of `text` around its densest run of matches, HTML-escaped,
+    matches wrapped in <mark>.
+    """
+    text = text or ""
+    terms = [(fold(token), is_prefix(token)) for token in tokens]
+
+    def matches(word):
+        word = fold(word)
+        return any(word.startswith(term) if prefix else word == term for term, prefix in terms)
+
+    spans = list(RE_SEARCH_TOKEN.finditer(text))
+    if not spans:
+        return ""
+    hits = [i for i, span in enumerate(spans) if matches(span.group())]
+    start = 0
+    if hits:
+        # First word of the window holding the most hits, with some context
+        densest = max(hits, key=lambda i: bisect_left(hits, i + words) - bisect_left(hits, i))
+        start = max(densest - words // 4, 0)
+    end = min(start + words, len(spans))
+
+    hit_set = set(hits)
+    parts = ["…"] if start else []
+    position = spans[start].start()
+    for i in range(start, end):
+        span = spans[i]
+        parts.append(html.escape(text[position:span.start()], quote=False))
+        word = html.escape(span.group(), quote=False)
+        parts.append(f"<mark>{word}</mark>" if i in hit_set else word)
+        position = span.end()
+    parts.append("…" if end < len(spans) else html.escape(text[position:], quote=False))
+    return re.sub(r"\s+", " ", "".join(parts)).strip()
+
+
+def _letter_hits(letters, tokens: list[str], limit: int) -> list[SearchHit]:
+    """
+    One hit per customer from matching (document_id, customer_id) rows,
+    newest first: customers with more matching letters first, the snippet
+    from their newest one. Scores stay below 1, under every customer match.
+    """
+    counts = Counter()
+    newest = {}
+    for document_id, customer_id in letters:
+        if customer_id is None:
+            continue
+        counts[customer_id] += 1
+        newest.setdefault(customer_id, document_id)
+    customer_ids = sorted(newest, key=lambda c: -counts[c])[:limit]
+    texts = dict(
+        Document.objects.filter(id__in=[newest[c] for c in customer_ids]).values_list("id", "raw_text")
+    )
+    return [
+        SearchHit(
+            customer_id,
+            counts[customer_id] / (counts[customer_id] + 1),
+            letter_snippet(texts.get(newest[customer_id], ""), tokens),
+            newest[customer_id],
+        )
+        for customer_id in customer_ids
+    ]
+
+
+def _merge(hits, limit: int) -> list[SearchHit]:
+    """Best hit per customer, best customers first (ties in the given order)."""
+    best = {}
+    for hit in hits:
+        if hit.customer_id is None:
+            continue
+        current = best.get(hit.customer_id)
+        if current is None or hit.score > current.score:
+            best[hit.customer_id] = hit
+    return sorted(best.values(), key=lambda h: -h.score)[:limit]
+
+
+def _search_sqlite(broker_id: int, tokens: list[str], limit: int) -> list[SearchHit]:
+    words = " AND ".join(f'"{token}"*' if is_prefix(token) else f'"{token}"' for token in tokens)
+    match = f'broker : "b{broker_id}" AND ({words})'
+    hits = []
+    with connection.cursor() as cursor:
+        # bm25() is negative, lower is better; the broker column does not count
+        cursor.execute(
+            """
+            SELECT rowid, bm25(insurance_app_customer_fts, 0.0, 10.0, 5.0, 10.0),
+                highlight(insurance_app_customer_fts, 1, %s, %s) || ', '
+                    || highlight(insurance_app_customer_fts, 2, %s, %s)
+            FROM insurance_app_customer_fts
+            WHERE insurance_app_customer_fts MATCH %s
+            ORDER BY rank LIMIT %s
+            """,
+            [MARK_START, MARK_END, MARK_START, MARK_END, match, limit],
+        )
+        for customer_id, rank, snippet in cursor.fetchall():
+            hits.append(SearchHit(customer_id, 1.0 - rank, format_snippet(snippet)))
+
+        # No bm25() for letters: its document frequencies read every match of
+        # every word, while newest-first stops after candidate_letters() rows
+        cursor.execute(
+            """
+            SELECT rowid, customer FROM insurance_app_document_fts
+            WHERE insurance_app_document_fts MATCH %s
+            ORDER BY rowid DESC LIMIT %s
+            """,
+            [match, candidate_letters()],
+        )
+        letters = cursor.fetchall()
+    return _merge(hits + _letter_hits(letters, tokens, limit), limit)
+
+
+def _search_postgres(broker_id: int, tokens: list[str], limit: int) -> list[SearchHit]:
+    customer_vector = POSTGRES_CUSTOMER_VECTOR.format(row="c.")
+    document_vector = POSTGRES_DOCUMENT_VECTOR.format(row="d.")
+    # Tokens are \w+ only, so they are safe tsquery operands
+    tsquery = " & ".join(f"{token}:*" if is_prefix(token) else token for token in tokens)
+    headline = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=24, MinWords=8, MaxFragments=1"
+    hits = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT c.id, ts_rank_cd({customer_vector}, q) AS score,
+                ts_headline('simple', concat_ws(' ', c.first_name, c.last_name, c.street,
+                    c.zip_code, c.city), q, %s)
+            FROM insurance_app_customer c, to_tsquery('simple', %s) q
+            WHERE c.broker_id = %s AND {customer_vector} @@ q
+            ORDER BY score DESC LIMIT %s
+            """,
+            [headline, tsquery, broker_id, limit],
+        )
+        for customer_id, score, snippet in cursor.fetchall():
+            hits.append(SearchHit(customer_id, 1.0 + score, format_snippet(snippet)))
+
+        cursor.execute(
+            f"""
+            SELECT d.id, d.customer_id
+            FROM insurance_app_document d
+            JOIN insurance_app_customer c ON c.id = d.customer_id,
+                to_tsquery('german', %s) q
+            WHERE c.broker_id = %s AND {document_vector} @@ q
+            ORDER BY d.id DESC LIMIT %s
+            """,
+            [tsquery, broker_id, candidate_letters()],
+        )
+        letters = cursor.fetchall()
+    return _merge(hits + _letter_hits(letters, tokens, limit), limit)
+
+
+def _search_unindexed(broker, tokens: list[str], limit: int) -> list[SearchHit]:
+    """Other backends: icontains scans, customers unranked."""
+    customers = Customer.objects.filter(broker=broker)
+    documents = Document.objects.filter(customer__broker=broker)
+    for token in tokens:
+        customers = customers.filter(
+            Q(first_name__icontains=token) | Q(last_name__icontains=token)
+            | Q(street__icontains=token) | Q(zip_code__icontains=token) | Q(city__icontains=token)
+        )
+        documents = documents.filter(raw_text__icontains=token)
+    hits = [SearchHit(customer_id, 1.0, "") for customer_id in customers.values_list("id", flat=True)[:limit]]
+    letters = documents.order_by("-id").values_list("id", "customer_id")[: candidate_letters()]
+    return _merge(hits + _letter_hits(letters, tokens, limit), limit)
+
+
+@receiver(post_save, sender=Customer)
+def _customer_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Letters carry their customer's broker
+    documents = ()
+    if customer_broker_changed(created, update_fields):
+        documents = Document.objects.filter(customer=instance).values_list("id", flat=True)
+    sync_search_index([instance.pk], documents, created=created)
+
+
+@receiver(post_delete, sender=Customer)
+def _customer_deleted(sender, instance, **kwargs):
+    # Its letters are deleted along (CASCADE) and send their own post_delete
+    sync_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def _document_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if document_keys_changed(update_fields, "raw_text"):
+        sync_search_index(document_ids=[instance.pk], created=created)
@@ -0,0 +1,249 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from ..models import Customer
+from .identity_normalization import normalize_name, normalize_street
+
+# Share of each field in the combined score; fields missing on the letter
+# are left out and the remaining weights scaled up
+SCORE_WEIGHTS = {"last_name": 0.45, "first_name": 0.2, "street": 0.35}
+
+@dataclass
+class ScoredCandidate:
+    customer: Customer
+    score: float
+
+
+def match_threshold() -> float:
+    """Score from which the best candidate is taken without asking."""
+    return getattr(settings, "CUSTOMER_MATCH_THRESHOLD", 0.85)
+
+
+def match_margin() -> float:
+    """Lead the best candidate needs over the second best to be taken."""
+    return getattr(settings, "CUSTOMER_MATCH_MARGIN", 0.08)
+
+
+def candidate_threshold() -> float:
+    """Score from which a customer is offered as a candidate (409)."""
+    return getattr(settings, "CUSTOMER_CANDIDATE_THRESHOLD", 0.7)
+
+
+def max_candidates() -> int:
+    return getattr(settings, "CUSTOMER_MATCH_MAX_CANDIDATES", 5)
+
+
+def levenshtein(a: str, b: str) -> int:
+    """
+    Edit distance (insert, delete, substitute) between two strings.
+
+    Bit-parallel (Myers/Hyyrö): one pass over `a` with the columns of the
+    DP matrix packed into ints, several times faster than the row-by-row
+    table in Python for names and streets.
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if not m:
+        return len(a)
+    peq = {}
+    for i, c in enumerate(b):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, distance = mask, 0, m
+    for c in a:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+        ph = (ph << 1) | 1
+        pv = ((mh << 1) | ~(xv | ph)) & mask
+        mv = ph & xv
+    return distance
+
+
+def similarity(a: str, b: str) -> float:
+    """1.0 for equal strings, 0.0 for nothing in common (Levenshtein ratio)."""
+    if not a or not b:
+        return 0.0
+    return 1.0 - levenshtein(a, b) / max(len(a), len(b))
+
+
+def trigrams(value: str) -> set:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """Dice coefficient of the padded trigram sets (word-order tolerant)."""
+    if not a or not b:
+        return 0.0
+    ta, tb = trigrams(a), trigrams(b)
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+def first_name_similarity(a: str, b: str) -> float:
+    # "M." on the letter against "Max" in the database
+    short_a, short_b = a.rstrip(". "), b.rstrip(". ")
+    if len(short_a) == 1 or len(short_b) == 1:
+        return 1.0 if short_a[:1] == short_b[:1] else 0.0
+    return similarity(a, b)
+
+
+def split_house_number(street_norm: str) -> tuple[str, str]:
+    """("hauptstrasse", "5a") from "hauptstrasse 5a"."""
+    name, _, number = street_norm.rpartition(" ")
+    if name and number[:1].isdigit():
+        return name, number
+    return street_norm, ""
+
+
+def street_similarity(a: str, b: str) -> float:
+    """
+    Street names are compared fuzzily, house numbers exactly: "Hauptstrasse 5"
+    and "Hauptstrasse 7" are different households, not an OCR error.
+    """
+    name_a, number_a = split_house_number(a)
+    name_b, number_b = split_house_number(b)
+    if number_a != number_b:
+        return 0.0
+    return max(similarity(name_a, name_b), trigram_similarity(name_a, name_b))
+
+
+class Scorer:
+    """
+    Scores customers against one letter:
+    score(first_name_norm, last_name_norm, street_norm) -> 0..1.
+
+    Comparisons are memoized per stored value; within a zip code many
+    customers share a street or a last name, so most are dictionary hits.
+    With a `minimum`, a customer is given up (0.0) as soon as the fields
+    left cannot lift it to that score, mostly right after the last name.
+    """
+
+    def __init__(self, customer_data: dict, minimum: float = 0.0):
+        wanted = (
+            normalize_name(customer_data.get("first_name") or ""),
+            normalize_name(customer_data.get("last_name") or ""),
+            normalize_street(customer_data.get("street") or ""),
+        )
+        # (position in the score() arguments, letter value, compare, weight, memo),
+        # heaviest first; fields missing on the letter do not count
+        fields = [
+            (position, wanted[position], compare, SCORE_WEIGHTS[field], {})
+            for position, (field, compare) in enumerate(
+                (
+                    ("first_name", first_name_similarity),
+                    ("last_name", similarity),
+                    ("street", street_similarity),
+                )
+            )
+            if wanted[position]
+        ]
+        self._fields = sorted(fields, key=lambda f: -f[3])
+        self._weight_sum = sum(f[3] for f in fields)
+        self._minimum = minimum * self._weight_sum
+
+    def score(self, *stored: str) -> float:
+        if not self._weight_sum:
+            return 0.0
+        total = 0.0
+        left = self._weight_sum
+        for position, wanted, compare, weight, memo in self._fields:
+            value = stored[position] or ""
+            if value not in memo:
+                memo[value] = compare(wanted, value)
+            total += weight * memo[value]
+            left -= weight
+            if total + left < self._minimum:
+                return 0.0
+        return round(total / self._weight_sum, 3)
+
+
+def rank_candidates(customer_data: dict, customers: Iterable[Customer]) -> list[ScoredCandidate]:
+    """All customers scored against the letter data, best first."""
+    scorer = Scorer(customer_data)
+    scored = [
+        ScoredCandidate(
+            customer,
+            scorer.score(customer.first_name_norm, customer.last_name_norm, customer.street_norm),
+        )
+        for customer in customers
+    ]
+    # Ties in a stable order (oldest customer first)
+    scored.sort(key=lambda c: (-c.score, c.customer.id))
+    return scored
+
+
+def block_candidates(broker, zip_code: str):
+    """
+    (id, first_name_norm, last_name_norm, street_norm) of every customer the
+    letter can belong to: same broker and zip code.
+
+    Served by the (broker, zip_code, street_norm) index. Plain tuples, no
+    model instances: a zip code can hold a few thousand customers of a large
+    broker, and only the best few are loaded afterwards.
+    """
+    return Customer.objects.filter(broker=broker, zip_code=zip_code).values_list(
+        "id", "first_name_norm", "last_name_norm", "street_norm"
+    )
+
+
+def fuzzy_match(
+    customer_data: dict, broker, index=None
+) -> tuple[Optional[Customer], list[ScoredCandidate]]:
+    """
+    (customer, candidates) for letter data that had no exact match.
+    Candidates come from the broker's customer index when one is given,
+    otherwise from the database.
+
+    customer is set when the best candidate reaches CUSTOMER_MATCH_THRESHOLD
+    with CUSTOMER_MATCH_MARGIN over the runner-up. Otherwise candidates lists
+    every customer at or above CUSTOMER_CANDIDATE_THRESHOLD (best first, at
+    most CUSTOMER_MATCH_MAX_CANDIDATES); empty means: a new customer.
+    """
+    zip_code = (customer_data.get("zip_code") or "").strip()
+    if not zip_code:
+        return None, []
+
+    minimum = candidate_threshold()
+    scorer = Scorer(customer_data, minimum)
+    scored = []
+    if index is not None:
+        block = index.in_zip(zip_code)
+    else:
+        block = block_candidates(broker, zip_code)
+    for customer_id, *stored in block:
+        score = scorer.score(*stored)
+        if score and score >= minimum:
+            scored.append((score, customer_id))
+    if not scored:
+        return None, []
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    best_score = scored[0][0]
+    runner_up = scored[1][0] if len(scored) > 1 else 0.0
+    decisive = best_score >= match_threshold() and best_score - runner_up >= match_margin()
+    scored = scored[:1] if decisive else scored[: max_candidates()]
+
+    # Customers deleted since the block query are skipped
+    source = Customer.objects if index is None else index
+    customers = source.in_bulk([customer_id for _, customer_id in scored])
+    ranked = [
+        ScoredCandidate(customers[customer_id], score)
+        for score, customer_id in scored
+        if customer_id in customers
+    ]
+    if decisive and ranked:
+        return ranked[0].customer, []
+    return None, ranked
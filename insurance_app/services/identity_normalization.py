@@ -0,0 +1,46 @@
+import re
+import unicodedata
+
+# German letters folded the way people type them without a German keyboard
+FOLD_TABLE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+RE_WHITESPACE = re.compile(r"\s+")
+
+# "Hauptstr.5" -> "Hauptstr. 5"
+RE_WORD_NUMBER = re.compile(r"(?<=[^\W\d])(?=\d)|(?<=\.)(?=\d)")
+# "5 a" -> "5a"
+RE_HOUSE_NUMBER_SUFFIX = re.compile(r"(?<=\d) (?=[a-z]\b)")
+
+# Abbreviations at the end of a word ("Hauptstr.", "Haupt Str", "Marktpl.")
+STREET_ABBREVIATIONS = [
+    (re.compile(r"str\b\.?"), "strasse"),
+    (re.compile(r"pl\."), "platz"),
+]
+
+
+def fold_text(value: str) -> str:
+    """Case-, umlaut- and accent-insensitive form with single spaces."""
+    value = (value or "").casefold().translate(FOLD_TABLE)
+    # Remaining accents ("é" -> "e")
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return RE_WHITESPACE.sub(" ", value).strip()
+
+
+def normalize_name(value: str) -> str:
+    return fold_text(value)
+
+
+def normalize_street(value: str) -> str:
+    """
+    Comparable form of a street address.
+
+    "Hauptstr. 5 a", "Hauptstraße 5a" and "HAUPTSTRASSE  5A" all become
+    "hauptstrasse 5a".
+    """
+    value = fold_text(value).replace("-", " ")
+    value = RE_WORD_NUMBER.sub(" ", value)
+    for pattern, replacement in STREET_ABBREVIATIONS:
+        value = pattern.sub(replacement, value)
+    value = RE_WHITESPACE.sub(" ", value.replace(".", " ")).strip()
+    return RE_HOUSE_NUMBER_SUFFIX.sub("", value)
@@ -0,0 +1,145 @@
+import logging
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between two attempts of a job
+MAX_RETRY_BACKOFF_SECONDS = 3600
+
+# Claims lost to another worker before giving up for this poll
+CLAIM_ATTEMPTS = 5
+
+# (pdf_path, broker) -> (status_code, response payload, stage timings in ms)
+ImportRunner = Callable[[str, object], tuple[int, dict, dict]]
+
+
+def enqueue_import(pdf_path: str, broker) -> ImportJob:
+    return ImportJob.objects.create(
+        broker=broker,
+        pdf_path=pdf_path,
+        max_attempts=getattr(settings, "IMPORT_JOB_MAX_ATTEMPTS", 3),
+    )
+
+
+def retry_backoff(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts."""
+    base = getattr(settings, "IMPORT_JOB_RETRY_BACKOFF", 30)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), MAX_RETRY_BACKOFF_SECONDS))
+
+
+def claim_next_job(worker_id: str) -> Optional[ImportJob]:
+    """
+    Mark the next due job as running for this worker and return it.
+
+    Postgres skips rows other workers have locked (SKIP LOCKED). SQLite has
+    no row locks; there the job is picked and claimed by a single UPDATE,
+    which runs under SQLite's write lock. Jobs whose worker died are picked
+    up again once IMPORT_JOB_LOCK_TIMEOUT has passed.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, "IMPORT_JOB_LOCK_TIMEOUT", 600))
+
+    # Lost for good: the worker died on the last allowed attempt
+    ImportJob.objects.filter(
+        status=ImportJob.STATUS_RUNNING,
+        locked_at__lt=stale_before,
+        attempts__gte=F("max_attempts"),
+    ).update(
+        status=ImportJob.STATUS_FAILED,
+        finished_at=now,
+        locked_by="",
+        locked_at=None,
+        last_error="Worker stopped while processing the job.",
+    )
+
+    due = ImportJob.objects.filter(
+        Q(status=ImportJob.STATUS_QUEUED, available_at__lte=now)
+        | Q(status=ImportJob.STATUS_RUNNING, locked_at__lt=stale_before)
+    ).order_by("available_at", "id")
+
+    claim = {
+        "status": ImportJob.STATUS_RUNNING,
+        "attempts": F("attempts") + 1,
+        "locked_by": worker_id,
+        "locked_at": now,
+        "started_at": now,
+    }
+    if not connection.features.has_select_for_update_skip_locked:
+        # A SELECT followed by an UPDATE would fail with "database is
+        # locked" when two workers both hold a read lock and need the write
+        # lock; a single statement waits for it (busy timeout) instead
+        if not due.filter(pk__in=due.values("pk")[:1]).update(**claim):
+            return None
+        return ImportJob.objects.select_related("broker").get(
+            status=ImportJob.STATUS_RUNNING, locked_by=worker_id, locked_at=now
+        )
+
+    for _ in range(CLAIM_ATTEMPTS):
+        with transaction.atomic():
+            job = due.select_for_update(skip_locked=True).only("id", "status", "attempts").first()
+            if job is None:
+                return None
+
+            claimed = ImportJob.objects.filter(
+                pk=job.pk, status=job.status, attempts=job.attempts
+            ).update(**claim)
+        if claimed:
+            return ImportJob.objects.select_related("broker").get(pk=job.pk)
+    return None
+
+
+def run_job(job: ImportJob, run_import: ImportRunner) -> ImportJob:
+    """
+    Run a claimed job and record its outcome.
+
+    Server errors and exceptions are retried with backoff until
+    max_attempts is reached; client errors (missing file, ambiguous
+    customer, extraction limits) are final.
+    """
+    try:
+        status_code, result, timings = run_import(job.pdf_path, job.broker)
+        error = "" if status_code < 400 else str(result.get("error", ""))
+    except Exception as e:
+        logger.exception("Import job crashed", extra={"job_id": job.id, "pdf_path": job.pdf_path})
+        status_code, result, timings, error = None, None, {}, repr(e)
+
+    now = timezone.now()
+    job.result_status_code = status_code
+    job.result = result
+    job.timings = timings
+    job.last_error = error
+    job.locked_by = ""
+    job.locked_at = None
+
+    if status_code is not None and status_code < 500:
+        job.status = ImportJob.STATUS_SUCCEEDED if status_code < 400 else ImportJob.STATUS_FAILED
+        job.finished_at = now
+    elif job.attempts < job.max_attempts:
+        job.status = ImportJob.STATUS_QUEUED
+        job.available_at = now + retry_backoff(job.attempts)
+    else:
+        job.status = ImportJob.STATUS_FAILED
+        job.finished_at = now
+
+    job.save(
+        update_fields=[
+            "status",
+            "available_at",
+            "finished_at",
+            "locked_by",
+            "locked_at",
+            "result_status_code",
+            "result",
+            "timings",
+            "last_error",
+        ]
+    )
+    return job
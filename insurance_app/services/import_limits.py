@@ -0,0 +1,173 @@
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no limits
+    fcntl = None
+
+# How often a waiting worker retries to get a slot
+WAIT_POLL_INTERVAL = 0.5
+
+
+class ImportLimitExceeded(Exception):
+    """All import slots of a scope ("global" or "broker") are taken."""
+
+    def __init__(self, scope: str, limit: int, retry_after: int):
+        super().__init__(f"Too many concurrent imports ({scope} limit {limit}).")
+        self.scope = scope
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def global_limit() -> int:
+    """Imports running at once on this host; 0 = no limit."""
+    return getattr(settings, "IMPORT_MAX_CONCURRENT", 0)
+
+
+def broker_limit() -> int:
+    """Imports running at once per broker; 0 = no limit."""
+    return getattr(settings, "IMPORT_MAX_CONCURRENT_PER_BROKER", 0)
+
+
+def retry_after_seconds() -> int:
+    return getattr(settings, "IMPORT_RETRY_AFTER", 10)
+
+
+def slot_dir() -> str:
+    return getattr(settings, "IMPORT_LIMIT_DIR", "") or os.path.join(
+        tempfile.gettempdir(), "document-scanner-import-slots"
+    )
+
+
+@contextmanager
+def import_slot(broker_id, wait: Optional[float] = 0) -> Iterator[None]:
+    """
+    Hold one broker slot and one global slot while importing.
+
+    Slots are lock files under IMPORT_LIMIT_DIR, taken with flock(), so the
+    limits hold across all gunicorn workers (and queue workers) on the host,
+    and a slot is freed by the kernel when its process dies. The holder also
+    keeps a shared lock on the slot's busy-N file, which in_flight() probes
+    instead of the slot itself.
+
+    Raises ImportLimitExceeded when no slot frees up within `wait` seconds
+    (0 = fail right away, for requests; None = wait as long as it takes,
+    for background workers).
+    """
+    deadline = None if wait is None else time.monotonic() + wait
+    while True:
+        try:
+            held = _lock_slots(broker_id)
+            break
+        except ImportLimitExceeded:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise
+            time.sleep(WAIT_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        for fd in held:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def in_flight() -> dict:
+    """{"global": n, "brokers": {broker_id: n}} of imports running right now."""
+    counts = {"global": 0, "brokers": {}}
+    if fcntl is None:
+        return counts
+    counts["global"] = _count_locked(os.path.join(slot_dir(), "global"))
+    try:
+        entries = list(os.scandir(slot_dir()))
+    except FileNotFoundError:
+        return counts
+    for entry in entries:
+        if entry.is_dir() and entry.name.startswith("broker-"):
+            busy = _count_locked(entry.path)
+            if busy:
+                counts["brokers"][entry.name[len("broker-"):]] = busy
+    return counts
+
+
+def render_in_flight() -> str:
+    """In-flight gauges in the Prometheus text format."""
+    counts = in_flight()
+    lines = [
+        "# HELP import_in_flight Imports running right now on this host.",
+        "# TYPE import_in_flight gauge",
+        f'import_in_flight{{scope="global"}} {counts["global"]}',
+    ]
+    for broker_id, busy in sorted(counts["brokers"].items()):
+        lines.append(f'import_in_flight{{scope="broker",broker="{broker_id}"}} {busy}')
+    lines += [
+        "# HELP import_concurrency_limit Configured import slots (0 = unlimited).",
+        "# TYPE import_concurrency_limit gauge",
+        f'import_concurrency_limit{{scope="global"}} {global_limit()}',
+        f'import_concurrency_limit{{scope="broker"}} {broker_limit()}',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _lock_slots(broker_id) -> list[int]:
+    held = []
+    # Broker first: a busy broker must not block a global slot meanwhile
+    for scope, directory, limit in (
+        ("broker", os.path.join(slot_dir(), f"broker-{broker_id}"), broker_limit()),
+        ("global", os.path.join(slot_dir(), "global"), global_limit()),
+    ):
+        if not limit or fcntl is None:
+            continue
+        fds = _lock_free_slot(directory, limit)
+        if fds is None:
+            for taken in held:
+                fcntl.flock(taken, fcntl.LOCK_UN)
+                os.close(taken)
+            raise ImportLimitExceeded(scope, limit, retry_after_seconds())
+        held.extend(fds)
+    return held
+
+
+def _lock_free_slot(directory: str, limit: int) -> Optional[list[int]]:
+    os.makedirs(directory, exist_ok=True)
+    # Random start, so concurrent requests do not all probe slot 0 first
+    offset = random.randrange(limit)
+    for i in range(limit):
+        slot = (offset + i) % limit
+        fd = os.open(os.path.join(directory, f"slot-{slot}"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        # Blocking: at most waits out an in_flight() probe
+        busy = os.open(os.path.join(directory, f"busy-{slot}"), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(busy, fcntl.LOCK_SH)
+        return [busy, fd]
+    return None
+
+
+def _count_locked(directory: str) -> int:
+    # Probes the busy-N files: locking a slot itself, however briefly,
+    # would make an import starting meanwhile see it taken
+    try:
+        entries = [entry.path for entry in os.scandir(directory) if entry.name.startswith("busy-")]
+    except FileNotFoundError:
+        return 0
+    busy = 0
+    for path in entries:
+        fd = os.open(path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        except BlockingIOError:
+            busy += 1
+        finally:
+            os.close(fd)
+    return busy
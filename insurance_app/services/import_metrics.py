@@ -0,0 +1,171 @@
+import bisect
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: histograms per process
+    fcntl = None
+
+# Upper bounds (Prometheus "le") of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PAGES_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 300)
+BYTES_BUCKETS = (
+    10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 25 * 1024 ** 2, 100 * 1024 ** 2
+)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus exposition format."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One extra slot for +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    @classmethod
+    def load(cls, buckets: Sequence[float], state: Optional[dict]) -> "Histogram":
+        """A histogram from dump(); empty if the buckets have changed since."""
+        histogram = cls(buckets)
+        if state and len(state["counts"]) == len(histogram.counts):
+            histogram.counts = list(state["counts"])
+            histogram.sum = state["sum"]
+        return histogram
+
+    def dump(self) -> dict:
+        return {"counts": self.counts, "sum": self.sum}
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str = "") -> list[str]:
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:g}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+        return lines
+
+
+class ImportMetrics:
+    """The import histograms of a host (or of one process, see shared_metrics())."""
+
+    def __init__(self, state: Optional[dict] = None):
+        state = state or {}
+        self.stage_seconds: Dict[str, Histogram] = {
+            stage: Histogram.load(SECONDS_BUCKETS, histogram)
+            for stage, histogram in state.get("stage_seconds", {}).items()
+        }
+        self.document_pages = Histogram.load(PAGES_BUCKETS, state.get("document_pages"))
+        self.document_bytes = Histogram.load(BYTES_BUCKETS, state.get("document_bytes"))
+
+    def dump(self) -> dict:
+        return {
+            "stage_seconds": {stage: h.dump() for stage, h in self.stage_seconds.items()},
+            "document_pages": self.document_pages.dump(),
+            "document_bytes": self.document_bytes.dump(),
+        }
+
+
+def metrics_file() -> str:
+    return getattr(settings, "IMPORT_METRICS_FILE", "") or os.path.join(
+        tempfile.gettempdir(), "document-scanner-import-metrics.json"
+    )
+
+
+_lock = threading.Lock()
+# Only used without fcntl
+_local = ImportMetrics()
+
+
+@contextmanager
+def shared_metrics(write: bool = False) -> Iterator[ImportMetrics]:
+    """
+    The histograms of every process on the host (gunicorn and queue
+    workers), kept in IMPORT_METRICS_FILE: read under a shared flock(),
+    changed under an exclusive one and replaced atomically, so any worker
+    answering a scrape reports the same totals. Without fcntl (Windows)
+    each process keeps its own.
+    """
+    with _lock:
+        if fcntl is None:
+            yield _local
+            return
+        path = metrics_file()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            metrics = ImportMetrics(_read_state(path))
+            yield metrics
+            if write:
+                temporary = f"{path}.{os.getpid()}.tmp"
+                with open(temporary, "w") as f:
+                    json.dump(metrics.dump(), f)
+                os.replace(temporary, path)
+
+
+def _read_state(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:  # Cut short by a crash: start over
+        return None
+
+
+def record_import(
+    stage_seconds: Dict[str, float],
+    page_count: Optional[int] = None,
+    file_size: Optional[int] = None,
+) -> None:
+    """Add one import's stage timings and document size to the histograms."""
+    with shared_metrics(write=True) as metrics:
+        for stage, seconds in stage_seconds.items():
+            histogram = metrics.stage_seconds.get(stage)
+            if histogram is None:
+                histogram = metrics.stage_seconds[stage] = Histogram(SECONDS_BUCKETS)
+            histogram.observe(seconds)
+        if page_count:
+            metrics.document_pages.observe(page_count)
+        if file_size is not None:
+            metrics.document_bytes.observe(file_size)
+
+
+def render_metrics() -> str:
+    """All import histograms in the Prometheus text format (version 0.0.4)."""
+    lines = [
+        "# HELP import_stage_seconds Time spent per document import stage.",
+        "# TYPE import_stage_seconds histogram",
+    ]
+    with shared_metrics() as metrics:
+        for stage, histogram in metrics.stage_seconds.items():
+            lines += histogram.render("import_stage_seconds", f'stage="{stage}"')
+        lines += [
+            "# HELP import_document_pages Pages of imported PDFs.",
+            "# TYPE import_document_pages histogram",
+            *metrics.document_pages.render("import_document_pages"),
+            "# HELP import_document_bytes File size of imported PDFs.",
+            "# TYPE import_document_bytes histogram",
+            *metrics.document_bytes.render("import_document_bytes"),
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    with shared_metrics(write=True) as metrics:
+        metrics.stage_seconds.clear()
+        metrics.document_pages = Histogram(PAGES_BUCKETS)
+        metrics.document_bytes = Histogram(BYTES_BUCKETS)
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from django.db import close_old_connections
+from watchdog.events import FileSystemEventHandler
+
+from .move_pdf import move_pdf_to_unassigned_folder
+
+logger = logging.getLogger(__name__)
+
+# Give up on a file that is still growing after this many seconds
+STABLE_TIMEOUT = 600
+
+# (pdf_path, broker) -> (status_code, response payload, stage timings in ms)
+ImportRunner = Callable[[str, object], tuple[int, dict, dict]]
+
+
+def is_pdf(path: str) -> bool:
+    name = os.path.basename(path)
+    # Skip hidden and temporary upload files (".scan.pdf", "~$x.pdf")
+    return name.lower().endswith(".pdf") and not name.startswith((".", "~"))
+
+
+def scan_inbox(inbox: str) -> list[str]:
+    """PDFs currently in the inbox, oldest first."""
+    paths = []
+    with os.scandir(inbox) as entries:
+        for entry in entries:
+            if entry.is_file() and is_pdf(entry.name):
+                paths.append((entry.stat().st_mtime, entry.path))
+    return [path for _, path in sorted(paths)]
+
+
+def wait_until_stable(
+    path: str, stable_seconds: float, timeout: float = STABLE_TIMEOUT
+) -> bool:
+    """
+    Wait until a file has kept the same size and mtime for stable_seconds.
+
+    Scanners and network copies write files in several steps; the first
+    filesystem event arrives long before the last byte. Returns False when
+    the file disappears or is still changing after `timeout` seconds.
+    """
+    poll = min(max(stable_seconds / 4, 0.05), 1.0)
+    deadline = time.monotonic() + timeout
+    last, stable_since = None, time.monotonic()
+    while True:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        current = (stat.st_size, stat.st_mtime_ns)
+        now = time.monotonic()
+        if current != last or not stat.st_size:
+            last, stable_since = current, now
+        elif now - stable_since >= stable_seconds:
+            return True
+        if now > deadline:
+            return False
+        time.sleep(poll)
+
+
+class InboxWatcher(FileSystemEventHandler):
+    """
+    Import PDFs dropped into an inbox directory.
+
+    Filesystem events only schedule a file; a worker waits until it is
+    completely written, then runs it through the regular import. Files the
+    import leaves behind (ambiguous customer, unreadable PDF) are parked in
+    UNASSIGNED_DOCUMENT_ROOT so they are not picked up again.
+    """
+
+    def __init__(
+        self,
+        inbox: str,
+        broker,
+        run_import: ImportRunner,
+        workers: int = 1,
+        stable_seconds: float = 2.0,
+    ):
+        super().__init__()
+        self.inbox = os.path.abspath(inbox)
+        self.broker = broker
+        self.run_import = run_import
+        self.stable_seconds = stable_seconds
+        # workers=1 imports on the calling thread (catch-up scan, tests)
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._lock = threading.Lock()
+        self._scheduled: set[str] = set()
+        self.imported = 0
+        self.parked = 0
+
+    def catch_up(self) -> int:
+        """Schedule files that arrived while the watcher was not running."""
+        paths = scan_inbox(self.inbox)
+        for path in paths:
+            self.schedule(path)
+        return len(paths)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.schedule(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.schedule(event.src_path)
+
+    def on_moved(self, event):
+        # Files renamed into place after an atomic upload
+        if not event.is_directory:
+            self.schedule(event.dest_path)
+
+    def schedule(self, path: str) -> None:
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.inbox or not is_pdf(path):
+            return
+        if not os.path.exists(path):
+            # Late event for a file that was already imported
+            return
+        with self._lock:
+            # One import per file, however many write events it produces
+            if path in self._scheduled:
+                return
+            self._scheduled.add(path)
+        if self.pool is None:
+            self._process(path)
+        else:
+            self.pool.submit(self._process, path)
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+    def _process(self, path: str) -> Optional[int]:
+        try:
+            if not wait_until_stable(path, self.stable_seconds):
+                logger.warning("Inbox file vanished or never settled", extra={"pdf_path": path})
+                return None
+            close_old_connections()
+            try:
+                status_code, result, timings = self.run_import(path, self.broker)
+            except Exception:
+                logger.exception("Inbox import crashed", extra={"pdf_path": path})
+                status_code, result, timings = None, {}, {}
+
+            if os.path.exists(path):
+                self._park(path, status_code, result)
+            else:
+                with self._lock:
+                    self.imported += 1
+            logger.info(
+                "Inbox file processed",
+                extra={"pdf_path": path, "status_code": status_code, "stages_ms": timings},
+            )
+            return status_code
+        finally:
+            with self._lock:
+                self._scheduled.discard(path)
+
+    def _park(self, path: str, status_code: Optional[int], result: dict) -> None:
+        try:
+            new_path = move_pdf_to_unassigned_folder(path)
+        except Exception:
+            logger.exception("Could not park inbox file", extra={"pdf_path": path})
+            return
+        with self._lock:
+            self.parked += 1
+        logger.warning(
+            "Inbox file parked in unassigned folder",
+            extra={
+                "pdf_path": path,
+                "file_path": new_path,
+                "status_code": status_code,
+                "error": (result or {}).get("error"),
+            },
+        )
@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import pickle
+import signal
+import time
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+
+# How often the supervisor checks the child's memory while waiting
+POLL_INTERVAL = 0.05
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class ExtractionLimitExceeded(Exception):
+    """The extraction child was killed for exceeding a time or memory limit."""
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        # "timeout" or "memory"
+        self.limit = limit
+
+
+def extraction_timeout() -> float:
+    """Wall-clock budget in seconds for extracting one PDF; 0 = no limit."""
+    return getattr(settings, "PDF_EXTRACT_TIMEOUT", 0)
+
+
+def extraction_max_rss_bytes() -> int:
+    """Memory cap of the extraction child (including its page workers); 0 = no limit."""
+    return getattr(settings, "PDF_EXTRACT_MAX_RSS_MB", 0) * 1024 * 1024
+
+
+def isolation_enabled() -> bool:
+    return bool(extraction_timeout() or extraction_max_rss_bytes())
+
+
+def run_isolated(
+    func: Callable,
+    args: tuple = (),
+    timeout: Optional[float] = None,
+    max_rss_bytes: Optional[int] = None,
+):
+    """
+    Run func(*args) in a supervised child process and return its result.
+
+    The child is killed, together with any processes it started, once it
+    runs longer than `timeout` seconds or its process tree uses more than
+    `max_rss_bytes` of resident memory; ExtractionLimitExceeded is raised
+    then. Exceptions raised by func are re-raised in the caller.
+    """
+    for value in _supervise(func, args, False, timeout, max_rss_bytes):
+        return value
+
+
+def iter_isolated(
+    func: Callable,
+    args: tuple = (),
+    timeout: Optional[float] = None,
+    max_rss_bytes: Optional[int] = None,
+) -> Iterator:
+    """
+    Like run_isolated() for a func returning an iterable: the items are sent
+    back one by one as the child produces them, so neither process holds
+    more than one at a time. The limits apply until the last item.
+    """
+    return _supervise(func, args, True, timeout, max_rss_bytes)
+
+
+def _context():
+    # Not fork: the callers run threads (batch pool, import workers, inbox
+    # observer), and a forked child could wait forever on a lock one of
+    # them held, e.g. the pdfium lock or a logging handler's
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    # Only takes effect when the server starts (first use in this process)
+    ctx.set_forkserver_preload([f"{__package__}.extraction_child"])
+    return ctx
+
+
+def _supervise(func, args, stream, timeout, max_rss_bytes) -> Iterator:
+    timeout = extraction_timeout() if timeout is None else timeout
+    max_rss_bytes = extraction_max_rss_bytes() if max_rss_bytes is None else max_rss_bytes
+
+    ctx = _context()
+    receiver, sender = ctx.Pipe(duplex=False)
+    # Pickled here, unpickled in the child once Django is set up
+    payload = pickle.dumps((func, args))
+    # Not a daemon: the child may start its own page pool
+    process = ctx.Process(target=_child_main, args=(sender, payload, stream))
+    process.start()
+    sender.close()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            while not receiver.poll(POLL_INTERVAL):
+                if deadline is not None and time.monotonic() > deadline:
+                    raise ExtractionLimitExceeded(
+                        "timeout", f"PDF extraction exceeded {timeout:g} s."
+                    )
+                if max_rss_bytes and _tree_rss_bytes(process.pid) > max_rss_bytes:
+                    raise ExtractionLimitExceeded(
+                        "memory",
+                        f"PDF extraction exceeded {max_rss_bytes // (1024 * 1024)} MB.",
+                    )
+            try:
+                kind, value = receiver.recv()
+            except EOFError:
+                process.join()
+                raise RuntimeError(
+                    f"PDF extraction process died (exit code {process.exitcode})."
+                ) from None
+            if kind == "error":
+                raise value
+            if kind == "done":
+                return
+            yield value
+    finally:
+        receiver.close()
+        _kill_process_group(process)
+
+
+def _child_main(sender, payload: bytes, stream: bool) -> None:
+    # Own process group, so page pool workers are killed along with the child
+    os.setsid()
+    try:
+        _setup_django()
+        func, args = pickle.loads(payload)
+        if stream:
+            for item in func(*args):
+                sender.send(("item", item))
+            sender.send(("done", None))
+        else:
+            sender.send(("item", func(*args)))
+    except BaseException as e:
+        try:
+            sender.send(("error", e))
+        except Exception as send_error:
+            # Unpicklable exception
+            sender.send(("error", RuntimeError(f"PDF extraction failed: {send_error!r}")))
+    sender.close()
+
+
+def _setup_django() -> None:
+    # The child is a fresh interpreter; func may live in a module that
+    # imports models
+    from django.apps import apps
+
+    if not apps.ready and os.environ.get("DJANGO_SETTINGS_MODULE"):
+        import django
+
+        django.setup()
+
+
+def _kill_process_group(process) -> None:
+    # Also reaps page pool workers the child left behind after finishing
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # Group already gone, or the child has not called setsid() yet
+        if process.is_alive():
+            process.kill()
+    process.join()
+
+
+def _tree_rss_bytes(pid: int) -> int:
+    """Resident memory of a process and its descendants (Linux /proc, else 0)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
@@ -0,0 +1,97 @@
+from typing import Iterable
+
+from django.db.models import Count, Max, Min
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from ..models import Customer, Document, LicensePlate
+from .document_keys import (
+    customer_broker_changed,
+    document_keys_changed,
+    json_values,
+    move_customer_keys,
+    normalize_key,
+    prefix_range,
+    sync_document_keys,
+)
+
+
+def normalize_license_plate(value: str) -> str:
+    """
+    Lookup form of a plate: upper-case letters and digits only, umlauts
+    folded ("B-AB 123", "b ab123" -> "BAB123"; "TÖL-X 1" -> "TOELX1").
+    """
+    return normalize_key(value, LicensePlate.MAX_LENGTH)
+
+
+def document_plates(document: Document) -> dict:
+    """{normalized plate: plate as extracted} of a document."""
+    plates = {}
+    for value in json_values(document.license_plates):
+        plate = normalize_license_plate(value)
+        if plate:
+            plates.setdefault(plate, value.strip()[:32])
+    return plates
+
+
+def sync_license_plates(documents: Iterable[Document], created: bool = False) -> int:
+    """
+    Replace the LicensePlate rows of `documents` with their current
+    license_plates. Returns the number of rows written.
+    """
+    return sync_document_keys(LicensePlate, "plate", documents, document_plates, created)
+
+
+def plates_matching(broker, query: str, exact: bool = False):
+    """
+    LicensePlate rows of `broker` whose normalized plate equals (`exact`) or
+    starts with the normalized `query`; range lookups on the (broker, plate)
+    index either way.
+    """
+    plate = normalize_license_plate(query)
+    if not plate or broker is None:
+        return LicensePlate.objects.none()
+    plates = LicensePlate.objects.filter(broker=broker)
+    if exact:
+        return plates.filter(plate=plate)
+    lookups = prefix_range(plate, LicensePlate.MAX_LENGTH)
+    return plates.filter(**{f"plate__{lookup}": value for lookup, value in lookups.items()})
+
+
+def customer_vehicles(customer: Customer) -> list[dict]:
+    """The plates found in a customer's letters, most recently seen first."""
+    rows = (
+        LicensePlate.objects.filter(customer=customer)
+        .values("plate")
+        .annotate(
+            display=Max("display"),
+            documents=Count("document_id"),
+            latest_document_id=Max("document_id"),
+            first_seen=Min("document__created_at"),
+            last_seen=Max("document__created_at"),
+        )
+        .order_by("-last_seen", "plate")
+    )
+    return [
+        {
+            "plate": row["display"],
+            "normalized": row["plate"],
+            "documents": row["documents"],
+            "latest_document_id": row["latest_document_id"],
+            "first_seen": row["first_seen"],
+            "last_seen": row["last_seen"],
+        }
+        for row in rows
+    ]
+
+
+@receiver(post_save, sender=Document)
+def _document_saved(sender, instance, created, update_fields=None, **kwargs):
+    if document_keys_changed(update_fields, "license_plates"):
+        sync_license_plates([instance], created=created)
+
+
+@receiver(post_save, sender=Customer)
+def _customer_saved(sender, instance, created, update_fields=None, **kwargs):
+    if customer_broker_changed(created, update_fields):
+        move_customer_keys(LicensePlate, instance)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+
+# -------------------------
+# pdfium (fast, born-digital PDFs)
+# -------------------------
+
+
+# pdfium is not thread-safe; calls are serialized per process (not held
+# across yields, so threads reading different files interleave by page)
+_pdfium_lock = threading.RLock()
+
+
+def _pdfium_page_count(pdf_file: str) -> int:
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _pdfium_iter_pages(pdf_file: str, start: int, stop: Optional[int]) -> Iterator[str]:
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_file)
+        page_count = len(pdf)
+    try:
+        for index in range(start, page_count if stop is None else min(stop, page_count)):
+            with _pdfium_lock:
+                page = pdf[index]
+                textpage = page.get_textpage()
+                # pdfium uses CRLF line endings; keep raw_text consistent with pdfplumber
+                text = textpage.get_text_range().replace("\r\n", "\n")
+                textpage.close()
+                page.close()
+            yield text
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+
+# -------------------------
+# pdfplumber (layout-aware, slower)
+# -------------------------
+
+
+def _pdfplumber_page_count(pdf_file: str) -> int:
+    with pdfplumber.open(pdf_file) as pdf:
+        return len(pdf.pages)
+
+
+def _pdfplumber_iter_pages(pdf_file: str, start: int, stop: Optional[int]) -> Iterator[str]:
+    page_numbers = None if stop is None else range(start + 1, stop + 1)
+    with pdfplumber.open(pdf_file, pages=page_numbers) as pdf:
+        pages = pdf.pages if stop is not None else pdf.pages[start:]
+        for page in pages:
+            text = page.extract_text() or ""
+            # Drop the cached chars/layout objects, which dominate memory
+            page.close()
+            yield text
+
+
+# -------------------------
+# Registry
+# -------------------------
+
+
+@dataclass(frozen=True)
+class PdfEngine:
+    name: str
+    page_count: Callable[[str], int]
+    # (pdf_file, start, stop) -> texts of pages [start, stop), one page in memory
+    # at a time; stop=None reads to the end
+    iter_pages: Callable[[str, int, Optional[int]], Iterator[str]]
+
+    def read_pages(self, pdf_file: str, start: int, stop: Optional[int]) -> list[str]:
+        return list(self.iter_pages(pdf_file, start, stop))
+
+
+ENGINES: Dict[str, PdfEngine] = {
+    "pdfium": PdfEngine("pdfium", _pdfium_page_count, _pdfium_iter_pages),
+    "pdfplumber": PdfEngine("pdfplumber", _pdfplumber_page_count, _pdfplumber_iter_pages),
+}
+
+
+def get_engine(name: str) -> PdfEngine:
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF text engine: {name!r}") from None
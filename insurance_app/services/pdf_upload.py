@@ -0,0 +1,77 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.utils.text import get_valid_filename
+
+
+def upload_max_bytes() -> int:
+    """Largest accepted upload; 0 = no limit."""
+    return getattr(settings, "IMPORT_UPLOAD_MAX_MB", 0) * 1024 * 1024
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Write every upload to a temporary file chunk by chunk (never to memory)
+    and compute its SHA-256 on the way.
+
+    The finished file gets a `content_hash` attribute. An upload larger than
+    max_bytes is dropped and `too_large` is set; the rest of the request
+    body is read and discarded.
+    """
+
+    def __init__(self, request=None, max_bytes: int = 0):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.max_bytes and self.received > self.max_bytes:
+            self.too_large = True
+            self.file.close()
+            raise StopUpload(connection_reset=False)
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.content_hash = self.digest.hexdigest()
+        return uploaded
+
+
+@contextmanager
+def staged_upload(uploaded) -> Iterator[str]:
+    """
+    Give a finished upload its original file name in a private directory,
+    so the import pipeline can treat it like any other pdf_path.
+
+    Whatever the pipeline leaves there is deleted on exit.
+    """
+    staging_dir = tempfile.mkdtemp(
+        prefix="upload-", dir=getattr(settings, "FILE_UPLOAD_TEMP_DIR", None)
+    )
+    try:
+        name = get_valid_filename(os.path.basename(uploaded.name or "")) or "upload.pdf"
+        if not name.lower().endswith(".pdf"):
+            name += ".pdf"
+        pdf_path = os.path.join(staging_dir, name)
+
+        uploaded.file.flush()
+        # A rename when the upload temp dir is on the same filesystem
+        shutil.move(uploaded.temporary_file_path(), pdf_path)
+        yield pdf_path
+    finally:
+        # The temporary file is gone; closing must not try to delete it again
+        uploaded.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
@@ -0,0 +1,81 @@
+from typing import Iterable
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from ..models import Customer, Document, PolicyNumber
+from .document_keys import (
+    customer_broker_changed,
+    document_keys_changed,
+    json_values,
+    move_customer_keys,
+    normalize_key,
+    prefix_range,
+    sync_document_keys,
+)
+
+
+def normalize_policy_number(value: str) -> str:
+    """
+    Lookup form of a policy number: upper-case letters and digits only
+    ("K 123-456789/0", "k123 456789-0" -> "K1234567890").
+    """
+    return normalize_key(value, PolicyNumber.MAX_LENGTH)
+
+
+def document_policy_numbers(document: Document) -> dict:
+    """{normalized number: number as extracted} of a document."""
+    numbers = {}
+    for value in json_values(document.policy_numbers):
+        number = normalize_policy_number(value)
+        if number:
+            numbers.setdefault(number, value.strip()[:64])
+    return numbers
+
+
+def sync_policy_numbers(documents: Iterable[Document], created: bool = False) -> int:
+    """
+    Replace the PolicyNumber rows of `documents` with their current
+    policy_numbers. Returns the number of rows written.
+    """
+    return sync_document_keys(PolicyNumber, "number", documents, document_policy_numbers, created)
+
+
+def policies_matching(broker, query: str, exact: bool = False):
+    """
+    PolicyNumber rows of `broker` whose normalized number equals (`exact`)
+    or starts with the normalized `query`; range lookups on the (broker,
+    number) index either way.
+    """
+    number = normalize_policy_number(query)
+    if not number or broker is None:
+        return PolicyNumber.objects.none()
+    policies = PolicyNumber.objects.filter(broker=broker)
+    if exact:
+        return policies.filter(number=number)
+    lookups = prefix_range(number, PolicyNumber.MAX_LENGTH)
+    return policies.filter(**{f"number__{lookup}": value for lookup, value in lookups.items()})
+
+
+def resolve_policy(broker, number: str) -> list[PolicyNumber]:
+    """
+    Every document of `broker` carrying exactly this policy number, newest
+    first, with document and customer loaded in the same query.
+    """
+    return list(
+        policies_matching(broker, number, exact=True)
+        .select_related("document", "customer")
+        .order_by("-document_id")
+    )
+
+
+@receiver(post_save, sender=Document)
+def _document_saved(sender, instance, created, update_fields=None, **kwargs):
+    if document_keys_changed(update_fields, "policy_numbers"):
+        sync_policy_numbers([instance], created=created)
+
+
+@receiver(post_save, sender=Customer)
+def _customer_saved(sender, instance, created, update_fields=None, **kwargs):
+    if customer_broker_changed(created, update_fields):
+        move_customer_keys(PolicyNumber, instance)
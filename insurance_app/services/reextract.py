@@ -0,0 +1,50 @@
+from typing import Optional
+
+from .extract_pdf_text import extract_from_text, extract_pdf_text
+
+# Document fields derived from the text; raw_text itself only changes when
+# the PDF is read again
+REEXTRACTED_FIELDS = ("policy_numbers", "license_plates", "contract_typ")
+
+# (document id, raw_text, file_path)
+ReextractItem = tuple[int, str, str]
+
+
+def reextract_document(item: ReextractItem, from_pdf: bool = False) -> tuple[int, Optional[dict], str]:
+    """
+    Return (document id, new field values, error) for one document.
+
+    Runs in pool processes: works on plain values and never touches the
+    database.
+    """
+    document_id, raw_text, file_path = item
+    try:
+        if from_pdf:
+            payload = extract_pdf_text(file_path, workers=1, use_cache=False)
+        else:
+            payload = extract_from_text(raw_text or "")
+    except Exception as e:
+        return document_id, None, repr(e)
+
+    values = {
+        # The model does not allow NULL here
+        "policy_numbers": payload["policy_numbers"] or [],
+        "license_plates": payload["license_plates"] or [],
+        "contract_typ": payload["contract_typ"],
+    }
+    if from_pdf:
+        values["raw_text"] = payload["raw_text"]
+    return document_id, values, ""
+
+
+def reextract_document_from_pdf(item: ReextractItem) -> tuple[int, Optional[dict], str]:
+    return reextract_document(item, from_pdf=True)
+
+
+def changed_fields(document, values: dict) -> dict:
+    """{field: (old, new)} for every value that differs from the document."""
+    return {
+        name: (getattr(document, name), value)
+        for name, value in values.items()
+        if getattr(document, name) != value
+    }
@@ -0,0 +1,49 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """Accumulate wall-clock seconds per named stage, in first-seen order."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def timed(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Yield from items, counting the time spent producing each one."""
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - started)
+                return
+            self.add(name, time.perf_counter() - started)
+            yield item
+
+    def merge(self, other: "StageTimer", prefix: str = "") -> None:
+        for name, seconds in other.seconds.items():
+            self.add(f"{prefix}{name}", seconds)
+
+    def milliseconds(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 2) for name, seconds in self.seconds.items()}
+
+    def server_timing(self) -> str:
+        """Format as a Server-Timing header value (shown by browser dev tools)."""
+        return ", ".join(
+            f"{name};dur={ms}" for name, ms in self.milliseconds().items()
+        )
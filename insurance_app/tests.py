@@ -1,11 +1,94 @@
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
 from unittest.mock import patch
 
-from django.test import TestCase, override_settings
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections, models, transaction
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.response import Response
 from rest_framework.test import APIClient
+from watchdog.events import FileCreatedEvent, FileModifiedEvent
 
-from insurance_app.models import Customer, Document
-from insurance_app.services.customer_matching import AmbiguousCustomerError
+from benchmarks.bench_normalize import fuzz_pages, legacy_normalize_text
+from benchmarks.pdf_corpus import write_corpus, write_text_pdf
+from insurance_app.api.views import DocumentUploadView
+from insurance_app.models import (
+    Customer,
+    CustomerNumberSequence,
+    Document,
+    ExtractionCacheEntry,
+    ImportJob,
+    LicensePlate,
+    PolicyNumber,
+)
+from insurance_app.services.customer_autocomplete import (
+    autocomplete_customers,
+    autocomplete_index,
+    reset_autocomplete_indexes,
+)
+from insurance_app.services.customer_index import (
+    cached_broker_ids,
+    customer_index,
+    reset_customer_indexes,
+)
+from insurance_app.services.customer_matching import AmbiguousCustomerError, find_or_create_customer
+from insurance_app.services.extract_pdf_text import (
+    StagedPDFExtraction,
+    _compile_contract_matcher,
+    _page_shards,
+    _read_pdf_text,
+    count_contract_type_hits,
+    extract_contract_type,
+    extract_pdf_text,
+    iter_normalized_text,
+    iter_pdf_pages,
+    normalize_text,
+)
+from insurance_app.services.extraction_cache import store_extraction
+from insurance_app.services.file_hash import sha256_file
+from insurance_app.services.fulltext_search import letter_snippet, rebuild_search_index, search_customers
+from insurance_app.services.fuzzy_matching import levenshtein, street_similarity
+from insurance_app.services.identity_normalization import normalize_name, normalize_street
+from insurance_app.services.inbox_watcher import InboxWatcher, wait_until_stable
+from insurance_app.services.import_jobs import claim_next_job, enqueue_import, run_job
+from insurance_app.services.import_limits import ImportLimitExceeded, import_slot, in_flight
+from insurance_app.services.import_metrics import record_import
+from insurance_app.services.license_plates import normalize_license_plate
+from insurance_app.services.policy_numbers import normalize_policy_number
+from insurance_app.services.isolated_extraction import (
+    ExtractionLimitExceeded,
+    _tree_rss_bytes,
+    iter_isolated,
+    run_isolated,
+)
+from insurance_app.services.pdf_engines import ENGINES, PdfEngine, _pdfium_lock
 
 
 class DocumentModelTests(TestCase):
@@ -29,6 +112,7 @@ class DocumentModelTests(TestCase):
 class DocumentImportTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
         self.customer = Customer.objects.create(
             first_name="Ada",
             last_name="Lovelace",
@@ -39,14 +123,15 @@ class DocumentImportTests(TestCase):
     @override_settings(DOCUMENT_IMPORT_TOKEN="token")
     @patch("insurance_app.api.views.move_pdf_to_customer_folder")
     @patch("insurance_app.api.views.find_or_create_customer")
-    @patch("insurance_app.api.views.extract_pdf_text")
+    @patch("insurance_app.api.views.StagedPDFExtraction")
     def test_import_document_success(
         self,
-        mock_extract_pdf_text,
+        mock_extraction,
         mock_find_or_create_customer,
         mock_move_pdf,
     ):
-        mock_extract_pdf_text.return_value = {
+        mock_extraction.return_value.customer_fields.return_value = {}
+        mock_extraction.return_value.to_dict.return_value = {
             "raw_text": "raw",
             "policy_numbers": ["K 123-456789/1"],
             "license_plates": ["B-AB 123"],
@@ -61,6 +146,7 @@ class DocumentImportTests(TestCase):
             {"pdf_path": "C:\\incoming\\file.pdf"},
             format="json",
             HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
         )
 
         self.assertEqual(response.status_code, 201)
@@ -76,6 +162,7 @@ class DocumentImportTests(TestCase):
             {},
             format="json",
             HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
         )
 
         self.assertEqual(response.status_code, 400)
@@ -83,10 +170,10 @@ class DocumentImportTests(TestCase):
 
     @override_settings(DOCUMENT_IMPORT_TOKEN="token")
     @patch("insurance_app.api.views.find_or_create_customer")
-    @patch("insurance_app.api.views.extract_pdf_text")
+    @patch("insurance_app.api.views.StagedPDFExtraction")
     def test_import_document_ambiguous_customer(
         self,
-        mock_extract_pdf_text,
+        mock_extraction,
         mock_find_or_create_customer,
     ):
         customer_two = Customer.objects.create(
@@ -95,7 +182,7 @@ class DocumentImportTests(TestCase):
             zip_code="12345",
             street="Main St",
         )
-        mock_extract_pdf_text.return_value = {"raw_text": "raw"}
+        mock_extraction.return_value.customer_fields.return_value = {}
         mock_find_or_create_customer.side_effect = AmbiguousCustomerError(
             [self.customer, customer_two]
         )
@@ -105,9 +192,2026 @@ class DocumentImportTests(TestCase):
             {"pdf_path": "C:\\incoming\\file.pdf"},
             format="json",
             HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
         )
 
         self.assertEqual(response.status_code, 409)
         payload = response.json()
         self.assertEqual(payload["error"], "Multiple customers found at this address.")
-        self.assertEqual(len(payload["candidates"]), 2)
\ No newline at end of file
+        self.assertEqual(len(payload["candidates"]), 2)
+        # Remaining pages are never read for an ambiguous customer
+        mock_extraction.return_value.to_dict.assert_not_called()
+
+
+    @override_settings(DOCUMENT_IMPORT_TOKEN="token")
+    @patch("insurance_app.api.views.StagedPDFExtraction")
+    def test_import_document_over_extraction_limit_is_parked(self, mock_extraction):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        pdf_path = os.path.join(tmp.name, "huge.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF-1.4")
+        unassigned = os.path.join(tmp.name, "unassigned")
+        mock_extraction.return_value.customer_fields.side_effect = ExtractionLimitExceeded(
+            "timeout", "PDF extraction exceeded 20 s."
+        )
+
+        with override_settings(UNASSIGNED_DOCUMENT_ROOT=unassigned):
+            response = self.client.post(
+                reverse("import_document_from_pdf"),
+                {"pdf_path": pdf_path},
+                format="json",
+                HTTP_X_IMPORT_TOKEN="token",
+                HTTP_X_BROKER_ID=str(self.broker.id),
+            )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["limit"], "timeout")
+        self.assertEqual(response.json()["file_path"], os.path.join(unassigned, "huge.pdf"))
+        self.assertTrue(os.path.exists(os.path.join(unassigned, "huge.pdf")))
+        self.assertFalse(Document.objects.exists())
+
+    @override_settings(DOCUMENT_IMPORT_TOKEN="token")
+    @patch("insurance_app.api.views.StagedPDFExtraction")
+    def test_failed_extraction_creates_no_customer(self, mock_extraction):
+        mock_extraction.return_value.customer_fields.return_value = {
+            "first_name": "Grace", "last_name": "Hopper", "street": "Navy Rd 1", "zip_code": "54321",
+        }
+        mock_extraction.return_value.to_dict.side_effect = RuntimeError("broken page 3")
+
+        response = self.client.post(
+            reverse("import_document_from_pdf"),
+            {"pdf_path": "C:\\incoming\\file.pdf"},
+            format="json",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
+        )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Customer.objects.filter(last_name="Hopper").exists())
+
+
+@override_settings(
+    DOCUMENT_IMPORT_TOKEN="token",
+    METRICS_TOKEN="scrape",
+    IMPORT_TIMING_HEADER=True,
+    PDF_EXTRACTION_CACHE_MAX_BYTES=0,
+)
+class ImportTimingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        metrics_file = override_settings(IMPORT_METRICS_FILE=os.path.join(tmp.name, "metrics.json"))
+        metrics_file.enable()
+        self.addCleanup(metrics_file.disable)
+        self.pdf_path = os.path.join(tmp.name, "letter.pdf")
+        write_text_pdf(
+            self.pdf_path,
+            [
+                ["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt"],
+                ["Versicherungsschein K 123-456789/0"],
+            ],
+        )
+
+    def _import(self):
+        with override_settings(CUSTOMER_DOCUMENT_ROOT=os.path.join(self.tmp_dir, "customers")):
+            return self.client.post(
+                reverse("import_document_from_pdf"),
+                {"pdf_path": self.pdf_path},
+                format="json",
+                HTTP_X_IMPORT_TOKEN="token",
+                HTTP_X_BROKER_ID=str(self.broker.id),
+            )
+
+    def test_stages_are_reported_in_server_timing_header(self):
+        response = self._import()
+
+        self.assertEqual(response.status_code, 201)
+        stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        for stage in (
+            "extract", "extract.read", "extract.normalize", "extract.address",
+            "extract.policy", "extract.plate", "extract.contract_type",
+            "build_payload", "resolve_customer", "move_file", "create_document", "total",
+        ):
+            self.assertIn(stage, stages)
+
+    def test_histograms_can_be_scraped(self):
+        self._import()
+
+        response = self.client.get(reverse("import_metrics"), HTTP_AUTHORIZATION="Bearer scrape")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('import_stage_seconds_count{stage="extract.read"} 1', body)
+        self.assertIn('import_document_pages_bucket{le="2"} 1', body)
+        self.assertIn('import_document_pages_bucket{le="1"} 0', body)
+        self.assertIn("import_document_bytes_count 1", body)
+
+    def test_histograms_are_shared_by_all_worker_processes(self):
+        # Like a second gunicorn worker
+        process = multiprocessing.get_context("fork").Process(
+            target=record_import, args=({"total": 0.2},), kwargs={"page_count": 3})
+        process.start()
+        process.join()
+        record_import({"total": 0.3})
+
+        body = self.client.get(reverse("import_metrics"), HTTP_AUTHORIZATION="Bearer scrape").content.decode()
+
+        self.assertIn('import_stage_seconds_count{stage="total"} 2', body)
+        self.assertIn('import_stage_seconds_sum{stage="total"} 0.5', body)
+        self.assertIn("import_document_pages_count 1", body)
+
+    def test_metrics_require_token(self):
+        response = self.client.get(reverse("import_metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(DOCUMENT_IMPORT_TOKEN="token")
+class DocumentBatchImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        storage = override_settings(
+            CUSTOMER_DOCUMENT_ROOT=os.path.join(tmp.name, "customers"),
+            UNASSIGNED_DOCUMENT_ROOT=os.path.join(tmp.name, "unassigned"),
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def _letter(self, name, address):
+        path = os.path.join(self.tmp_dir, name)
+        write_text_pdf(path, [address + ["Versicherungsschein K 123-456789/0"]])
+        return path
+
+    def _post(self, pdf_paths):
+        return self.client.post(
+            reverse("import_documents_from_pdfs"),
+            {"pdf_paths": pdf_paths},
+            format="json",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
+        )
+
+    def test_batch_reports_one_result_per_path(self):
+        for first_name in ("Ada", "Grace"):
+            Customer.objects.create(
+                broker=self.broker, first_name=first_name, last_name="Lovelace",
+                street="Nebenweg 2", zip_code="54321", city="Beispielstadt",
+            )
+        max_address = ["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt"]
+        corrupt = os.path.join(self.tmp_dir, "corrupt.pdf")
+        with open(corrupt, "wb") as f:
+            f.write(b"not a pdf")
+        pdf_paths = [
+            self._letter("new.pdf", max_address),
+            # Same customer, different letter (identical files are deduplicated)
+            self._letter("again.pdf", max_address + ["Nachtrag zum Vertrag"]),
+            self._letter("shared.pdf", ["Frau Ada Lovelace", "Nebenweg 2", "54321 Beispielstadt"]),
+            self._letter("anonymous.pdf", ["Kein Adressblock"]),
+            os.path.join(self.tmp_dir, "missing.pdf"),
+            corrupt,
+        ]
+
+        response = self._post(pdf_paths)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["pdf_path"] for r in results], pdf_paths)
+        self.assertEqual(
+            [r["status"] for r in results],
+            ["created", "matched", "ambiguous", "unassigned", "failed", "failed"],
+        )
+        self.assertEqual(results[0]["customer"]["id"], results[1]["customer"]["id"])
+        self.assertEqual(len(results[2]["candidates"]), 2)
+        self.assertEqual(results[4]["status_code"], 400)
+        self.assertEqual(results[5]["status_code"], 500)
+        self.assertEqual(
+            response.json()["summary"],
+            {"created": 1, "matched": 1, "ambiguous": 1, "unassigned": 1, "failed": 2},
+        )
+        self.assertEqual(Document.objects.count(), 3)
+        self.assertTrue(os.path.exists(results[3]["file_path"]))
+
+    def test_batch_requires_list_of_paths(self):
+        response = self._post("single.pdf")
+
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(BATCH_IMPORT_MAX_ITEMS=2)
+    def test_batch_size_is_limited(self):
+        response = self._post(["a.pdf", "b.pdf", "c.pdf"])
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(DOCUMENT_IMPORT_TOKEN="token", PDF_EXTRACTION_CACHE_MAX_BYTES=0)
+class DocumentDedupeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        storage = override_settings(
+            CUSTOMER_DOCUMENT_ROOT=os.path.join(tmp.name, "customers"),
+            UNASSIGNED_DOCUMENT_ROOT=os.path.join(tmp.name, "unassigned"),
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def _letter(self, name):
+        path = os.path.join(self.tmp_dir, name)
+        write_text_pdf(
+            path,
+            [["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt",
+              "Versicherungsschein K 123-456789/0"]],
+        )
+        return path
+
+    def _import(self, pdf_path):
+        return self.client.post(
+            reverse("import_document_from_pdf"),
+            {"pdf_path": pdf_path},
+            format="json",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
+        )
+
+    def test_known_file_returns_existing_document_without_extraction(self):
+        first = self._import(self._letter("first.pdf"))
+        again = self._letter("again.pdf")
+
+        with patch("insurance_app.api.views.StagedPDFExtraction") as mock_extraction:
+            response = self._import(again)
+
+        self.assertEqual(response.status_code, 200)
+        document = first.json()["document"]
+        self.assertEqual(response.json()["duplicate_of"], document["id"])
+        self.assertEqual(response.json()["document"]["id"], document["id"])
+        self.assertEqual(len(document["content_hash"]), 64)
+        mock_extraction.assert_not_called()
+        self.assertFalse(os.path.exists(again))
+        self.assertEqual(Document.objects.count(), 1)
+
+    @override_settings(DOCUMENT_DEDUPE_POLICY="link")
+    def test_link_policy_adds_document_sharing_the_file(self):
+        first = self._import(self._letter("first.pdf")).json()["document"]
+
+        response = self._import(self._letter("again.pdf"))
+
+        self.assertEqual(response.status_code, 201)
+        linked = Document.objects.get(id=response.json()["document"]["id"])
+        self.assertNotEqual(linked.id, first["id"])
+        self.assertEqual(linked.file_path, first["file_path"])
+        self.assertEqual(linked.policy_numbers, first["policy_numbers"])
+
+    @override_settings(DOCUMENT_DEDUPE_POLICY="reject")
+    def test_reject_policy_leaves_file_in_place(self):
+        self._import(self._letter("first.pdf"))
+        again = self._letter("again.pdf")
+
+        response = self._import(again)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(os.path.exists(again))
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_duplicates_within_a_batch(self):
+        pdf_paths = [self._letter("first.pdf"), self._letter("again.pdf")]
+
+        response = self.client.post(
+            reverse("import_documents_from_pdfs"),
+            {"pdf_paths": pdf_paths},
+            format="json",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
+        )
+
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["created", "duplicate"])
+        self.assertEqual(results[1]["duplicate_of"], results[0]["document_id"])
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_backfill_hashes_existing_documents(self):
+        path = self._letter("stored.pdf")
+        document = Document.objects.create(file_path=path, policy_numbers=[])
+        missing = Document.objects.create(file_path="/missing.pdf", policy_numbers=[])
+
+        call_command("backfill_content_hashes", "--workers", "2", stdout=StringIO())
+
+        document.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(document.content_hash, sha256_file(path))
+        self.assertEqual(missing.content_hash, "")
+
+
+@override_settings(DOCUMENT_IMPORT_TOKEN="token", PDF_EXTRACTION_CACHE_MAX_BYTES=0)
+class DocumentUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        self.upload_dir = os.path.join(tmp.name, "uploads")
+        os.makedirs(self.upload_dir)
+        self.unassigned = os.path.join(tmp.name, "unassigned")
+        storage = override_settings(
+            CUSTOMER_DOCUMENT_ROOT=os.path.join(tmp.name, "customers"),
+            UNASSIGNED_DOCUMENT_ROOT=self.unassigned,
+            FILE_UPLOAD_TEMP_DIR=self.upload_dir,
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def _upload(self, name, content):
+        return self.client.post(
+            reverse("upload_document"),
+            {"file": SimpleUploadedFile(name, content, content_type="application/pdf")},
+            format="multipart",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
+        )
+
+    def test_uploaded_pdf_is_imported_and_hashed(self):
+        path = os.path.join(self.tmp_dir, "letter.pdf")
+        write_text_pdf(
+            path,
+            [["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt",
+              "Versicherungsschein K 123-456789/0"]],
+        )
+        with open(path, "rb") as f:
+            content = f.read()
+
+        response = self._upload("letter.pdf", content)
+
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get()
+        self.assertEqual(document.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(document.customer.last_name, "Mustermann")
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_unreadable_upload_is_parked(self):
+        response = self._upload("scan.pdf", b"not a pdf")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["file_path"], os.path.join(self.unassigned, "scan.pdf"))
+        self.assertTrue(os.path.exists(os.path.join(self.unassigned, "scan.pdf")))
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_import_slot_is_taken_after_the_upload_is_read(self):
+        staged = []
+
+        @contextmanager
+        def slot(broker_id, **kwargs):
+            staged.extend(os.listdir(self.upload_dir))
+            yield
+
+        with patch("insurance_app.api.views.import_slot", slot), \
+                patch.object(DocumentUploadView, "import_pdf", return_value=Response({}, status=201)):
+            response = self._upload("letter.pdf", b"%PDF-")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(staged), 1)
+
+    @override_settings(IMPORT_UPLOAD_MAX_MB=1)
+    def test_upload_size_is_limited(self):
+        response = self._upload("huge.pdf", b"0" * (1024 * 1024 + 1))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        self.assertFalse(Document.objects.exists())
+
+    def test_upload_is_streamed_to_disk(self):
+        size = 16 * 1024 * 1024
+        # The request body is built before memory is traced
+        request = RequestFactory().post(
+            reverse("upload_document"),
+            {"file": SimpleUploadedFile("big.pdf", b"%PDF-" + b"0" * size)},
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(self.broker.id),
+        )
+        staged = {}
+
+        def fake_import(view, pdf_path, broker, request=None, content_hash=None):
+            staged["size"] = os.path.getsize(pdf_path)
+            staged["content_hash"] = content_hash
+            os.remove(pdf_path)
+            return Response({}, status=201)
+
+        with patch.object(DocumentUploadView, "import_pdf", fake_import):
+            tracemalloc.start()
+            try:
+                response = DocumentUploadView.as_view()(request)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(staged["size"], size + 5)
+        self.assertEqual(
+            staged["content_hash"], hashlib.sha256(b"%PDF-" + b"0" * size).hexdigest())
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class ReextractDocumentsTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.customer = Customer.objects.create(
+            broker=self.broker, first_name="Max", last_name="Mustermann", zip_code="12345",
+        )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.checkpoint = os.path.join(tmp.name, "checkpoint.json")
+        text = "Ihre Kfz-Versicherung\nVersicherungsschein K 123-456789/0\nKennzeichen B-AB 123"
+        # Imported before the extractors knew about policies, plates and Kfz
+        self.stale = [
+            Document.objects.create(
+                customer=self.customer, file_path=f"/docs/{i}.pdf", raw_text=text,
+                policy_numbers=[], license_plates=[], contract_typ="hausrat",
+            )
+            for i in range(3)
+        ]
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command(
+            "reextract_documents", "--workers", "1", "--chunk-size", "2",
+            "--checkpoint", self.checkpoint, *args, stdout=out, stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def test_stale_fields_are_updated(self):
+        output = self._run()
+
+        for document in self.stale:
+            document.refresh_from_db()
+            self.assertEqual(document.contract_typ, "kfz")
+            self.assertEqual(document.policy_numbers, "K 123-456789/0")
+            self.assertEqual(document.license_plates, ["B-AB 123"])
+        self.assertEqual(LicensePlate.objects.filter(plate="BAB123").count(), 3)
+        self.assertEqual(PolicyNumber.objects.filter(number="K1234567890").count(), 3)
+        self.assertIn("Changed 3 of 3 documents", output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_dry_run_reports_diff_without_saving(self):
+        output = self._run("--dry-run")
+
+        self.assertIn(f"Document {self.stale[0].id}: contract_typ: 'hausrat' -> 'kfz'", output)
+        self.assertIn("Would change 3 of 3 documents", output)
+        self.stale[0].refresh_from_db()
+        self.assertEqual(self.stale[0].contract_typ, "hausrat")
+
+    def test_resumes_after_checkpoint(self):
+        with open(self.checkpoint, "w") as f:
+            json.dump({"last_id": self.stale[1].id}, f)
+
+        self._run()
+
+        contract_types = [Document.objects.get(id=d.id).contract_typ for d in self.stale]
+        self.assertEqual(contract_types, ["hausrat", "hausrat", "kfz"])
+
+    def test_filters_select_documents(self):
+        other = get_user_model().objects.create_user(username="other")
+
+        self._run("--broker", str(other.id))
+        self._run("--contract-type", "none")
+
+        self.assertFalse(Document.objects.filter(contract_typ="kfz").exists())
+
+
+class LicensePlateTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.broker.groups.add(Group.objects.create(name="whitelist"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.broker)
+        self.customer = Customer.objects.create(
+            broker=self.broker, first_name="Max", last_name="Mustermann", zip_code="12345",
+        )
+        self.other_customer = Customer.objects.create(
+            broker=self.broker, first_name="Erika", last_name="Musterfrau", zip_code="12345",
+        )
+
+    def _document(self, customer, *plates):
+        return Document.objects.create(
+            customer=customer, file_path="/docs/a.pdf", policy_numbers=[], license_plates=list(plates),
+        )
+
+    def _search(self, q, **params):
+        response = self.client.get(reverse("customer-list"), {"mode": "license", "q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [customer["id"] for customer in response.json()["results"]]
+
+    def test_normalization(self):
+        self.assertEqual(normalize_license_plate(" b-ab 123 "), "BAB123")
+        self.assertEqual(normalize_license_plate("TÖL-X 1"), "TOELX1")
+        self.assertEqual(normalize_license_plate("---"), "")
+
+    def test_plates_are_indexed_on_import_and_change(self):
+        document = self._document(self.customer, "B-AB 123", "B AB123")
+        self.assertEqual(
+            list(LicensePlate.objects.values_list("plate", "display", "broker_id")),
+            [("BAB123", "B-AB 123", self.broker.id)],
+        )
+
+        document.license_plates = ["M-XY 9"]
+        document.save()
+        self.assertEqual(list(LicensePlate.objects.values_list("plate", flat=True)), ["MXY9"])
+
+        document.customer = None
+        document.save()
+        self.assertFalse(LicensePlate.objects.exists())
+
+    def test_search_is_exact_or_prefix_without_substring_matches(self):
+        self._document(self.customer, "B-AB 123")
+        self._document(self.customer, "B-AB 1234")
+        self._document(self.other_customer, "HB-AB 12")
+
+        self.assertEqual(self._search("b ab 12"), [self.customer.id])
+        self.assertEqual(self._search("B-AB 123", exact="true"), [self.customer.id])
+        self.assertEqual(self._search("AB 12"), [])
+        self.assertEqual(self._search("HB"), [self.other_customer.id])
+
+    def test_other_brokers_plates_are_not_found(self):
+        other = get_user_model().objects.create_user(username="other")
+        self._document(Customer.objects.create(broker=other, last_name="Fremd"), "B-AB 123")
+
+        self.assertEqual(self._search("B-AB 123"), [])
+
+    def test_vehicles_of_a_customer(self):
+        self._document(self.customer, "B-AB 123")
+        latest = self._document(self.customer, "B AB 123", "M-XY 9")
+
+        response = self.client.get(reverse("customer-vehicles", kwargs={"pk": self.customer.id}))
+
+        self.assertEqual(response.status_code, 200)
+        vehicles = sorted(response.json(), key=lambda v: v["normalized"])
+        self.assertEqual([(v["normalized"], v["documents"]) for v in vehicles],
+                         [("BAB123", 2), ("MXY9", 1)])
+        self.assertEqual(vehicles[0]["latest_document_id"], latest.id)
+
+    def test_backfill_indexes_existing_documents(self):
+        # bulk_create() sends no post_save, like rows from before the table
+        Document.objects.bulk_create([
+            Document(customer=self.customer, file_path="/docs/old.pdf", policy_numbers=[],
+                     license_plates=["K-LN 42"]),
+            Document(customer=self.other_customer, file_path="/docs/old2.pdf", policy_numbers=[],
+                     license_plates="K-LN 43"),
+        ])
+        self.assertFalse(LicensePlate.objects.exists())
+
+        out = StringIO()
+        call_command("backfill_license_plates", "--batch-size", "1", stdout=out)
+        call_command("backfill_license_plates", stdout=StringIO())
+
+        self.assertIn("Indexed 2 license plates of 2 documents", out.getvalue())
+        self.assertEqual(sorted(LicensePlate.objects.values_list("plate", flat=True)), ["KLN42", "KLN43"])
+
+
+class PolicyNumberTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.broker.groups.add(Group.objects.create(name="whitelist"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.broker)
+        self.customer = Customer.objects.create(
+            broker=self.broker, first_name="Max", last_name="Mustermann", zip_code="12345",
+        )
+
+    def _document(self, customer, policy_numbers):
+        return Document.objects.create(
+            customer=customer, file_path="/docs/a.pdf", policy_numbers=policy_numbers,
+        )
+
+    def _resolve(self, number):
+        return self.client.get(reverse("policy_resolver", kwargs={"number": number}))
+
+    def test_normalization(self):
+        self.assertEqual(normalize_policy_number("K 123-456789/0"), "K1234567890")
+        self.assertEqual(normalize_policy_number("k123 456789-0"), "K1234567890")
+
+    def test_numbers_are_indexed_as_extracted(self):
+        # The extractor stores a single string, older imports a list
+        self._document(self.customer, "K 123-456789/0")
+        self._document(self.customer, ["K 123-456789/1", "K 123-456789/1"])
+
+        self.assertEqual(
+            sorted(PolicyNumber.objects.values_list("number", "display")),
+            [("K1234567890", "K 123-456789/0"), ("K1234567891", "K 123-456789/1")],
+        )
+
+    def test_policy_mode_finds_customers_by_number_or_prefix(self):
+        self._document(self.customer, "K 123-456789/0")
+        other = Customer.objects.create(broker=self.broker, last_name="Anders", zip_code="12345")
+        self._document(other, "L 999-000001/0")
+
+        def search(q, **params):
+            response = self.client.get(reverse("customer-list"), {"mode": "policy", "q": q, **params})
+            return [customer["id"] for customer in response.json()["results"]]
+
+        self.assertEqual(search("k123 456789"), [self.customer.id])
+        self.assertEqual(search("K 123-456789/0", exact="1"), [self.customer.id])
+        self.assertEqual(search("K 123-456789", exact="1"), [])
+        self.assertEqual(search("456789"), [])
+
+    def test_resolver_returns_customer_and_documents_in_one_query(self):
+        first = self._document(self.customer, "K 123-456789/0")
+        second = self._document(self.customer, ["K 123-456789/0"])
+        self._document(self.customer, "K 123-456789/1")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._resolve("K 123-456789/0")
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload["policy_number"], "K 123-456789/0")
+        self.assertEqual(payload["customer"]["id"], self.customer.id)
+        self.assertEqual([d["id"] for d in payload["documents"]], [second.id, first.id])
+        app_queries = [q for q in queries.captured_queries if "insurance_app_" in q["sql"]]
+        self.assertEqual(len(app_queries), 1)
+
+    def test_resolver_is_scoped_to_broker(self):
+        other = get_user_model().objects.create_user(username="other")
+        self._document(Customer.objects.create(broker=other, last_name="Fremd"), "K 123-456789/0")
+
+        self.assertEqual(self._resolve("K 123-456789/0").status_code, 404)
+
+    def test_resolver_lists_candidates_for_a_number_on_several_customers(self):
+        other = Customer.objects.create(broker=self.broker, last_name="Anders", zip_code="12345")
+        self._document(self.customer, "K 123-456789/0")
+        self._document(other, "K 123-456789/0")
+
+        response = self._resolve("K1234567890")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(sorted(c["id"] for c in response.json()["candidates"]),
+                         [self.customer.id, other.id])
+
+    def test_backfill_indexes_existing_documents(self):
+        Document.objects.bulk_create([
+            Document(customer=self.customer, file_path="/docs/old.pdf", policy_numbers="K 1-2/3"),
+        ])
+
+        out = StringIO()
+        call_command("backfill_policy_numbers", stdout=out)
+
+        self.assertIn("Indexed 1 policy numbers of 1 documents", out.getvalue())
+        self.assertEqual(list(PolicyNumber.objects.values_list("number", flat=True)), ["K123"])
+
+
+def _hold_import_slot(broker_id, held, release):
+    with import_slot(broker_id):
+        held.set()
+        release.wait(10)
+
+
+@override_settings(
+    DOCUMENT_IMPORT_TOKEN="token",
+    METRICS_TOKEN="scrape",
+    IMPORT_MAX_CONCURRENT=2,
+    IMPORT_MAX_CONCURRENT_PER_BROKER=1,
+    IMPORT_RETRY_AFTER=7,
+)
+class ImportLimitTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        limit_dir = override_settings(IMPORT_LIMIT_DIR=tmp.name)
+        limit_dir.enable()
+        self.addCleanup(limit_dir.disable)
+
+    def _hold_in_other_process(self, broker_id):
+        """Take a slot like a second gunicorn worker would."""
+        ctx = multiprocessing.get_context("fork")
+        held, release = ctx.Event(), ctx.Event()
+        process = ctx.Process(target=_hold_import_slot, args=(broker_id, held, release))
+        process.start()
+        self.assertTrue(held.wait(5))
+
+        def stop():
+            release.set()
+            process.join()
+
+        self.addCleanup(stop)
+        return stop
+
+    def _import(self, broker):
+        return self.client.post(
+            reverse("import_document_from_pdf"),
+            {"pdf_path": "C:\\incoming\\file.pdf"},
+            format="json",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str(broker.id),
+        )
+
+    @patch("insurance_app.api.views.DocumentImportView.import_pdf")
+    def test_busy_broker_gets_429_while_others_import(self, mock_import_pdf):
+        mock_import_pdf.return_value = Response({}, status=201)
+        other = get_user_model().objects.create_user(username="other")
+        self._hold_in_other_process(self.broker.id)
+
+        response = self._import(self.broker)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(response.json()["scope"], "broker")
+        self.assertEqual(self._import(other).status_code, 201)
+
+    @patch("insurance_app.api.views.DocumentImportView.import_pdf")
+    def test_global_limit_applies_across_processes(self, mock_import_pdf):
+        mock_import_pdf.return_value = Response({}, status=201)
+        self._hold_in_other_process(1001)
+        stop = self._hold_in_other_process(1002)
+
+        response = self._import(self.broker)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["scope"], "global")
+        stop()
+        self.assertEqual(self._import(self.broker).status_code, 201)
+
+    def test_in_flight_imports_are_exposed(self):
+        self._hold_in_other_process(self.broker.id)
+
+        response = self.client.get(reverse("import_metrics"), HTTP_AUTHORIZATION="Bearer scrape")
+
+        body = response.content.decode()
+        self.assertIn('import_in_flight{scope="global"} 1', body)
+        self.assertIn(f'import_in_flight{{scope="broker",broker="{self.broker.id}"}} 1', body)
+
+    def test_counting_in_flight_imports_takes_no_slot(self):
+        stop = threading.Event()
+
+        def scrape():
+            while not stop.is_set():
+                in_flight()
+
+        scraper = threading.Thread(target=scrape)
+        scraper.start()
+        self.addCleanup(scraper.join)
+        self.addCleanup(stop.set)
+
+        # A scrape must never make a free slot look taken
+        for _ in range(10000):
+            with import_slot(self.broker.id):
+                pass
+
+    def test_background_workers_wait_for_a_slot(self):
+        stop = self._hold_in_other_process(self.broker.id)
+
+        with self.assertRaises(ImportLimitExceeded):
+            with import_slot(self.broker.id, wait=0.2):
+                pass
+        threading.Timer(0.2, stop).start()
+        with import_slot(self.broker.id, wait=None):
+            self.assertEqual(in_flight()["brokers"], {str(self.broker.id): 1})
+
+
+class IdentityNormalizationTests(SimpleTestCase):
+    def test_street_variants_share_one_form(self):
+        for street in ("Hauptstr. 5 a", "Hauptstraße 5a", "HAUPTSTRASSE  5A", "Hauptstr.5a"):
+            self.assertEqual(normalize_street(street), "hauptstrasse 5a")
+        self.assertEqual(normalize_street("Karl-Marx-Str. 12"), "karl marx strasse 12")
+        self.assertEqual(normalize_street("Marktpl. 3"), "marktplatz 3")
+
+    def test_names_are_case_and_umlaut_folded(self):
+        self.assertEqual(normalize_name("  Jürgen   MÜLLER "), "juergen mueller")
+        self.assertEqual(normalize_name("Renée"), "renee")
+
+
+class CustomerMatchingTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.customer = Customer.objects.create(
+            broker=self.broker, first_name="Jürgen", last_name="Müller",
+            street="Hauptstraße 5", zip_code="12345",
+        )
+
+    def test_identity_columns_are_maintained_on_save(self):
+        self.assertEqual(self.customer.street_norm, "hauptstrasse 5")
+        self.assertEqual(self.customer.last_name_norm, "mueller")
+
+        self.customer.street = "Nebenweg 2"
+        self.customer.save(update_fields=["street"])
+
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.street_norm, "nebenweg 2")
+
+    def test_abbreviated_street_matches_with_one_query(self):
+        with self.assertNumQueries(1):
+            customer, created = find_or_create_customer(
+                {"first_name": "J.", "last_name": "Mueller", "street": "Hauptstr. 5",
+                 "zip_code": "12345"},
+                broker=self.broker,
+            )
+
+        self.assertEqual(customer, self.customer)
+        self.assertFalse(created)
+
+    def test_ambiguous_address_lists_all_candidates(self):
+        other = Customer.objects.create(
+            broker=self.broker, first_name="Anna", last_name="Müller",
+            street="Hauptstr. 5", zip_code="12345",
+        )
+
+        with self.assertNumQueries(1), self.assertRaises(AmbiguousCustomerError) as raised:
+            find_or_create_customer(
+                {"street": "HAUPTSTRASSE 5", "zip_code": "12345"}, broker=self.broker)
+
+        self.assertEqual({c.id for c in raised.exception.candidates}, {self.customer.id, other.id})
+
+    def test_name_lookup_ignores_case_and_umlauts(self):
+        customer, created = find_or_create_customer(
+            {"first_name": "JUERGEN", "last_name": "mueller"}, broker=self.broker)
+
+        self.assertEqual(customer, self.customer)
+        self.assertFalse(created)
+
+    def test_create_conflict_returns_the_constrained_customer(self):
+        # Written around save(): matching by the *_norm columns misses it
+        Customer.objects.filter(pk=self.customer.pk).update(
+            first_name_norm="x", last_name_norm="x", street_norm="x")
+
+        customer, created = find_or_create_customer(
+            {"first_name": "jürgen", "last_name": "MÜLLER", "street": "Hauptstraße 5",
+             "zip_code": "12345"},
+            broker=self.broker,
+        )
+
+        self.assertEqual(customer, self.customer)
+        self.assertFalse(created)
+
+    def test_migration_backfills_existing_customers(self):
+        Customer.objects.update(first_name_norm="", last_name_norm="", street_norm="")
+        migration = importlib.import_module(
+            "insurance_app.migrations.0009_customer_identity_norm")
+
+        migration.backfill_identity_norm(django_apps, None)
+
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.street_norm, "hauptstrasse 5")
+        self.assertEqual(self.customer.first_name_norm, "juergen")
+
+
+class CustomerNumberTests(TestCase):
+    def setUp(self):
+        self.year = timezone.now().year
+
+    def _create(self, last_name):
+        return Customer.objects.create(first_name="Max", last_name=last_name, zip_code="12345")
+
+    def test_numbers_count_up_per_year(self):
+        self.assertEqual(self._create("Eins").customer_number, f"{self.year}-000001")
+        self.assertEqual(self._create("Zwei").customer_number, f"{self.year}-000002")
+
+        with patch("insurance_app.models.timezone.now",
+                   return_value=datetime(2031, 1, 1, tzinfo=dt_timezone.utc)):
+            self.assertEqual(self._create("Drei").customer_number, "2031-000001")
+
+    def test_allocation_never_reads_the_customer_table(self):
+        self._create("Eins")
+
+        with CaptureQueriesContext(connection) as queries:
+            self._create("Zwei")
+
+        customer_reads = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].startswith("SELECT") and '"insurance_app_customer"' in q["sql"]
+        ]
+        self.assertEqual(customer_reads, [])
+
+    def test_reserved_block_is_used_and_the_rest_handed_back(self):
+        self._create("Vorher")
+
+        with Customer.reserve_customer_numbers(3):
+            with self.assertNumQueries(2):  # only the INSERT and its full-text row
+                first = self._create("Eins")
+            second = self._create("Zwei")
+
+        self.assertEqual([first.customer_number, second.customer_number],
+                         [f"{self.year}-000002", f"{self.year}-000003"])
+        self.assertEqual(CustomerNumberSequence.objects.get(year=self.year).last_value, 3)
+
+    def test_reserved_rest_is_kept_when_someone_allocated_after_it(self):
+        with Customer.reserve_customer_numbers(3):
+            self._create("Eins")
+            concurrent = CustomerNumberSequence.allocate(self.year)
+
+        self.assertEqual(list(concurrent), [4])
+        self.assertEqual(CustomerNumberSequence.objects.get(year=self.year).last_value, 4)
+        # The gap (2, 3) is never handed out twice
+        self.assertEqual(self._create("Zwei").customer_number, f"{self.year}-000005")
+
+    def test_migration_seeds_sequences_from_existing_numbers(self):
+        for number in ("2024-000041", "2024-000007", "2025-000003", "frei-1"):
+            Customer.objects.create(customer_number=number, last_name=number)
+        CustomerNumberSequence.objects.all().delete()
+        migration = importlib.import_module(
+            "insurance_app.migrations.0010_customernumbersequence")
+
+        migration.seed_customer_number_sequences(django_apps, None)
+
+        self.assertEqual(
+            dict(CustomerNumberSequence.objects.values_list("year", "last_value")),
+            {2024: 41, 2025: 3},
+        )
+
+
+# Letters as OCR reads them -> the customer they belong to ("new" = nobody,
+# "ambiguous" = ask the broker). Customers are FUZZY_MATCH_CUSTOMERS below.
+FUZZY_MATCH_CORPUS = [
+    (("Max", "Mustermann", "Hauptstraße 5"), "max"),
+    (("Max", "Musterman", "Hauptstrasse 5"), "max"),
+    (("Max", "Mustermann", "Hauptstrabe 5"), "max"),
+    (("Max", "Musterrnann", "Hauptstrabe 5"), "max"),
+    (("M.", "Mustermann", "Haupt-Strasse 5"), "max"),
+    (("", "Mustermann", "Hauptstrabe 5"), "max"),
+    (("Jurgen", "Muller", "Bahnhofsstr. 3"), "juergen"),
+    (("Erika", "Musterfrau", "Lindenweg 14"), "new"),
+    (("Peter", "Neumann", "Ringstraße 1"), "new"),
+    (("Erika", "Mustermann", "Hauptstrabe 5"), "ambiguous"),
+    (("Anna", "Schmitt", "Goethestrasse 8"), "ambiguous"),
+]
+
+FUZZY_MATCH_CUSTOMERS = {
+    "max": ("Max", "Mustermann", "Hauptstraße 5"),
+    "erika": ("Erika", "Musterfrau", "Lindenweg 12"),
+    "juergen": ("Jürgen", "Müller", "Bahnhofstr. 3"),
+    "anna": ("Anna", "Schmidt", "Goethestraße 8"),
+    "anne": ("Anne", "Schmitt", "Goethestraße 8"),
+}
+
+
+class FuzzyMatchingTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.customers = {
+            key: Customer.objects.create(
+                broker=self.broker, first_name=first_name, last_name=last_name,
+                street=street, zip_code="30159",
+            )
+            for key, (first_name, last_name, street) in FUZZY_MATCH_CUSTOMERS.items()
+        }
+
+    def _match(self, first_name, last_name, street, broker=None):
+        try:
+            customer, created = find_or_create_customer(
+                {"first_name": first_name, "last_name": last_name, "street": street,
+                 "zip_code": "30159"},
+                broker=broker or self.broker,
+            )
+        except AmbiguousCustomerError:
+            return "ambiguous"
+        if created:
+            customer.delete()
+            return "new"
+        return next(key for key, c in self.customers.items() if c == customer)
+
+    def test_labeled_corpus(self):
+        for letter, expected in FUZZY_MATCH_CORPUS:
+            with self.subTest(letter=letter):
+                self.assertEqual(self._match(*letter), expected)
+
+    def test_candidates_are_ranked_with_scores(self):
+        with self.assertRaises(AmbiguousCustomerError) as raised:
+            find_or_create_customer(
+                {"first_name": "Erika", "last_name": "Mustermann", "street": "Hauptstrabe 5",
+                 "zip_code": "30159"},
+                broker=self.broker,
+            )
+
+        error = raised.exception
+        self.assertEqual(error.candidates[0], self.customers["max"])
+        self.assertEqual(error.scores, sorted(error.scores, reverse=True))
+        self.assertTrue(all(0 < score < 1 for score in error.scores))
+
+    @override_settings(CUSTOMER_MATCH_THRESHOLD=0.99)
+    def test_threshold_is_configurable(self):
+        self.assertEqual(self._match("Max", "Musterrnann", "Hauptstrabe 5"), "ambiguous")
+
+    def test_other_brokers_customers_are_not_candidates(self):
+        other_broker = get_user_model().objects.create_user(username="other")
+
+        self.assertEqual(self._match("Max", "Musterman", "Hauptstrasse 5", other_broker), "new")
+
+    def test_fuzzy_match_loads_only_the_chosen_customer(self):
+        # Exact address, exact name, the zip-code block (tuples), the match
+        with self.assertNumQueries(4):
+            self._match("Max", "Musterrnann", "Hauptstrabe 5")
+
+    def test_house_numbers_must_agree(self):
+        self.assertEqual(street_similarity("hauptstrasse 5", "hauptstrabe 5"), 1 - 2 / 12)
+        self.assertEqual(street_similarity("hauptstrasse 5", "hauptstrasse 7"), 0.0)
+        self.assertEqual(levenshtein("mustermann", "musterrnann"), 2)
+
+    def test_409_response_carries_scores(self):
+        client = APIClient()
+        with override_settings(DOCUMENT_IMPORT_TOKEN="token"), patch(
+            "insurance_app.api.views.StagedPDFExtraction"
+        ) as mock_extraction:
+            mock_extraction.return_value.customer_fields.return_value = {
+                "first_name": "Erika", "last_name": "Mustermann",
+                "street": "Hauptstrabe 5", "zip_code": "30159",
+            }
+            response = client.post(
+                reverse("import_document_from_pdf"),
+                {"pdf_path": "C:\\incoming\\file.pdf"},
+                format="json",
+                HTTP_X_IMPORT_TOKEN="token",
+                HTTP_X_BROKER_ID=str(self.broker.id),
+            )
+
+        self.assertEqual(response.status_code, 409)
+        candidates = response.json()["candidates"]
+        self.assertEqual(candidates[0]["id"], self.customers["max"].id)
+        self.assertGreater(candidates[0]["score"], 0.7)
+
+
+# Outside of a test transaction: the index is built from committed rows and
+# updated on commit
+@override_settings(CUSTOMER_INDEX_ENABLED=True)
+class CustomerIndexTests(TransactionTestCase):
+    def setUp(self):
+        reset_customer_indexes()
+        self.addCleanup(reset_customer_indexes)
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.customer = Customer.objects.create(
+            broker=self.broker, first_name="Jürgen", last_name="Müller",
+            street="Hauptstraße 5", zip_code="12345",
+        )
+        customer_index(self.broker)
+
+    def _find(self, **customer_data):
+        return find_or_create_customer(customer_data, broker=self.broker)
+
+    def test_match_is_a_dictionary_lookup(self):
+        with self.assertNumQueries(0):
+            by_address = self._find(last_name="Mueller", street="Hauptstr. 5", zip_code="12345")
+            by_name = self._find(first_name="JUERGEN", last_name="müller")
+
+        self.assertEqual(by_address, (self.customer, False))
+        self.assertEqual(by_name, (self.customer, False))
+        self.assertEqual(by_address[0].customer_number, self.customer.customer_number)
+
+    def test_fuzzy_match_uses_the_index(self):
+        with self.assertNumQueries(0):
+            customer, created = self._find(
+                first_name="Jürgen", last_name="Mūller", street="Hauptstrabe 5", zip_code="12345")
+
+        self.assertEqual(customer, self.customer)
+
+    def test_created_customer_is_indexed_on_commit(self):
+        customer, created = self._find(
+            first_name="Anna", last_name="Schmidt", street="Ringstraße 1", zip_code="12345")
+        self.assertTrue(created)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._find(first_name="Anna", last_name="Schmidt"), (customer, False))
+
+    def test_miss_is_confirmed_in_the_database_before_creating(self):
+        # Created by another process: bulk_create() sends no post_save
+        [other] = Customer.objects.bulk_create([Customer(
+            broker=self.broker, customer_number="2026-999999", first_name="Anna",
+            last_name="Schmidt", street="Ringstraße 1", zip_code="12345",
+            first_name_norm="anna", last_name_norm="schmidt", street_norm="ringstrasse 1",
+        )])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                find_or_create_customer(
+                    {"first_name": "Anna", "last_name": "Schmidt"}, self.broker, create=False),
+                (None, True),
+            )
+        customer, created = self._find(
+            first_name="Anna", last_name="Schmitt", street="Ringstr. 1", zip_code="12345")
+
+        self.assertEqual((customer.pk, created), (other.pk, False))
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_changes_and_deletes_are_applied(self):
+        self.customer.street = "Nebenweg 2"
+        self.customer.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self._find(street="Nebenweg 2", zip_code="12345")[0], self.customer)
+
+        self.customer.delete()
+        self.assertEqual(len(customer_index(self.broker)), 0)
+
+    def test_rolled_back_customer_is_not_indexed(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Customer.objects.create(broker=self.broker, first_name="Geist", last_name="Rollback")
+            raise RuntimeError
+
+        self.assertEqual(customer_index(self.broker).with_name("rollback", "geist"), [])
+
+    @override_settings(CUSTOMER_INDEX_MAX_BROKERS=1)
+    def test_least_recently_used_broker_is_evicted(self):
+        other = get_user_model().objects.create_user(username="other")
+
+        customer_index(other)
+
+        self.assertEqual(cached_broker_ids(), [other.id])
+
+    @override_settings(CUSTOMER_INDEX_ENABLED=False)
+    def test_disabled_index_uses_the_database(self):
+        self.assertIsNone(customer_index(self.broker))
+        with self.assertNumQueries(1):
+            self._find(street="Hauptstr. 5", zip_code="12345")
+
+
+class CustomerAutocompleteTests(TransactionTestCase):
+    def setUp(self):
+        reset_autocomplete_indexes()
+        self.addCleanup(reset_autocomplete_indexes)
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.broker.groups.add(Group.objects.create(name="whitelist"))
+        self.mueller = Customer.objects.create(
+            broker=self.broker, first_name="Jürgen", last_name="Müller-Lüdenscheidt",
+            zip_code="30159", city="Hannover",
+        )
+        self.schmidt = Customer.objects.create(
+            broker=self.broker, first_name="Anna", last_name="Schmidt", zip_code="30161",
+        )
+        self.letter = Document.objects.create(
+            customer=self.schmidt, file_path="/docs/a.pdf", policy_numbers=[],
+            license_plates=["H-AB 123"],
+        )
+        autocomplete_index(self.broker)
+
+    def _ids(self, query, **kwargs):
+        return [row["id"] for row in autocomplete_customers(self.broker, query, **kwargs)]
+
+    def test_name_prefixes_are_found_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids("Mül"), [self.mueller.id])
+            self.assertEqual(self._ids("muel"), [self.mueller.id])
+            self.assertEqual(self._ids("lüdensch"), [self.mueller.id])
+            self.assertEqual(self._ids("an"), [self.schmidt.id])
+            self.assertEqual(self._ids("x"), [])
+            self.assertEqual(self._ids(""), [])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self._ids("jür mül"), [self.mueller.id])
+        self.assertEqual(self._ids("anna mül"), [])
+
+    def test_customer_number_and_plate_prefixes(self):
+        number = self.schmidt.customer_number
+        self.assertEqual(self._ids(number), [self.schmidt.id])
+        self.assertEqual(self._ids(number[:-1]), [self.mueller.id, self.schmidt.id])
+
+        result = autocomplete_customers(self.broker, "h ab 1")
+        self.assertEqual([row["id"] for row in result], [self.schmidt.id])
+        self.assertEqual(result[0]["match"], {"field": "license_plate", "value": "H-AB 123"})
+        self.assertEqual(result[0]["last_name"], "Schmidt")
+
+    def test_limit(self):
+        for i in range(5):
+            Customer.objects.create(broker=self.broker, last_name=f"Meier {i}")
+        self.assertEqual(len(self._ids("mei", limit=3)), 3)
+        self.assertEqual(len(self._ids("mei")), 5)
+
+    def test_other_brokers_customers_are_not_found(self):
+        other = get_user_model().objects.create_user(username="other")
+        Customer.objects.create(broker=other, last_name="Müller")
+
+        self.assertEqual(self._ids("mül"), [self.mueller.id])
+        self.assertEqual(autocomplete_customers(None, "mül"), [])
+
+    def test_changes_are_applied_on_commit(self):
+        self.mueller.last_name = "Becker"
+        self.mueller.save()
+        new = Customer.objects.create(broker=self.broker, last_name="Müllner")
+        Document.objects.create(
+            customer=new, file_path="/docs/b.pdf", policy_numbers=[], license_plates=["M-XY 9"],
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids("bec"), [self.mueller.id])
+            self.assertEqual(self._ids("mül"), [new.id])
+            self.assertEqual(self._ids("mxy"), [new.id])
+
+        self.schmidt.delete()
+        self.assertEqual(self._ids("schm"), [])
+        self.assertEqual(self._ids("hab"), [])
+
+    def test_moved_document_takes_its_plates_along(self):
+        self.letter.customer = self.mueller
+        self.letter.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids("hab"), [self.mueller.id])
+
+    def test_transactions_use_the_warm_index_or_the_database(self):
+        with transaction.atomic():
+            with self.assertNumQueries(0):
+                self.assertEqual(self._ids("mül"), [self.mueller.id])
+
+        reset_autocomplete_indexes()
+        with transaction.atomic():
+            with self.assertNumQueries(2):
+                result = autocomplete_customers(self.broker, "h ab 1")
+            self.assertEqual(self._ids("lüdensch"), [self.mueller.id])
+            self.assertEqual(self._ids("jür mül"), [self.mueller.id])
+            self.assertEqual(self._ids("anna mül"), [])
+            self.assertEqual(self._ids(self.schmidt.customer_number), [self.schmidt.id])
+            # Nothing is built for one keystroke
+            self.assertIsNone(autocomplete_index(self.broker))
+        self.assertEqual(result[0]["match"], {"field": "license_plate", "value": "H-AB 123"})
+
+    def test_rolled_back_customer_is_not_indexed(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Customer.objects.create(broker=self.broker, last_name="Rollback")
+            raise RuntimeError
+
+        self.assertEqual(self._ids("roll"), [])
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.broker)
+
+        response = client.get(reverse("customer-autocomplete"), {"q": "Müller L", "limit": "5"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["id"], self.mueller.id)
+        self.assertEqual(
+            response.data["results"][0]["match"],
+            {"field": "last_name", "value": "Müller-Lüdenscheidt"},
+        )
+
+
+class FulltextSearchTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        self.broker.groups.add(Group.objects.create(name="whitelist"))
+        self.mueller = Customer.objects.create(
+            broker=self.broker, first_name="Jürgen", last_name="Müller",
+            street="Lindenweg 3", zip_code="30159", city="Hannover",
+        )
+        self.schmidt = Customer.objects.create(
+            broker=self.broker, first_name="Anna", last_name="Schmidt",
+            street="Hauptstraße 5", zip_code="30161", city="Hannover",
+        )
+        self.letter = Document.objects.create(
+            customer=self.schmidt, file_path="/tmp/a.pdf", policy_numbers=[],
+            raw_text="Ihre Hausratversicherung für die Wohnung im Lindenweg <b>3</b> wurde angepasst.",
+        )
+
+    def test_finds_customers_by_name_address_and_letter_text(self):
+        self.assertEqual([h.customer_id for h in search_customers(self.broker, "Mueller")],
+                         [self.mueller.id])
+        self.assertEqual([h.customer_id for h in search_customers(self.broker, "hausrat")],
+                         [self.schmidt.id])
+        # Every word must match; words are prefixes
+        self.assertEqual([h.customer_id for h in search_customers(self.broker, "Hannov schm")],
+                         [self.schmidt.id])
+
+    def test_customer_fields_rank_above_letters(self):
+        hits = search_customers(self.broker, "Lindenweg")
+
+        self.assertEqual([h.customer_id for h in hits], [self.mueller.id, self.schmidt.id])
+        self.assertEqual(hits[1].document_id, self.letter.id)
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        hit = search_customers(self.broker, "Lindenweg angepasst")[0]
+
+        self.assertEqual(hit.customer_id, self.schmidt.id)
+        self.assertIn("<mark>Lindenweg</mark> &lt;b&gt;3&lt;/b&gt;", hit.snippet)
+        self.assertIn("<mark>angepasst</mark>", hit.snippet)
+
+    def test_customers_with_more_matching_letters_rank_first(self):
+        Document.objects.create(
+            customer=self.mueller, file_path="/tmp/b.pdf", policy_numbers=[],
+            raw_text="Hausratversicherung: Beitragsanpassung",
+        )
+        Document.objects.create(
+            customer=self.mueller, file_path="/tmp/c.pdf", policy_numbers=[],
+            raw_text="Hausratversicherung: Schadenmeldung",
+        )
+
+        hits = search_customers(self.broker, "hausrat")
+
+        self.assertEqual([h.customer_id for h in hits], [self.mueller.id, self.schmidt.id])
+
+    def test_long_words_match_as_whole_words(self):
+        self.assertEqual(search_customers(self.broker, "Hausratversicherun"), [])
+        self.assertEqual(len(search_customers(self.broker, "Hausratversicherung")), 1)
+
+    def test_letter_snippet_shows_the_densest_run_of_matches(self):
+        text = "Sehr geehrte Frau Schmidt,\n" + "vielen Dank " * 20 + "Ihre Hausrat-Police wurde angepasst."
+
+        snippet = letter_snippet(text, ["Hausrat", "angepasst"], words=8)
+
+        self.assertTrue(snippet.startswith("…"))
+        self.assertTrue(snippet.endswith("<mark>Hausrat</mark>-Police wurde <mark>angepasst</mark>."))
+        self.assertNotIn("\n", letter_snippet(text, ["Schmidt"]))
+
+    def test_index_follows_changes(self):
+        self.letter.raw_text = "Kfz-Versicherung"
+        self.letter.save()
+        self.assertEqual(search_customers(self.broker, "hausrat"), [])
+        self.assertEqual(len(search_customers(self.broker, "kfz")), 1)
+
+        Document.objects.filter(id=self.letter.id).delete()
+        self.assertEqual(search_customers(self.broker, "kfz"), [])
+
+        self.mueller.last_name = "Meyer"
+        self.mueller.save()
+        self.assertEqual([h.customer_id for h in search_customers(self.broker, "meyer")],
+                         [self.mueller.id])
+
+        self.mueller.delete()
+        self.assertEqual(search_customers(self.broker, "meyer"), [])
+
+    def test_letters_follow_their_customer_to_another_broker(self):
+        other = get_user_model().objects.create_user(username="other")
+        self.schmidt.broker = other
+        self.schmidt.save()
+
+        self.assertEqual(search_customers(self.broker, "hausrat"), [])
+        self.assertEqual([h.customer_id for h in search_customers(other, "hausrat")], [self.schmidt.id])
+
+    def test_bulk_changes_are_picked_up_by_a_rebuild(self):
+        Customer.objects.filter(id=self.mueller.id).update(last_name="Meyer")
+        self.assertEqual(search_customers(self.broker, "meyer"), [])
+
+        rebuild_search_index()
+
+        self.assertEqual([h.customer_id for h in search_customers(self.broker, "meyer")],
+                         [self.mueller.id])
+
+    def test_other_brokers_are_not_searched(self):
+        other = get_user_model().objects.create_user(username="other")
+
+        self.assertEqual(search_customers(other, "hausrat"), [])
+
+    def test_search_syntax_is_not_interpreted(self):
+        self.assertEqual(search_customers(self.broker, '"unbalanced * NEAR( OR'), [])
+        self.assertEqual(search_customers(self.broker, "***"), [])
+
+    def test_api_returns_ranked_customers_with_snippets(self):
+        client = APIClient()
+        client.force_authenticate(self.broker)
+
+        response = client.get(reverse("customer-list"), {"mode": "fulltext", "q": "Lindenweg"})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["id"] for r in results], [self.mueller.id, self.schmidt.id])
+        self.assertIn("<mark>Lindenweg</mark>", results[0]["search"]["snippet"])
+        self.assertEqual(results[1]["search"]["document_id"], self.letter.id)
+
+
+class FulltextSchemaTests(TransactionTestCase):
+    def test_tables_can_be_rebuilt_by_later_migrations(self):
+        broker = get_user_model().objects.create_user(username="broker")
+        customer = Customer.objects.create(broker=broker, last_name="Schmidt")
+        Document.objects.create(customer=customer, file_path="/tmp/a.pdf", raw_text="Hausrat")
+        # SQLite copies the whole table for an AlterField
+        for model, name in ((Customer, "notes"), (Document, "file_path")):
+            old = model._meta.get_field(name)
+            new = old.clone()
+            new.set_attributes_from_name(name)
+            new.model = model
+            new.db_comment = "rebuild probe"
+            with connection.schema_editor() as editor:
+                editor.alter_field(model, old, new)
+                editor.alter_field(model, new, old)
+
+        Document.objects.create(customer=customer, file_path="/tmp/b.pdf", raw_text="Hausrat")
+        self.assertEqual([h.customer_id for h in search_customers(broker, "hausrat")], [customer.id])
+
+
+@override_settings(DOCUMENT_IMPORT_TOKEN="token", IMPORT_JOB_RETRY_BACKOFF=30)
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        storage = override_settings(
+            CUSTOMER_DOCUMENT_ROOT=os.path.join(tmp.name, "customers"),
+            UNASSIGNED_DOCUMENT_ROOT=os.path.join(tmp.name, "unassigned"),
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def _enqueue(self, pdf_path, broker=None):
+        return self.client.post(
+            reverse("import_document_from_pdf"),
+            {"pdf_path": pdf_path, "async": True},
+            format="json",
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str((broker or self.broker).id),
+        )
+
+    def _job_status(self, job_id, broker=None):
+        return self.client.get(
+            reverse("import_job_detail", kwargs={"job_id": job_id}),
+            HTTP_X_IMPORT_TOKEN="token",
+            HTTP_X_BROKER_ID=str((broker or self.broker).id),
+        )
+
+    def test_async_import_is_queued_and_processed_by_worker(self):
+        pdf_path = os.path.join(self.tmp_dir, "letter.pdf")
+        write_text_pdf(
+            pdf_path,
+            [["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt",
+              "Versicherungsschein K 123-456789/0"]],
+        )
+
+        response = self._enqueue(pdf_path)
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        self.assertEqual(response.json()["status_url"], f"/api/import-jobs/{job_id}/")
+        self.assertEqual(Document.objects.count(), 0)
+
+        call_command("run_import_workers", "--once", "--workers", "1", stdout=StringIO())
+
+        job = self._job_status(job_id).json()
+        self.assertEqual(job["status"], ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual(job["attempts"], 1)
+        self.assertEqual(job["result_status_code"], 201)
+        self.assertEqual(job["result"]["customer"]["last_name"], "Mustermann")
+        self.assertIn("total", job["timings"])
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_job_status_is_scoped_to_broker(self):
+        job_id = self._enqueue("letter.pdf").json()["job_id"]
+        other = get_user_model().objects.create_user(username="other")
+
+        self.assertEqual(self._job_status(job_id).status_code, 200)
+        self.assertEqual(self._job_status(job_id, broker=other).status_code, 404)
+
+    def test_job_is_claimed_only_once(self):
+        enqueue_import("letter.pdf", self.broker)
+
+        first = claim_next_job("worker-1")
+        second = claim_next_job("worker-2")
+
+        self.assertEqual(first.status, ImportJob.STATUS_RUNNING)
+        self.assertEqual(first.locked_by, "worker-1")
+        self.assertIsNone(second)
+
+    @override_settings(IMPORT_JOB_LOCK_TIMEOUT=60)
+    def test_job_of_dead_worker_is_taken_over(self):
+        enqueue_import("letter.pdf", self.broker)
+        job = claim_next_job("worker-1")
+        ImportJob.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=120))
+
+        taken_over = claim_next_job("worker-2")
+
+        self.assertEqual(taken_over.pk, job.pk)
+        self.assertEqual(taken_over.locked_by, "worker-2")
+        self.assertEqual(taken_over.attempts, 2)
+
+    def test_server_errors_are_retried_with_backoff(self):
+        job = enqueue_import("letter.pdf", self.broker)
+        failing = lambda pdf_path, broker: (500, {"error": "Failed to read PDF."}, {})
+
+        for attempt, backoff in ((1, 30), (2, 60)):
+            started = timezone.now()
+            job = run_job(claim_next_job("worker"), failing)
+            self.assertEqual(job.status, ImportJob.STATUS_QUEUED)
+            self.assertEqual(job.attempts, attempt)
+            self.assertGreaterEqual(job.available_at, started + timedelta(seconds=backoff))
+            self.assertIsNone(claim_next_job("worker"))
+            ImportJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+
+        job = run_job(claim_next_job("worker"), failing)
+
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(job.last_error, "Failed to read PDF.")
+
+    @patch("insurance_app.management.commands.run_import_workers.claim_next_job")
+    def test_worker_survives_database_errors(self, mock_claim):
+        mock_claim.side_effect = [OperationalError("database is locked"), None]
+        stderr = StringIO()
+
+        call_command(
+            "run_import_workers", "--once", "--workers", "1", "--poll-interval", "0.01",
+            stdout=StringIO(), stderr=stderr,
+        )
+
+        self.assertEqual(mock_claim.call_count, 2)
+        self.assertIn("database is locked", stderr.getvalue())
+
+    def test_client_errors_are_not_retried(self):
+        enqueue_import("letter.pdf", self.broker)
+
+        job = run_job(
+            claim_next_job("worker"),
+            lambda pdf_path, broker: (400, {"error": "File not found: letter.pdf"}, {}),
+        )
+
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result_status_code, 400)
+
+
+class ImportJobClaimTests(TransactionTestCase):
+    def test_concurrent_workers_claim_every_job_once(self):
+        broker = get_user_model().objects.create_user(username="broker")
+        job_ids = [enqueue_import(f"letter-{i}.pdf", broker).pk for i in range(100)]
+
+        # The shared in-memory test database fails at once on a lock instead
+        # of waiting; the workers use a file copy, like production does
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        database = os.path.join(tmp.name, "db.sqlite3")
+        connection.ensure_connection()
+        with sqlite3.connect(database) as target:
+            connection.connection.backup(target)
+        claimed, errors = [], []
+
+        def work(n):
+            try:
+                while (job := claim_next_job(f"worker-{n}")) is not None:
+                    claimed.append(job.pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        file_copy = {**connections.settings["default"], "NAME": database}
+        with patch.dict(connections.settings, {"default": file_copy}):
+            threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(claimed), job_ids)
+        with sqlite3.connect(database) as copy:
+            self.assertEqual(
+                copy.execute("SELECT status, attempts, count(*) FROM insurance_app_importjob "
+                             "GROUP BY status, attempts").fetchall(),
+                [(ImportJob.STATUS_RUNNING, 1, len(job_ids))],
+            )
+
+
+class InboxWatcherTests(TestCase):
+    def setUp(self):
+        self.broker = get_user_model().objects.create_user(username="broker")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.inbox = os.path.join(tmp.name, "inbox")
+        os.makedirs(self.inbox)
+        self.unassigned = os.path.join(tmp.name, "unassigned")
+        storage = override_settings(
+            CUSTOMER_DOCUMENT_ROOT=os.path.join(tmp.name, "customers"),
+            UNASSIGNED_DOCUMENT_ROOT=self.unassigned,
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def test_catch_up_imports_waiting_files_and_parks_failures(self):
+        write_text_pdf(
+            os.path.join(self.inbox, "letter.pdf"),
+            [["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt",
+              "Versicherungsschein K 123-456789/0"]],
+        )
+        with open(os.path.join(self.inbox, "corrupt.pdf"), "wb") as f:
+            f.write(b"not a pdf")
+        with open(os.path.join(self.inbox, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+        call_command(
+            "watch_inbox", "--once", "--inbox", self.inbox, "--broker", str(self.broker.id),
+            "--workers", "1", "--stable-seconds", "0", stdout=StringIO(),
+        )
+
+        self.assertEqual(Document.objects.count(), 1)
+        self.assertEqual(Document.objects.get().customer.last_name, "Mustermann")
+        self.assertEqual(sorted(os.listdir(self.inbox)), ["notes.txt"])
+        self.assertEqual(os.listdir(self.unassigned), ["corrupt.pdf"])
+
+    def test_repeated_events_import_a_file_once(self):
+        calls = []
+
+        def run_import(pdf_path, broker):
+            calls.append(pdf_path)
+            # A second write event while the import is running
+            watcher.on_modified(FileModifiedEvent(pdf_path))
+            os.remove(pdf_path)
+            return 201, {}, {}
+
+        watcher = InboxWatcher(self.inbox, self.broker, run_import, stable_seconds=0)
+        path = os.path.join(self.inbox, "scan.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-")
+
+        watcher.on_created(FileCreatedEvent(path))
+        watcher.on_created(FileCreatedEvent(os.path.join(self.inbox, ".scan.pdf.part")))
+
+        self.assertEqual(calls, [os.path.abspath(path)])
+        self.assertEqual(watcher.imported, 1)
+
+    def test_growing_file_is_not_stable(self):
+        path = os.path.join(self.inbox, "scan.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-")
+        stop = threading.Event()
+
+        def keep_writing():
+            with open(path, "ab") as f:
+                while not stop.is_set():
+                    f.write(b"0" * 1024)
+                    f.flush()
+                    time.sleep(0.02)
+
+        writer = threading.Thread(target=keep_writing)
+        writer.start()
+        try:
+            self.assertFalse(wait_until_stable(path, stable_seconds=0.2, timeout=0.5))
+        finally:
+            stop.set()
+            writer.join()
+        self.assertTrue(wait_until_stable(path, stable_seconds=0.1, timeout=2))
+
+
+def _hog_memory():
+    chunks = []
+    for _ in range(64):
+        chunks.append(bytearray(b"x") * (16 * 1024 * 1024))
+        time.sleep(0.01)
+    return len(chunks)
+
+
+def _slow_pages():
+    yield "page 1"
+    time.sleep(30)
+    yield "page 2"
+
+
+class IsolatedExtractionTests(SimpleTestCase):
+    def test_results_and_errors_cross_the_process_boundary(self):
+        self.assertEqual(run_isolated(sum, ([1, 2, 3],), timeout=10), 6)
+
+        with self.assertRaises(FileNotFoundError):
+            run_isolated(open, ("/nonexistent/file.pdf",), timeout=10)
+
+    def test_timeout_kills_child(self):
+        started = time.monotonic()
+        with self.assertRaises(ExtractionLimitExceeded) as cm:
+            run_isolated(time.sleep, (30,), timeout=0.3, max_rss_bytes=0)
+
+        self.assertEqual(cm.exception.limit, "timeout")
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_memory_cap_kills_child(self):
+        # Well above what the child needs with Django and the test module loaded
+        cap = _tree_rss_bytes(os.getpid()) + 128 * 1024 * 1024
+
+        with self.assertRaises(ExtractionLimitExceeded) as cm:
+            run_isolated(_hog_memory, timeout=30, max_rss_bytes=cap)
+
+        self.assertEqual(cm.exception.limit, "memory")
+
+    def test_items_are_streamed_while_the_child_runs(self):
+        pages = iter_isolated(_slow_pages, timeout=60)
+        started = time.monotonic()
+
+        self.assertEqual(next(pages), "page 1")
+        self.assertLess(time.monotonic() - started, 10)
+        pages.close()
+
+    def test_child_does_not_inherit_locks_held_by_other_threads(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        pdf_path = os.path.join(tmp.name, "letter.pdf")
+        write_text_pdf(pdf_path, [["Seite eins"], ["Seite zwei"]])
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with _pdfium_lock:
+                locked.set()
+                release.wait(30)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        locked.wait(5)
+
+        # A forked child would wait for the lock until the timeout
+        pages = list(iter_isolated(iter_pdf_pages, (pdf_path, "pdfium"), timeout=20))
+
+        self.assertEqual(len(pages), 2)
+        self.assertIn("Seite zwei", pages[1])
+
+    @override_settings(PDF_EXTRACTION_CACHE_MAX_BYTES=0)
+    def test_isolated_extraction_matches_in_process(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        pdf_path = os.path.join(tmp.name, "letter.pdf")
+        write_text_pdf(pdf_path, [["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt"]])
+
+        with override_settings(PDF_EXTRACT_TIMEOUT=0, PDF_EXTRACT_MAX_RSS_MB=0):
+            in_process = extract_pdf_text(pdf_path)
+        with override_settings(PDF_EXTRACT_TIMEOUT=10, PDF_EXTRACT_MAX_RSS_MB=512):
+            isolated = extract_pdf_text(pdf_path)
+
+        self.assertEqual(isolated, in_process)
+        self.assertEqual(isolated["zip_code"], "12345")
+
+
+class ParallelPdfReadTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pdf_path = os.path.join(tmp.name, "bundle.pdf")
+        write_text_pdf(
+            self.pdf_path,
+            [[f"Seite {n}", f"Versicherungsschein K 177-33280{n}/1"] for n in range(1, 8)],
+        )
+
+    def test_page_shards_cover_all_pages_in_order(self):
+        self.assertEqual(_page_shards(7, 3), [(0, 3), (3, 5), (5, 7)])
+        self.assertEqual(_page_shards(2, 4), [(0, 1), (1, 2)])
+
+    def test_parallel_read_matches_sequential_join(self):
+        for engine in ("pdfplumber", "pdfium"):
+            sequential = _read_pdf_text(self.pdf_path, workers=1, engine=engine)
+
+            with override_settings(PDF_EXTRACT_PARALLEL_MIN_PAGES=2):
+                parallel = _read_pdf_text(self.pdf_path, workers=3, engine=engine)
+
+            self.assertIn("Seite 7", sequential)
+            self.assertEqual(parallel, sequential)
+
+    def test_small_documents_stay_in_process(self):
+        with override_settings(PDF_EXTRACT_PARALLEL_MIN_PAGES=50):
+            with patch(
+                "insurance_app.services.extract_pdf_text._read_pages_parallel"
+            ) as mock_parallel:
+                _read_pdf_text(self.pdf_path, workers=4)
+
+        mock_parallel.assert_not_called()
+
+
+class StreamingPdfReadTests(SimpleTestCase):
+    LINES = [f"Zeile {n}: Beitrag 123,45 EUR Versicherungsschein" for n in range(40)]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+
+    def _peak_kib(self, page_count):
+        path = os.path.join(self.tmp_dir, f"{page_count}.pdf")
+        write_text_pdf(path, [self.LINES] * page_count)
+
+        tracemalloc.start()
+        try:
+            for _ in iter_pdf_pages(path, engine="pdfplumber"):
+                pass
+            return tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    def test_peak_memory_does_not_grow_with_page_count(self):
+        small = self._peak_kib(1)
+        large = self._peak_kib(8)
+
+        self.assertLess(large, small * 1.5)
+
+    def test_engines_stream_the_same_pages(self):
+        path = os.path.join(self.tmp_dir, "letter.pdf")
+        write_text_pdf(path, [["Seite 1"], ["Seite 2"], ["Seite 3"]])
+
+        for engine in ("pdfium", "pdfplumber"):
+            pages = list(iter_pdf_pages(path, engine=engine, start=1))
+            self.assertEqual([page.strip() for page in pages], ["Seite 2", "Seite 3"])
+
+
+@override_settings(PDF_EXTRACTION_CACHE_MAX_BYTES=0)
+class PdfEngineTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pdf_path = os.path.join(tmp.name, "letter.pdf")
+        write_text_pdf(
+            self.pdf_path,
+            [[
+                "Herrn Max Mustermann",
+                "Musterstraße 1",
+                "12345 Musterstadt",
+                "Versicherungsschein-Nummer: K 123-456789/0",
+                "Ihre Kfz-Versicherung, Kennzeichen M-XY 1234",
+            ]],
+        )
+
+    def test_engines_agree_on_demo_seed_corpus(self):
+        # Raises CommandError on any field mismatch
+        call_command("compare_pdf_engines", stdout=open(os.devnull, "w"))
+
+    def test_engines_agree_on_generated_letter(self):
+        pdfium = extract_pdf_text(self.pdf_path, engine="pdfium", fallback=False)
+        pdfplumber = extract_pdf_text(self.pdf_path, engine="pdfplumber")
+
+        self.assertEqual(pdfium["last_name"], "Mustermann")
+        self.assertEqual(pdfium["street"], "Musterstraße 1")
+        for key in ("first_name", "last_name", "street", "zip_code", "city",
+                    "policy_numbers", "license_plates", "contract_typ"):
+            self.assertEqual(pdfium[key], pdfplumber[key], key)
+
+    def test_generated_corpus_matches_manifest(self):
+        corpus = Path(os.path.dirname(self.pdf_path)) / "corpus"
+        manifest = write_corpus(corpus, [1, 2, 1], seed=7)
+
+        for name, expected in manifest.items():
+            for engine in ("pdfium", "pdfplumber"):
+                data = extract_pdf_text(str(corpus / name), engine=engine, fallback=False)
+                for key, value in expected.items():
+                    if key != "pages":
+                        self.assertEqual(data[key], value, f"{name} {engine} {key}")
+
+    def test_falls_back_to_pdfplumber_without_address_block(self):
+        blind_engine = PdfEngine("pdfium", lambda f: 1, lambda f, start, stop: ["no address"])
+        with patch.dict(ENGINES, {"pdfium": blind_engine}):
+            data = extract_pdf_text(self.pdf_path, engine="pdfium")
+
+        self.assertEqual(data["zip_code"], "12345")
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ValueError):
+            extract_pdf_text(self.pdf_path, engine="tesseract")
+
+
+class ExtractionCacheTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pdf_path = os.path.join(tmp.name, "letter.pdf")
+        write_text_pdf(
+            self.pdf_path,
+            [["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt"]],
+        )
+
+    @override_settings(PDF_EXTRACTION_CACHE_MAX_BYTES=1024 * 1024)
+    def test_resubmitted_pdf_is_served_from_cache(self):
+        first = extract_pdf_text(self.pdf_path)
+
+        with patch(
+            "insurance_app.services.extract_pdf_text._iter_pages"
+        ) as mock_read:
+            second = extract_pdf_text(self.pdf_path)
+
+        mock_read.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertEqual(ExtractionCacheEntry.objects.count(), 1)
+
+    @override_settings(PDF_EXTRACTION_CACHE_MAX_BYTES=0)
+    def test_cache_can_be_disabled(self):
+        extract_pdf_text(self.pdf_path)
+
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+    @override_settings(PDF_EXTRACTION_CACHE_MAX_BYTES=2500)
+    def test_least_recently_used_entries_are_evicted(self):
+        payload = {"raw_text": "x" * 1000}
+        store_extraction("a" * 64, "1:pdfium", payload)
+        store_extraction("b" * 64, "1:pdfium", payload)
+        store_extraction("c" * 64, "1:pdfium", payload)
+
+        hashes = set(ExtractionCacheEntry.objects.values_list("content_hash", flat=True))
+        self.assertEqual(hashes, {"b" * 64, "c" * 64})
+
+    def test_management_command_purges_cache(self):
+        store_extraction("a" * 64, "1:pdfium", {"raw_text": ""})
+
+        call_command("extraction_cache", "--purge", stdout=open(os.devnull, "w"))
+
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+
+# Reads are recorded in-process, so no supervised child
+@override_settings(
+    PDF_EXTRACTION_CACHE_MAX_BYTES=0, PDF_EXTRACT_TIMEOUT=0, PDF_EXTRACT_MAX_RSS_MB=0
+)
+class StagedExtractionTests(SimpleTestCase):
+    ADDRESS = ["Herrn Max Mustermann", "Musterstraße 1", "12345 Musterstadt"]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+
+    def _write(self, name, pages):
+        path = os.path.join(self.tmp_dir, name)
+        write_text_pdf(path, pages)
+        return path
+
+    def test_customer_fields_only_read_page_one(self):
+        pdf_path = self._write(
+            "letter.pdf",
+            [self.ADDRESS, ["Kennzeichen M-XY 1234"], ["Versicherungsschein K 123-456789/0"]],
+        )
+        extraction = StagedPDFExtraction(pdf_path, engine="pdfium")
+        pdfium = ENGINES["pdfium"]
+        calls = []
+
+        def read_pages(pdf_file, start, stop):
+            calls.append((start, stop))
+            return pdfium.read_pages(pdf_file, start, stop)
+
+        with patch.dict(ENGINES, {"pdfium": PdfEngine("pdfium", pdfium.page_count, read_pages)}):
+            fields = extraction.customer_fields()
+            self.assertEqual(calls, [(0, 1)])
+
+            payload = extraction.to_dict()
+            self.assertEqual(calls, [(0, 1), (1, None)])
+
+        self.assertEqual(fields["last_name"], "Mustermann")
+        self.assertEqual(fields["zip_code"], "12345")
+        self.assertEqual(payload, extract_pdf_text(pdf_path, engine="pdfium"))
+
+    def test_address_on_later_page_reads_whole_document(self):
+        pdf_path = self._write("annex.pdf", [["Anlage"], ["Seite 2"], self.ADDRESS])
+
+        fields = StagedPDFExtraction(pdf_path).customer_fields()
+
+        self.assertEqual(fields["street"], "Musterstraße 1")
+        self.assertEqual(fields["city"], "Musterstadt")
+
+
+class ContractTypeTests(SimpleTestCase):
+    def test_hits_are_counted_per_contract_type(self):
+        text = "Ihre KFZ-Versicherung\nKennzeichen M-XY 1234\nPrivathaftpflicht"
+
+        self.assertEqual(count_contract_type_hits(text), {"kfz": 2, "haftpflicht": 1})
+
+    def test_highest_score_wins_over_rule_order(self):
+        text = "Hausrat\nHausratversicherung\nKennzeichen"
+
+        self.assertEqual(extract_contract_type(text), "hausrat")
+
+    def test_ties_go_to_earlier_rule(self):
+        self.assertEqual(extract_contract_type("Hausrat und Kfz"), "kfz")
+        self.assertIsNone(extract_contract_type("Sehr geehrter Herr Mustermann"))
+
+    def test_prefilter_keeps_rules_starting_with_groups_classes_or_escapes(self):
+        matcher = _compile_contract_matcher([
+            ("hausrat", [re.compile(r"(?:haus|wohn)rat")]),
+            ("kfz", [re.compile(r"[kc]fz-police|\(kfz\)")]),
+            ("unfall", [re.compile(r"a?unfall"), re.compile(r"(?:privat)?unfallschutz")]),
+        ])
+        text = "wohnrat cfz-police (kfz) unfall privatunfallschutz"
+
+        self.assertEqual(
+            [m.lastgroup for m in matcher.finditer(text)], ["hausrat", "kfz", "kfz", "unfall", "unfall"])
+        self.assertTrue(matcher.pattern.startswith("(?=[\\(achkpuw])"))
+        optional = _compile_contract_matcher([("unfall", [re.compile(r"a?unfall")])])
+        self.assertEqual([m.group() for m in optional.finditer("unfall, aunfall")], ["unfall", "aunfall"])
+
+    def test_prefilter_is_left_out_for_rules_starting_with_anything(self):
+        for pattern in (r"\d+ euro", r"[^x]fz", r"(?=k)kfz", r".fz", r"(?:kfz)?"):
+            matcher = _compile_contract_matcher([("kfz", [re.compile(pattern)])])
+
+            self.assertFalse(matcher.pattern.startswith("(?="), pattern)
+
+    def test_rules_must_be_lowercase(self):
+        with self.assertRaises(ValueError):
+            _compile_contract_matcher([("kfz", [re.compile(r"\bKFZ\b", re.I)])])
+
+
+class NormalizeTextTests(SimpleTestCase):
+    def test_matches_multipass_normalization_on_fuzzed_corpus(self):
+        rng = random.Random(1234)
+        for _ in range(3000):
+            pages = fuzz_pages(rng, rng.randrange(1, 5), 60)
+            text = "\n".join(pages)
+            expected = legacy_normalize_text(text)
+
+            self.assertEqual(normalize_text(text), expected, repr(text))
+            self.assertEqual("".join(iter_normalized_text(pages)), expected, repr(pages))
+
+    def test_salutation_is_joined_across_pages(self):
+        pages = ["Anschrift\nFrau  ", " Erika Mustermann\t\tStraße 1", "\n\n€"]
+
+        chunks = list(iter_normalized_text(pages))
+
+        self.assertEqual("".join(chunks), "Anschrift\nFrau Erika Mustermann Straße 1")
+        self.assertEqual(chunks[0], "Anschrift")
+
+    def test_salutation_split_by_carriage_return_is_joined_across_pages(self):
+        pages = ["Anschrift\nHer\rr", "Max Mustermann"]
+
+        self.assertEqual("".join(iter_normalized_text(pages)), "Anschrift\nHerr Max Mustermann")
+        self.assertEqual(normalize_text("\n".join(pages)), "Anschrift\nHerr Max Mustermann")